@@ -1,11 +1,12 @@
-import os, re, sys
+import os, sys
 
 from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtSql import QSqlQuery
 
 from apollo.app.apollo_ux import ApolloUX
 from apollo.utils import PlayingQueue, exe_time
-from apollo.db.library_manager import LibraryManager
+from apollo.db.library_manager import LibraryManager, LibraryTableModel, SCHEMA_VERSION
+from apollo.db.library_manager_app import LibraryWatcher, SearchController, SchemaMigration_Thread
 from apollo.app.library_tab import LibraryTab
 from apollo.app.nowplaying_tab import NowPlayingTab
 from apollo.dsp.dsp_main import ApolloDSP
@@ -35,7 +36,9 @@ class ApolloUtility_Functions(ApolloUX):
 
     def LoadDB(self, dbname = None): # works
         """
-        Connects to the databse and returns Manager Object to communicate with the DB
+        Connects to the databse and returns Manager Object to communicate with the DB,
+        with FEDERATE_LIBRARIES the other monitored DBs are attached and queried
+        together with the current one
 
         :Args:
             dbname: String
@@ -43,10 +46,16 @@ class ApolloUtility_Functions(ApolloUX):
 
         :Return: None
         """
-        if dbname == None:
-            dbname = self.CONF_MANG.Getvalue(path = 'CURRENT_DB')
-            dbname = self.CONF_MANG.Getvalue(path = f'MONITERED_DB/{dbname}/db_loc')
-        self.LibraryManager = LibraryManager(dbname)
+        if dbname != None:
+            self.LibraryManager = LibraryManager(dbname)
+            return None
+
+        Current = self.CONF_MANG.Getvalue(path = 'CURRENT_DB')
+        self.LibraryManager = LibraryManager(self.CONF_MANG.Getvalue(path = f'MONITERED_DB/{Current}/db_loc'))
+        if self.CONF_MANG.Getvalue(path = "FEDERATE_LIBRARIES"):
+            Libraries = {Name: Entry["db_loc"] for Name, Entry in self.CONF_MANG.Getvalue(path = 'MONITERED_DB').items()
+                         if Name != Current and os.path.isfile(Entry["db_loc"])}
+            self.LibraryManager.Federate(Libraries, Source = Current)
 
 
     def HeaderActionsBinding(self, index, Model, Header): # works
@@ -56,7 +65,7 @@ class ApolloUtility_Functions(ApolloUX):
         :Args:
             index: Int
                 index of rhe given header section
-            Model: QStandardItemModel
+            Model: QAbstractItemModel
                 Model of the given table
             Header: QHeaderView
                 header view of the given table
@@ -82,6 +91,10 @@ class ApolloUtility_Functions(ApolloUX):
             else:
                 Action.setChecked(True)
                 Header.showSection(Index)
+            # the paged model only reads the visible columns
+            Source = Model.sourceModel() if isinstance(Model, QtCore.QSortFilterProxyModel) else Model
+            if isinstance(Source, LibraryTableModel):
+                Source.ProjectSections(Header)
 
         Action = QtWidgets.QAction(Model.headerData(index, 1))
         Action.setCheckable(True)
@@ -92,6 +105,34 @@ class ApolloUtility_Functions(ApolloUX):
         Action.triggered.connect(lambda: HeaderHide(index, Action, Header))
         return Action
 
+    def StatsMenuBinding(self, Menu, TBV): # works
+        """
+        Adds the stats menu of a table to a menu, the size, playtime, album,
+        artist and track counts are read in one call each time it opens
+
+        :Args:
+            Menu: QMenu
+                menu to add the stats menu to
+            TBV: TableView
+                table to show the stats of
+
+        :Return:
+            QMenu
+        """
+        StatsMenu = Menu.addMenu("Table Stats")
+        Tablename = TBV.property("DB_Table")
+        Labels = {"size": "Size: {} Gb", "playtime": "PlayTime: {}", "albums": "Album Count: {}",
+                  "artists": "Artist Count: {}", "tracks": "Track Count: {}"}
+        Actions = {Key: StatsMenu.addAction("") for Key in Labels}
+
+        def UpdateStats():
+            Stats = self.LibraryManager.LibraryStats(Tablename)
+            for Key, Action in Actions.items():
+                Action.setText(Labels[Key].format(Stats[Key]))
+        UpdateStats()
+        StatsMenu.aboutToShow.connect(UpdateStats)
+        return StatsMenu
+
     def ColumnSelection(self, TBV, Col): # works
         """
         Gets Data from the slected items from the QTableView and
@@ -165,40 +206,21 @@ class SearchSelection_Utils(ApolloUtility_Functions):
             SortTBV: TableVIew
                 Sort/Group Table
         """
-        Field = "file_path" if Field == "folder" else Field
         TableName = TBV.property("DB_Table")
+        # the folders are grouped by the directory of the file_path
+        Field = "file_path" if Field == "folder" else Field
+        Values = self.LibraryManager.GroupValues(TableName, "folder" if Field == "file_path" else Field)
 
-        Query = self.LibraryManager.ExeQuery(f"""
-        SELECT DISTINCT {Field}
-        FROM {TableName}
-        WHERE  ({Field} NOT IN ("", " "))
-        ORDER BY {Field}
-        """)
-
-        Row = 0
         TableModel = QtGui.QStandardItemModel()
-
-        if Field == "file_path":
-            FilePath = []
-        while Query.next():
-            if Field == "file_path":
-                item = os.path.split(Query.value(0))[0]
-                if item not in FilePath:
-                    FilePath.append(item)
-                    item = QtGui.QStandardItem(str(f"    {item}")) # adds an 4 space offset to an item
-                    item.setTextAlignment(QtCore.Qt.AlignJustify)
-                    TableModel.setItem(Row, item)
-                    Row += 1
-            else:
-                item = (Query.value(0))
-                item = QtGui.QStandardItem(str(f"    {item}")) # adds an 4 space offset to an item
-                item.setTextAlignment(QtCore.Qt.AlignJustify)
-                TableModel.setItem(Row, item)
-                Row += 1
+        for Row, Value in enumerate(Values):
+            item = QtGui.QStandardItem(str(f"    {Value}")) # adds an 4 space offset to an item
+            item.setTextAlignment(QtCore.Qt.AlignJustify)
+            TableModel.setItem(Row, item)
 
         SortTBV.setProperty("GROUP_BY", Field)
         SortTBV.horizontalHeader().setStretchLastSection(True)
         SortTBV.setModel(TableModel)
+        self.LibraryManager.FilterModel(SortTBV)
 
     def SearchSimilarField(self, TBV, Field): # works
         """
@@ -231,24 +253,20 @@ class SearchSelection_Utils(ApolloUtility_Functions):
         self.LibraryManager.SearchSimilarField(TBV, Field, Indexes)
 
     def SearchGroupTable(self, LEDT = QtWidgets.QLineEdit, TBV = QtWidgets.QTableView, ColLimit = 1):
-        Model = TBV.model()
-        Search = LEDT.text()
+        """
+        Shows the rows of the group table that contain the search text
 
-        if Search == "":
-            for Row in range(Model.rowCount()):
-                TBV.showRow(Row)
-        else:
-            for Col in range(ColLimit):
-                for Row in range(Model.rowCount()):
-                    data = Model.index(Row, Col).data()
-                    Query = [(re.search(f".*{Search}.*", data)),
-                             (re.search(f".*{Search.upper()}.*", data)),
-                             (re.search(f".*{Search.lower()}.*", data)),
-                             (re.search(f".*{Search.title()}.*", data))]
-                    if any(Query):
-                        TBV.showRow(Row)
-                    else:
-                        TBV.hideRow(Row)
+        :Args:
+            LEDT: LineEdit
+                LineEdit that provides the search text
+            TBV: TableView
+                Group table to filter
+            ColLimit: Int
+                1 searches the first column, any other value searches every column
+        """
+        Proxy = self.LibraryManager.FilterModel(TBV)
+        Proxy.setFilterKeyColumn(0 if ColLimit == 1 else -1)
+        Proxy.setFilterFixedString(LEDT.text())
 
     def BindingLineSearch(self, LEDT, TBV): # is a Method Binding function, needs no tests
         """
@@ -260,10 +278,14 @@ class SearchSelection_Utils(ApolloUtility_Functions):
             TBV: TableView
                 TableView Object to refresh data
 
-        :Return: None
+        :Return: SearchController
         """
-        LEDT.returnPressed.connect(lambda: self.LibraryManager.TableSearch(LEDT, TBV))
-        LEDT.textChanged.connect(lambda: self.LibraryManager.TableSearch(LEDT, TBV))
+        # the searches are debounced and run off the GUI thread, Enter searches without waiting
+        Controller = SearchController(self.LibraryManager, TBV, Parent = LEDT)
+        LEDT.textChanged.connect(Controller.Search)
+        LEDT.returnPressed.connect(Controller.SearchNow)
+        Controller.Error.connect(self.statusBar().showMessage)
+        return Controller
 
     def GetQueueIndexes(self, Data, **kwargs): # Just Routes Functions no test needed
         """
@@ -290,21 +312,18 @@ class SearchSelection_Utils(ApolloUtility_Functions):
         Indexes = None
         if kwargs.get("Filter") != None:
             Field = kwargs.get("FilterField")
-            Indexes = self.LibraryManager.CreateView("nowplaying",
-                                                     Selector = Data,
-                                                     Filter = True,
-                                                     FilterField = str(Field),
-                                                     ID = kwargs.get("ID"))
+            Indexes = self.LibraryManager.SelectIndexes(Data,
+                                                        Filter = True,
+                                                        FilterField = str(Field),
+                                                        ID = kwargs.get("ID"))
         if kwargs.get("Shuffled") != None:
-            Indexes = self.LibraryManager.CreateView("nowplaying",
-                                                     Selector = Data,
-                                                     Shuffled = True,
-                                                     FilterField = "file_id")
+            Indexes = self.LibraryManager.SelectIndexes(Data,
+                                                        Shuffled = True,
+                                                        FilterField = "file_id")
         if kwargs.get("Normal") != None:
-            Indexes = self.LibraryManager.CreateView("nowplaying",
-                                                     Selector = Data,
-                                                     Normal = True,
-                                                     FilterField = "file_id")
+            Indexes = self.LibraryManager.SelectIndexes(Data,
+                                                        Normal = True,
+                                                        FilterField = "file_id")
         return Indexes
 
 ########################################################################################################################
@@ -318,22 +337,22 @@ class Queue_Utils(SearchSelection_Utils):
         super().__init__()
 
 
-    def Refill_QueueTable(self, QueueTBV = None, Order = []): # Untested
+    def Refill_QueueTable(self, QueueTBV = None): # Untested
         """
-        Refilling Of Data In The NowPlaying Queue
+        Refilling Of Data In The NowPlaying Queue, the rows are diffed with
+        the queue table so only the changed rows are updated
 
         :Args:
-            Order: List
-                order to arrnage data items in
+            QueueTBV: TableView
+                nowplaying table to refill
         """
         if QueueTBV == None:
             return None
 
         QueueTBV = self.apollo_TBV_NPQ_maintable
-        QueueTBV.setProperty("Order", Order)
-        self.LibraryManager.Refresh_TableModelData(QueueTBV)
+        self.LibraryManager.Refresh_QueueRows(QueueTBV)
 
-    def DeleteItem(self, Type, TBV): # Untested
+    def DeleteItem(self, Type, TBV): # Works
         """
         Delets the File from the database and filesystem
         OR
@@ -347,18 +366,21 @@ class Queue_Utils(SearchSelection_Utils):
 
         Tname = TBV.property("DB_Table")
         Item = self.ColumnSelection(TBV, "file_id")
-        Query = QSqlQuery()
-        ID = ", ".join([f"'{v}'"for v in Item])
-        Query.prepare(f"DELETE FROM {Tname} WHERE file_id IN ({ID})")
-        self.LibraryManager.ExeQuery(Query)
+        self.LibraryManager.DeleteFileIds(Tname, Item)
 
         if Type == "Delete" and Tname == "library":
             Path = self.ColumnSelection(TBV, "file_path")
             # DeleteAt(Path)
 
+        # the rows are removed from the source model in descending order, the
+        # rows after a removed row would move up under the remaining ones
         TableModel = TBV.model()
-        Index = list(set([index.row() for index in TBV.selectedIndexes()]))
-        [TableModel.removeRow(R) for R in Index]
+        Indexes = TBV.selectedIndexes()
+        if isinstance(TableModel, QtCore.QSortFilterProxyModel):
+            Indexes = [TableModel.mapToSource(index) for index in Indexes]
+            TableModel = TableModel.sourceModel()
+        for Row in sorted(set([index.row() for index in Indexes]), reverse = True):
+            TableModel.removeRow(Row)
 
 
     def PlayNow(self, TBV, QueueTBV = None): # Works
@@ -370,10 +392,10 @@ class Queue_Utils(SearchSelection_Utils):
                 Tableview to use to get data items from
         """
         Select = self.ColumnSelection(TBV, "file_id")
-        self.GetQueueIndexes(Select, Normal = True)
         self.PlayQueue.RemoveElements()
         self.PlayQueue.AddElements(Select)
-        self.Refill_QueueTable(QueueTBV = QueueTBV, Order = Select)
+        self.LibraryManager.Queue_Set(Select)
+        self.Refill_QueueTable(QueueTBV = QueueTBV)
 
 
     def QueueNext(self, TBV, QueueTBV = None): # Works
@@ -386,10 +408,9 @@ class Queue_Utils(SearchSelection_Utils):
         """
         Queue = self.PlayQueue.GetQueue()
         Select = list(filter(lambda x: x not in Queue, self.ColumnSelection(TBV, "file_id")))
+        self.LibraryManager.Queue_Insert(Select, Index = self.PlayQueue.GetPointer() + 1)
         self.PlayQueue.AddNext(Select)
-        Queue = self.PlayQueue.GetQueue()
-        self.GetQueueIndexes(Queue, Normal = True)
-        self.Refill_QueueTable(QueueTBV = QueueTBV, Order = Queue)
+        self.Refill_QueueTable(QueueTBV = QueueTBV)
 
 
     def QueueLast(self, TBV, QueueTBV = None): # Works
@@ -402,10 +423,9 @@ class Queue_Utils(SearchSelection_Utils):
         """
         Queue = self.PlayQueue.GetQueue()
         Select = list(filter(lambda x: x not in Queue, self.ColumnSelection(TBV, "file_id")))
+        self.LibraryManager.Queue_Insert(Select)
         self.PlayQueue.AddElements(Select)
-        Queue = self.PlayQueue.GetQueue()
-        self.GetQueueIndexes(Queue, Normal = True)
-        self.Refill_QueueTable(QueueTBV = QueueTBV, Order = Queue)
+        self.Refill_QueueTable(QueueTBV = QueueTBV)
 
 
     def PlayAllShuffled(self, TBV, QueueTBV = None): # Works
@@ -420,6 +440,7 @@ class Queue_Utils(SearchSelection_Utils):
         self.PlayQueue.RemoveElements()
         Indexes = self.GetQueueIndexes(Select, Shuffled = True)
         self.PlayQueue.AddElements(Indexes)
+        self.LibraryManager.Queue_Set(Indexes)
         self.Refill_QueueTable(QueueTBV = QueueTBV)
 
     def PlayArtist(self, TBV, QueueTBV = None): # Works
@@ -431,8 +452,12 @@ class Queue_Utils(SearchSelection_Utils):
                 Tableview to use to get data items from
         """
         Select = self.ColumnSelection(TBV, "artist")
+        # the tracks of the artist that are queued already are not queued again
+        OldIndex = set(self.PlayQueue.GetQueue())
         Indexes = self.GetQueueIndexes(Select, Filter = True, FilterField = "artist")
+        Indexes = [Keys for Keys in Indexes if Keys not in OldIndex]
         self.PlayQueue.AddElements(Indexes)
+        self.LibraryManager.Queue_Insert(Indexes)
         self.Refill_QueueTable(QueueTBV = QueueTBV)
 
     def PlayAlbumNow(self, TBV, QueueTBV = None): # Works
@@ -447,6 +472,7 @@ class Queue_Utils(SearchSelection_Utils):
         self.PlayQueue.RemoveElements()
         Indexes = self.GetQueueIndexes(Select, Filter = True, FilterField = "album")
         self.PlayQueue.AddElements(Indexes)
+        self.LibraryManager.Queue_Set(Indexes)
         self.Refill_QueueTable(QueueTBV = QueueTBV)
 
     def PlayGenre(self, TBV, QueueTBV = None): # Works
@@ -461,6 +487,7 @@ class Queue_Utils(SearchSelection_Utils):
         self.PlayQueue.RemoveElements()
         Indexes = self.GetQueueIndexes(Select, Filter = True, FilterField = "genre")
         self.PlayQueue.AddElements(Indexes)
+        self.LibraryManager.Queue_Set(Indexes)
         self.Refill_QueueTable(QueueTBV = QueueTBV)
 
     def QueueAlbumNext(self, TBV, QueueTBV = None): # Works
@@ -475,8 +502,9 @@ class Queue_Utils(SearchSelection_Utils):
         OldIndex = self.PlayQueue.GetQueue()
         NewIndex = self.GetQueueIndexes(Select, Filter = True, FilterField = "album", ID = OldIndex)
         NewIndex = [Keys for Keys in NewIndex if Keys not in OldIndex]
+        self.LibraryManager.Queue_Insert(NewIndex, Index = self.PlayQueue.GetPointer() + 1)
         self.PlayQueue.AddNext(NewIndex)
-        self.Refill_QueueTable(QueueTBV = QueueTBV, Order = self.PlayQueue.GetQueue())
+        self.Refill_QueueTable(QueueTBV = QueueTBV)
 
     def QueueAlbumLast(self, TBV, QueueTBV = None): # Works
         """
@@ -490,8 +518,9 @@ class Queue_Utils(SearchSelection_Utils):
         OldIndex = self.PlayQueue.GetQueue()
         NewIndex = self.GetQueueIndexes(Select, Filter = True, FilterField = "album", ID = OldIndex)
         NewIndex = [Keys for Keys in NewIndex if Keys not in OldIndex]
+        self.LibraryManager.Queue_Insert(NewIndex)
         self.PlayQueue.AddElements(NewIndex)
-        self.Refill_QueueTable(QueueTBV = QueueTBV, Order = self.PlayQueue.GetQueue())
+        self.Refill_QueueTable(QueueTBV = QueueTBV)
 
 
 ########################################################################################################################
@@ -515,19 +544,17 @@ class Files_Utils(Queue_Utils):
                 Table to get FileId from
         """
 
-        FileId = self.ColumnSelection(TBV, Col = "file_id")
-        ID = ", ".join([f"'{v}'"for v in FileId])
-
-        Query = QSqlQuery(f"""
-        UPDATE {TBV.property("DB_Table")}
-        SET rating = {Amount}
-        WHERE file_id IN ({ID})
-        """)
-        if self.LibraryManager.ExeQuery(Query):
-            Model = TBV.model()
+        FileId = set(self.ColumnSelection(TBV, Col = "file_id"))
+        if self.LibraryManager.SetRating(TBV.property("DB_Table"), FileId, Amount):
+            Model = self.LibraryManager.SourceModel(TBV)
+            # the paged library model reads the new ratings back from the db
+            if isinstance(Model, LibraryTableModel):
+                Model.Invalidate()
+                return None
             for Row in range(Model.rowCount()):
                 if (Model.index(Row, self.LibraryManager.db_fields.index("file_id")).data() in FileId):
-                    Model.setItem(Row, self.LibraryManager.db_fields.index("rating"), QtGui.QStandardItem(str(Amount)))
+                    Column = self.LibraryManager.db_fields.index("rating")
+                    Model.setItem(Row, Column, self.LibraryManager.TableItem(Column, Amount))
 
 ########################################################################################################################
 # Main Bindings
@@ -547,6 +574,49 @@ class ApolloTabBindings(Files_Utils):
         self.LibraryTab = LibraryTab(self)
         self.NowPlayingTab = NowPlayingTab(self)
         self.AudioToolsTab = ApolloDSP(UI = self)
+        self.Init_SchemaMigration()
+        self.Init_LibraryWatcher()
+
+    def Init_SchemaMigration(self):
+        """
+        Migrates a v1 library in the background, the library table is
+        reloaded once the migrated table is swapped in. The progress and
+        errors of the migration are shown in the statusbar
+        """
+        if self.LibraryManager.SchemaVersion() == SCHEMA_VERSION:
+            return
+
+        def Migrated(Count):
+            TableModel = self.LibraryManager.SourceModel(self.LibraryTab.MainTable)
+            if isinstance(TableModel, LibraryTableModel):
+                TableModel.Refresh()
+            self.statusBar().showMessage(f"Migrated {Count} files", 5000)
+
+        self.SchemaMigration = SchemaMigration_Thread(self.LibraryManager.db_driver.databaseName())
+        self.SchemaMigration.Progress.connect(self.statusBar().showMessage)
+        self.SchemaMigration.Error.connect(self.statusBar().showMessage)
+        self.SchemaMigration.Migrated.connect(Migrated)
+        self.SchemaMigration.start()
+
+    def Init_LibraryWatcher(self):
+        """
+        Watches the monitored folders of the current DB and refreshes the
+        library rows of the folders that changed, failed rescans are shown
+        in the statusbar
+        """
+        if self.CONF_MANG.Getvalue(path = "WATCHER_ENABLED") == False:
+            return
+        dbname = self.CONF_MANG.Getvalue(path = 'CURRENT_DB')
+        Folders = self.CONF_MANG.Getvalue(path = f'MONITERED_DB/{dbname}/file_mon') or []
+        Filters = self.CONF_MANG.Getvalue(path = f'MONITERED_DB/{dbname}/filters') or []
+
+        self.LibraryWatcher = LibraryWatcher(self.LibraryManager,
+                                             Polling = bool(self.CONF_MANG.Getvalue(path = "WATCHER_POLLING")),
+                                             Workers = self.CONF_MANG.Getvalue(path = "SCAN_WORKERS"))
+        self.LibraryWatcher.Changed.connect(lambda Dirs: self.LibraryManager.Refresh_DirectoryRows(self.LibraryTab.MainTable, Dirs))
+        self.LibraryWatcher.Error.connect(self.statusBar().showMessage)
+        for Folder in Folders:
+            self.LibraryWatcher.Watch(Folder, Filters)
 
 if __name__ == "__main__":
     from apollo.app.apollo_main import ApolloExecute
@@ -18,7 +18,7 @@ class LibraryTab:
 
         self.LibraryManager = self.UI.LibraryManager
         self.AssignObjects()
-        self.Init_MainTableModel("library")
+        self.Init_MainTableModel(self.LibraryManager.LibraryTable)
         self.Init_GroupTable()
         self.ElementsBindings()
 
@@ -204,30 +204,9 @@ class LibraryTab:
         lv_1 = QtWidgets.QMenu()
         lv_1.aboutToShow.connect(lambda: lv_1.setMinimumWidth(self.UI.apollo_TLB_LBT_grouptool.width()))
 
-        # Stats Menu
-        StatsMenu = lv_1.addMenu("Table Stats")
-        Tablename = self.MainTable.property("DB_Table")
-
-        ## Stats Menu -> TableSize_act
-        TableSize_act = QtWidgets.QAction(f"Size: {self.LibraryManager.TableSize(Tablename)} Gb", StatsMenu)
-        TableSize_act.hovered.connect(lambda:TableSize_act.setText(f"Size: {self.LibraryManager.TableSize(Tablename)} Gb"))
-        StatsMenu.addAction(TableSize_act)
-        ## Stats Menu -> TablePlaytime_act
-        TablePlaytime_act = QtWidgets.QAction(f"PlayTime: {self.LibraryManager.TablePlaytime(Tablename)}", StatsMenu)
-        TablePlaytime_act.hovered.connect(lambda: TablePlaytime_act.setText(f"PlayTime: {self.LibraryManager.TablePlaytime(Tablename)}"))
-        StatsMenu.addAction(TablePlaytime_act)
-        ## Stats Menu -> TableAlbumcount_act
-        TableAlbumcount_act = QtWidgets.QAction(f"Album Count: {self.LibraryManager.TableAlbumcount(Tablename)}", StatsMenu)
-        TableAlbumcount_act.hovered.connect(lambda: TableAlbumcount_act.setText(f"Album Count: {self.LibraryManager.TableAlbumcount(Tablename)}"))
-        StatsMenu.addAction(TableAlbumcount_act)
-        ## Stats Menu -> TableArtistcount_act
-        TableArtistcount_act = QtWidgets.QAction(f"Artist Count: {self.LibraryManager.TableArtistcount(Tablename)}", StatsMenu)
-        TableArtistcount_act.hovered.connect(lambda: TableArtistcount_act.setText(f"Artist Count: {self.LibraryManager.TableArtistcount(Tablename)}"))
-        StatsMenu.addAction(TableArtistcount_act)
-        ## Stats Menu -> TableTrackcount_act
-        TableTrackcount_act = QtWidgets.QAction(f"Track Count: {self.LibraryManager.TableTrackcount(Tablename)}", StatsMenu)
-        TableTrackcount_act.hovered.connect(lambda: TableTrackcount_act.setText(f"Track Count: {self.LibraryManager.TableTrackcount(Tablename)}"))
-        StatsMenu.addAction(TableTrackcount_act)
+        # Stats Menu -> Size, PlayTime, Album, Artist and Track counts
+        # the library stats come from the summary table and never scan the library
+        self.UI.StatsMenuBinding(lv_1, self.MainTable)
 
         return lv_1
 
@@ -3,6 +3,8 @@ import os
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtSql import QSqlQuery   
 
+from apollo.db.library_manager import DisplayValue
+
 class TrackItemWidget(QtWidgets.QWidget):# unfinished
     """"""
     
@@ -16,13 +18,14 @@ class TrackItemWidget(QtWidgets.QWidget):# unfinished
         self.DBFIELDS = ["file_id", "path_id","file_name","file_path","album",
                          "albumartist","artist","author","bpm","compilation",
                          "composer","conductor","date","discnumber","discsubtitle",
-                         "encodedby","genre","language","length","filesize",
+                         "encodedby","genre","language","duration_ms","filesize_bytes",
                          "lyricist","media","mood","organization","originaldate",
                          "performer","releasecountry","replaygain_gain","replaygain_peak",
                          "title","tracknumber","version","website","album_gain",
-                         "bitrate","bitrate_mode","channels","encoder_info","encoder_settings",
-                         "frame_offset","layer","mode","padding","protected","sample_rate",
-                         "track_gain","track_peak", "rating", "playcount"]
+                         "bitrate_bps","bitrate_mode","channels","encoder_info","encoder_settings",
+                         "frame_offset","layer","mode","padding","protected","sample_rate_hz",
+                         "track_gain","track_peak", "rating", "playcount",
+                         "artist_id", "album_id", "genre_id", "folder_id"]
         
         self.setupUi(self)
         if kwargs.get("Data"):
@@ -32,8 +35,8 @@ class TrackItemWidget(QtWidgets.QWidget):# unfinished
         self.TrackItem_LAB_artist.setText(Data[self.DBFIELDS.index("artist")])
         self.TrackItem_LAB_bitrate.setText(Data[self.DBFIELDS.index("bitrate_mode")])
         self.TrackItem_LAB_genre.setText(Data[self.DBFIELDS.index("genre")])
-        self.TrackItem_LAB_length.setText(Data[self.DBFIELDS.index("length")])
-        self.TrackItem_LAB_size.setText(Data[self.DBFIELDS.index("filesize")])
+        self.TrackItem_LAB_length.setText(DisplayValue("duration_ms", Data[self.DBFIELDS.index("duration_ms")]))
+        self.TrackItem_LAB_size.setText(DisplayValue("filesize_bytes", Data[self.DBFIELDS.index("filesize_bytes")]))
         self.TrackItem_LAB_title.setText(Data[self.DBFIELDS.index("title")])        
     
     def setupUi(self, TrackItem_WDG):
@@ -218,29 +221,8 @@ class NowPlayingTab:
         lv_1 = QtWidgets.QMenu()
         lv_1.aboutToShow.connect(lambda: lv_1.setMinimumWidth(self.UI.apollo_TLB_LBT_grouptool.width()))
         
-        # Stats Menu
-        StatsMenu = lv_1.addMenu("Table Stats")
-        Tablename = self.UI.apollo_TBV_NPQ_maintable.property("DB_Table")
-        ## Stats Menu -> TableSize_act
-        TableSize_act = QtWidgets.QAction(f"Size: {self.LibraryManager.TableSize(Tablename)} Gb", StatsMenu)
-        TableSize_act.hovered.connect(lambda:TableSize_act.setText(f"Size: {self.LibraryManager.TableSize(Tablename)} Gb"))
-        StatsMenu.addAction(TableSize_act)
-        ## Stats Menu -> TablePlaytime_act
-        TablePlaytime_act = QtWidgets.QAction(f"PlayTime: {self.LibraryManager.TablePlaytime(Tablename)}", StatsMenu)
-        TablePlaytime_act.hovered.connect(lambda: TablePlaytime_act.setText(f"PlayTime: {self.LibraryManager.TablePlaytime(Tablename)}"))
-        StatsMenu.addAction(TablePlaytime_act)
-        ## Stats Menu -> TableAlbumcount_act
-        TableAlbumcount_act = QtWidgets.QAction(f"Album Count: {self.LibraryManager.TableAlbumcount(Tablename)}", StatsMenu)
-        TableAlbumcount_act.hovered.connect(lambda: TableAlbumcount_act.setText(f"Album Count: {self.LibraryManager.TableAlbumcount(Tablename)}"))
-        StatsMenu.addAction(TableAlbumcount_act)
-        ## Stats Menu -> TableArtistcount_act
-        TableArtistcount_act = QtWidgets.QAction(f"Artist Count {self.LibraryManager.TableArtistcount(Tablename)}", StatsMenu)
-        TableArtistcount_act.hovered.connect(lambda: TableArtistcount_act.setText(f"Artist Count{self.LibraryManager.TableArtistcount(Tablename)}"))
-        StatsMenu.addAction(TableArtistcount_act)
-        ## Stats Menu -> TableTrackcount_act
-        TableTrackcount_act = QtWidgets.QAction(f"Track Count: {self.LibraryManager.TableTrackcount(Tablename)}", StatsMenu)
-        TableTrackcount_act.hovered.connect(lambda: TableTrackcount_act.setText(f"Track Count: {self.LibraryManager.TableTrackcount(Tablename)}"))
-        StatsMenu.addAction(TableTrackcount_act)        
+        # Stats Menu -> Size, PlayTime, Album, Artist and Track counts
+        self.UI.StatsMenuBinding(lv_1, self.UI.apollo_TBV_NPQ_maintable)
                 
         return lv_1
       
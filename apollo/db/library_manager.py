@@ -1,6 +1,23 @@
-import sys, os, re, datetime, re, hashlib, json, time, pathlib
+import sys, os, re, datetime, re, hashlib, json, time, pathlib, collections, mmap, asyncio, threading, difflib, contextlib, bisect
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import mutagen
+from mutagen._constants import GENRES
+from mutagen.aac import AAC
+from mutagen.aiff import AIFF
+from mutagen.asf import ASF
+from mutagen.easymp4 import EasyMP4
+from mutagen.flac import FLAC
+from mutagen.monkeysaudio import MonkeysAudio
+from mutagen.mp3 import EasyMP3
+from mutagen.musepack import Musepack
+from mutagen.oggflac import OggFLAC
+from mutagen.oggopus import OggOpus
+from mutagen.oggvorbis import OggVorbis
+from mutagen.tak import TAK
+from mutagen.wave import WAVE
+from mutagen.wavpack import WavPack
 from PyQt5.QtSql import QSqlDatabase, QSqlQuery
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtCore import Qt
@@ -13,13 +30,91 @@ root_path = apollo.__path__
 DBFIELDS = ["file_id", "path_id","file_name","file_path","album",
             "albumartist","artist","author","bpm","compilation",
             "composer","conductor","date","discnumber","discsubtitle",
-            "encodedby","genre","language","length","filesize",
+            "encodedby","genre","language","duration_ms","filesize_bytes",
             "lyricist","media","mood","organization","originaldate",
             "performer","releasecountry","replaygain_gain","replaygain_peak",
             "title","tracknumber","version","website","album_gain",
-            "bitrate","bitrate_mode","channels","encoder_info","encoder_settings",
-            "frame_offset","layer","mode","padding","protected","sample_rate",
-            "track_gain","track_peak", "rating", "playcount"]
+            "bitrate_bps","bitrate_mode","channels","encoder_info","encoder_settings",
+            "frame_offset","layer","mode","padding","protected","sample_rate_hz",
+            "track_gain","track_peak", "rating", "playcount",
+            "artist_id", "album_id", "genre_id", "folder_id"]
+
+# the numeric fields of the schema v2 and their v1 display string columns
+SCHEMA_VERSION = 2
+V1_FIELDS = {"length": "duration_ms", "filesize": "filesize_bytes",
+             "bitrate": "bitrate_bps", "sample_rate": "sample_rate_hz"}
+
+
+def DisplayValue(Field, Value):
+    """
+    Formats a stored value for display, the numeric fields are stored as
+    integers and only formatted here
+
+    >>> DisplayValue("duration_ms", 205120)
+    '0:03:25'
+
+    :Args:
+        Field: String
+            Field of the value
+        Value: Any
+            Value stored in the library table
+    """
+    if Field not in V1_FIELDS.values() or Value in (None, ""):
+        return str(Value)
+    try:
+        Value = int(Value)
+    except (TypeError, ValueError):
+        return str(Value)
+
+    if Field == "duration_ms":
+        return str(datetime.timedelta(seconds = Value // 1000))
+    elif Field == "filesize_bytes":
+        return f"{Value / 1048576:.2f}Mb"
+    elif Field == "bitrate_bps":
+        return f"{Value // 1000}Kbps"
+    else:
+        return f"{Value}Hz"
+
+
+# fields of the full text search index
+SEARCH_FIELDS = ["album", "albumartist", "artist", "author", "composer", "performer", "title"]
+
+# dimension tables of the grouping fields, the library rows reference them by their *_id columns
+DIMENSIONS = {"artist": "artists", "album": "albums", "genre": "genres", "folder": "folders"}
+
+# secondary indexes of the library queries, the lower() expression indexes back the
+# case insensitive matches of the group filters. The *_id indexes of the dimensions
+# are created with their columns.
+LIBRARY_INDEXES = {
+    # path_id lookups and deletes of the chunked scans
+    "library_path_id": "library(path_id)",
+    # prefix ranges of the folder refreshes
+    "library_file_path": "library(file_path)",
+    # distinct values and filters of the albumartist groups
+    "library_albumartist": "library(albumartist)",
+    "library_lower_albumartist": "library(lower(albumartist))",
+    # size groups of the duplicate reports
+    "duplicates_size": "duplicates(size)",
+    **{f"{Table}_lower_name": f"{Table}(lower(name))" for Table in DIMENSIONS.values()},
+}
+
+
+def DimensionName(Field, Row = "library"):
+    """
+    Returns the sql expression of the dimension name of a library row,
+    the folder is the directory of the file_path
+
+    >>> DimensionName("folder", "NEW")
+
+    :Args:
+        Field: String
+            Field of the dimension
+        Row: String
+            Table or trigger row (NEW, OLD) the columns are taken from
+    """
+    if Field == "folder":
+        return f"rtrim(rtrim({Row}.file_path, replace(replace({Row}.file_path, '/', ''), '\\', '')), '/\\')"
+    return f"{Row}.{Field}"
 
 ########################################################################################################################
 
@@ -27,6 +122,21 @@ class DataBaseManager:
     """
     Base class for all th sql related function and queries
     """
+    # seconds the lengths of fuzzy tag duplicates can differ by
+    DUPLICATE_LENGTH_TOLERANCE = 2
+    # prepared queries kept per manager
+    QUERY_CACHE_SIZE = 64
+    # spacing of the queue positions, tracks are inserted between their neighbours without renumbering
+    QUEUE_GAP = 1024
+    # bumped per connection name by every open and close, the cached queries of the older driver are dropped
+    CONNECTION_GENERATION = {}
+    GENERATION_LOCK = threading.Lock()
+    # set on every pooled connection when it opens, in memory databases keep their memory journal
+    CONNECTION_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 268435456}
+    # set while bulk loading and restored after, the journal stays in WAL so readers are never blocked
+    BULK_PRAGMAS = {"synchronous": "OFF", "cache_size": -65536, "temp_store": "MEMORY", "wal_autocheckpoint": 16384}
+    # rows committed per transaction by BatchInsert_Metadata
+    BULK_CHUNKSIZE = 5000
     def __init__(self):
         """
         Initilizes the Databse Driver and connects to DB and Initilizes the
@@ -57,10 +167,21 @@ class DataBaseManager:
             with open(db, "w"):
                 pass
 
-        self.db_driver = QSqlDatabase.addDatabase("QSQLITE")
-        self.db_driver.setUserName(name)
-        self.db_driver.setDatabaseName(db)
-        if self.IsConneted():
+        # every thread gets its own named connection of the pool, Qt connections
+        # cant be shared between threads
+        self.ConnectionName = self.PoolName(db, name)
+        # attached libraries belong to the connection
+        self.Members, self.Source, self.LibraryTable = {}, "main", "library"
+        if QSqlDatabase.contains(self.ConnectionName):
+            self.db_driver = QSqlDatabase.database(self.ConnectionName, False)
+        else:
+            self.db_driver = QSqlDatabase.addDatabase("QSQLITE", self.ConnectionName)
+            self.db_driver.setUserName(name)
+            self.db_driver.setDatabaseName(db)
+        if self.db_driver.open() and self.db_driver.isValid():
+            # opening closes the open connection, its prepared queries are gone
+            self.Bump_Generation()
+            self.Configure_Connection()
             if not self.StartUpChecks():
                 raise Exception("DB structure Invalid")
             else:
@@ -69,10 +190,60 @@ class DataBaseManager:
             raise ConnectionError()
 
     def IsConneted(self): #Tested
-        if self.db_driver.open() and self.db_driver.isValid():           
+        if self.db_driver.isOpen() and self.db_driver.isValid():
             return True
         else:
             return False
+
+    def Bump_Generation(self):
+        """
+        Drops the prepared queries every manager cached for the connection,
+        called when its driver is opened or closed
+        """
+        with DataBaseManager.GENERATION_LOCK:
+            Name = self.db_driver.connectionName()
+            DataBaseManager.CONNECTION_GENERATION[Name] = DataBaseManager.CONNECTION_GENERATION.get(Name, 0) + 1
+
+    def PoolName(self, db, name = "ConnectionMain"):
+        """
+        Returns the name of the pooled connection of a database for the
+        calling thread
+
+        >>> library_manager.PoolName("default.db")
+        'ConnectionMain:/home/user/default.db:140245'
+
+        :Args:
+            db: String
+                path of the database or :memory:
+            name: String
+                name of the connection
+        """
+        if db != ":memory:":
+            db = os.path.abspath(db)
+        return f"{name}:{db}:{threading.get_ident()}"
+
+    def Configure_Connection(self):
+        """
+        Sets the CONNECTION_PRAGMAS on the open connection. In WAL mode the
+        readers of the other connections dont block on a writer, so the views
+        can be read while a background scan writes the library.
+        """
+        for Pragma, Value in self.CONNECTION_PRAGMAS.items():
+            if Pragma == "journal_mode" and self.db_driver.databaseName() == ":memory:":
+                continue
+            QSqlQuery(f"PRAGMA {Pragma} = {Value}", self.db_driver).finish()
+
+    def Release_Connection(self):
+        """
+        Closes the connection and removes it from the pool, called by the
+        threads that are done with the database
+
+        >>> library_manager.Release_Connection()
+        """
+        self.close_connection()
+        Name = self.db_driver.connectionName()
+        del self.db_driver
+        QSqlDatabase.removeDatabase(Name)
             
     def fetchAll(self, Query, rows = None):
         """
@@ -97,6 +268,8 @@ class DataBaseManager:
 
         """
         self.db_driver.commit()
+        self.QueryCache = collections.OrderedDict()
+        self.Bump_Generation()
         self.db_driver.close()
         if not self.db_driver.isOpen():
             return True
@@ -107,24 +280,53 @@ class DataBaseManager:
         Creates the table or the view if it doesnt exist.
         """
         # checks for existance of library table
-        query = QSqlQuery()
+        query = QSqlQuery(self.db_driver)
         query.prepare("SELECT name FROM sqlite_master WHERE type = 'table' AND name = library ")        
         query.exec_()
         if not query.next():
             self.Create_LibraryTable()
-        query = QSqlQuery("SELECT cid FROM pragma_table_info('library')")
+
+        # key value settings of the library
+        self.Create_MetaTable()
+        # named value sets of the views
+        self.Create_SelectionTable()
+        self.FileIdStrategy = self.GetMeta("file_id_strategy")
+        if self.FileIdStrategy == None:
+            # libraries scanned before the strategies existed keep the header ids until migrated
+            self.FileIdStrategy = "header" if len(self.Fetch("SELECT 1 FROM library LIMIT 1")) else "fast"
+            self.SetMeta("file_id_strategy", self.FileIdStrategy)
+
+        # libraries of the v1 schema store the numeric fields as display strings,
+        # they are read as they are until Migrate_Schema runs in the background
+        if self.SchemaVersion() < SCHEMA_VERSION:
+            self.Prepare_V1Table()
+        self.SetMeta("schema_version", self.SchemaVersion())
+        # artist, album, genre and folder dimensions of the grouping queries
+        self.Create_DimensionTables()
+        # full text index of the searches
+        self.Create_SearchIndex()
+        # aggregates of the table stats
+        self.Create_StatsTable()
+
+        query = QSqlQuery("SELECT cid FROM pragma_table_info('library')", self.db_driver)
         query.exec_()
         if len(self.fetchAll(query, 1)) == len(self.db_fields):    
             LIB = True
 
-        # checks for existance of nowplaying view
-        query = QSqlQuery()
-        query.prepare("SELECT name FROM sqlite_master WHERE type = 'view' AND name = nowplaying ")        
-        query.exec_()
-        if not query.next():
-            self.Create_EmptyView("nowplaying")
+        # file manifest used by the incremental scans
+        self.Create_ManifestTable()
+        # scan journal used to resume interrupted scans
+        self.Create_JournalTable()
+        # every path of every file_id, used for the duplicate reports
+        self.Create_DuplicatesTable()
+        # secondary indexes of the library queries
+        self.Create_Indexes()
+
+        # the play queue and the nowplaying view of its tracks
+        self.Create_QueueTable()
+        self.Create_QueueView()
             
-        query = QSqlQuery("SELECT cid FROM pragma_table_info('nowplaying')")
+        query = QSqlQuery("SELECT cid FROM pragma_table_info('nowplaying')", self.db_driver)
         query.exec_()
         if len(self.fetchAll(query, 1)) == len(self.db_fields):    
             NPV = True
@@ -145,7 +347,7 @@ class DataBaseManager:
         """
         if isinstance(Query, str):
             QueryStr = Query
-            Query = QSqlQuery()
+            Query = QSqlQuery(self.db_driver)
             if Query.prepare(QueryStr) == False :
                 msg = f"""
                     Query Build Failed
@@ -165,6 +367,114 @@ class DataBaseManager:
         else:
             return Query
 
+    def ExecBatch(self, QueryStr, Columns):
+        """
+        Executes a query once for every row of the bound Columns
+
+        >>> library_manager.ExecBatch("DELETE FROM library WHERE path_id = ?", [["id1", "id2"]])
+
+        :Args:
+            QueryStr: String
+                Query with positional placeholders
+            Columns: List
+                List of value lists, one for each placeholder
+        """
+        if len(Columns) == 0 or len(Columns[0]) == 0:
+            return None
+
+        Query = QSqlQuery(self.db_driver)
+        if not Query.prepare(QueryStr):
+            raise Exception(f"Query Build Failed: {Query.lastError().text()}")
+        for Column in Columns:
+            Query.addBindValue(list(Column))
+        if not Query.execBatch():
+            raise Exception(Query.lastError().text())
+        return Query
+
+    def Prepared(self, QueryStr):
+        """
+        Returns the prepared QSqlQuery of a query string from the query cache,
+        a query is prepared once and executed again with new bound values.
+        The least recently used queries are dropped past QUERY_CACHE_SIZE.
+
+        >>> Query = library_manager.Prepared("SELECT value FROM library_meta WHERE key = ?")
+
+        :Args:
+            QueryStr: String
+                Query with positional placeholders
+        """
+        Generation = DataBaseManager.CONNECTION_GENERATION.get(self.db_driver.connectionName())
+        if getattr(self, "QueryGeneration", None) != Generation:
+            self.QueryCache = collections.OrderedDict()
+            self.QueryGeneration = Generation
+
+        Query = self.QueryCache.pop(QueryStr, None)
+        if Query == None:
+            Query = QSqlQuery(self.db_driver)
+            if not Query.prepare(QueryStr):
+                raise Exception(f"Query Build Failed: {Query.lastError().text()}")
+        self.QueryCache[QueryStr] = Query
+        if len(self.QueryCache) > self.QUERY_CACHE_SIZE:
+            self.QueryCache.popitem(last = False)
+        return Query
+
+    def Exec(self, QueryStr, *Values):
+        """
+        Executes a cached prepared query with the bound values and returns
+        the query to get results
+
+        >>> library_manager.Exec("UPDATE library SET rating = ? WHERE file_id = ?", 5, "id1")
+
+        :Args:
+            QueryStr: String
+                Query with positional placeholders
+            Values: Any
+                Values bound to the placeholders
+        """
+        Query = self.Prepared(QueryStr)
+        for Index, Value in enumerate(Values):
+            Query.bindValue(Index, Value)
+        return self.ExeQuery(Query)
+
+    def Fetch(self, QueryStr, *Values):
+        """
+        Executes a cached prepared query with the bound values and returns
+        all the rows, the query is finished so it holds no read lock
+
+        >>> library_manager.Fetch("SELECT file_id FROM library WHERE artist = ?", "Adele")
+
+        :Args:
+            QueryStr: String
+                Query with positional placeholders
+            Values: Any
+                Values bound to the placeholders
+        """
+        Query = self.Exec(QueryStr, *Values)
+        Rows = self.fetchAll(Query)
+        Query.finish()
+        return Rows
+
+    def SetSelection(self, Name, Values):
+        """
+        Stores a set of values in the selection_set table under a name and
+        returns the subquery selecting them. The subquery is used in place of
+        literal IN lists by the views, the values are bound as a single json
+        array instead of being built into the sql. Views cant bind values, so
+        only they store their selection, queries bind json_each(?) instead.
+
+        >>> Selection = library_manager.SetSelection("Viewname", ["id1", "id2"])
+        >>> library_manager.Fetch(f"SELECT * FROM library WHERE file_id IN ({Selection})")
+
+        :Args:
+            Name: String
+                Name of the selection, a view name or a fixed key
+            Values: List
+                Values of the selection
+        """
+        self.Exec("INSERT OR REPLACE INTO selection_set(name, value) VALUES (?, ?)", Name, json.dumps(list(Values)))
+        Name = Name.replace("'", "''")
+        return f"SELECT value FROM json_each((SELECT value FROM selection_set WHERE name = '{Name}'))"
+
     def IndexSelector(self, view_name, Column):
         """
         Gets Column Data from a Table and View
@@ -175,29 +485,23 @@ class DataBaseManager:
             Column: String
                 Valid Column to select data from
         """
-        query = QSqlQuery()
-        querystate = query.prepare(f"SELECT {Column} FROM {view_name}")
-        query_exe = query.exec_()
-
-        if query_exe == False and querystate == False:
-            raise Exception(f"<{query.lastQuery()}> Data retrieval Failed \nERROR: {query.lastError().text()}")
-        Indexes = []
-        while query.next():
-            value = query.value(0)
-            Indexes.append(value)
-        return Indexes
+        return [Row[0] for Row in self.Fetch(f"SELECT {Column} FROM {view_name}")]
 
 ########################################################################################################################
 # Create, Drop, Insert Type Functions
 ########################################################################################################################
 
-    def Create_LibraryTable(self): # Tested
+    def Create_LibraryTable(self, tablename = "library"): # Tested
         """
         Creates the main Library table with yhe valid column fields
+
+        :Args:
+            tablename: String
+                Name of the table, the schema migration builds library_v2
         """
-        query = QSqlQuery()
+        query = QSqlQuery(self.db_driver)
         querystate = query.prepare(f"""
-        CREATE TABLE IF NOT EXISTS library(
+        CREATE TABLE IF NOT EXISTS {tablename}(
         file_id TEXT PRIMARY KEY ON CONFLICT IGNORE,
         path_id TEXT,
         file_name TEXT,
@@ -216,8 +520,8 @@ class DataBaseManager:
         encodedby TEXT,
         genre TEXT,
         language TEXT,
-        length TEXT,
-        filesize TEXT,
+        duration_ms INTEGER,
+        filesize_bytes INTEGER,
         lyricist TEXT,
         media TEXT,
         mood TEXT,
@@ -232,7 +536,7 @@ class DataBaseManager:
         version TEXT,
         website TEXT,
         album_gain TEXT,
-        bitrate TEXT,
+        bitrate_bps INTEGER,
         bitrate_mode TEXT,
         channels INTEGER,
         encoder_info TEXT,
@@ -242,11 +546,15 @@ class DataBaseManager:
         mode TEXT,
         padding TEXT,
         protected TEXT,
-        sample_rate TEXT,
+        sample_rate_hz INTEGER,
         track_gain TEXT,
         track_peak TEXT,
         rating INTEGER,
-        playcount INTEGER)
+        playcount INTEGER,
+        artist_id INTEGER REFERENCES artists(id),
+        album_id INTEGER REFERENCES albums(id),
+        genre_id INTEGER REFERENCES genres(id),
+        folder_id INTEGER REFERENCES folders(id))
         """)
         # Error handling and execution of the query
         if querystate:
@@ -254,6 +562,319 @@ class DataBaseManager:
         else:
             raise Exception("Query Build Failed")
 
+    def Create_ManifestTable(self):
+        """
+        Creates the file manifest table, it stores the stat of every scanned
+        file so rescans only read the files that are new or changed
+        """
+        self.ExeQuery("""
+        CREATE TABLE IF NOT EXISTS file_manifest(
+        path_id TEXT PRIMARY KEY,
+        file_id TEXT,
+        file_path TEXT,
+        mtime_ns INTEGER,
+        size INTEGER,
+        inode INTEGER,
+        id_strategy TEXT)
+        """)
+        Query = self.ExeQuery("SELECT name FROM pragma_table_info('file_manifest')")
+        if "id_strategy" not in [Row[0] for Row in self.fetchAll(Query, 1)]:
+            self.ExeQuery("ALTER TABLE file_manifest ADD COLUMN id_strategy TEXT")
+        self.ExeQuery("CREATE INDEX IF NOT EXISTS file_manifest_path ON file_manifest(file_path)")
+
+    def Create_SelectionTable(self):
+        """
+        Creates the table of the named value sets the views use in place of literal IN lists
+        """
+        self.ExeQuery("CREATE TABLE IF NOT EXISTS selection_set(name TEXT PRIMARY KEY, value TEXT)")
+
+    def Create_Indexes(self, Table = None):
+        """
+        Creates the LIBRARY_INDEXES
+
+        :Args:
+            Table: String
+                only creates the indexes of this table if given
+        """
+        for Name, On in LIBRARY_INDEXES.items():
+            if Table == None or On.startswith(f"{Table}("):
+                self.ExeQuery(f"CREATE INDEX IF NOT EXISTS {Name} ON {On}")
+
+    def QueryPlan(self, QueryStr, *Values):
+        """
+        Returns the detail lines of the EXPLAIN QUERY PLAN of a query
+
+        >>> library_manager.QueryPlan("SELECT * FROM library WHERE path_id = ?", "id1")
+        ['SEARCH library USING INDEX library_path_id (path_id=?)']
+
+        :Args:
+            QueryStr: String
+                Query with positional placeholders
+            Values: Any
+                Values bound to the placeholders
+        """
+        return [Row[3] for Row in self.Fetch(f"EXPLAIN QUERY PLAN {QueryStr}", *Values)]
+
+    def Create_QueueTable(self):
+        """
+        Creates the queue table of the nowplaying tracks. The positions are
+        spaced by QUEUE_GAP so tracks are inserted and removed without
+        rewriting the rest of the queue, the primary key keeps them ordered.
+        """
+        self.ExeQuery("CREATE TABLE IF NOT EXISTS queue(position INTEGER PRIMARY KEY, file_id TEXT NOT NULL)")
+        self.ExeQuery("CREATE INDEX IF NOT EXISTS queue_file_id ON queue(file_id)")
+
+    def Create_QueueView(self):
+        """
+        Creates the nowplaying view of the queued library rows in queue order,
+        views of older versions that were rebuilt for every queue change are
+        replaced
+        """
+        # the cross join keeps the queue as the outer loop, the library rows are searched by file_id
+        View = dedenter("""
+        CREATE VIEW nowplaying AS
+        SELECT library.* FROM queue
+        CROSS JOIN library ON library.file_id = queue.file_id
+        ORDER BY queue.position""", 8).strip()
+        Rows = self.Fetch("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'nowplaying'")
+        if len(Rows) != 0 and Rows[0][0] != View:
+            self.DropView("nowplaying")
+        if len(Rows) == 0 or Rows[0][0] != View:
+            self.ExeQuery(View)
+
+    def Create_MetaTable(self):
+        """
+        Creates the key value table used for the library settings
+        """
+        self.ExeQuery("CREATE TABLE IF NOT EXISTS library_meta(key TEXT PRIMARY KEY, value TEXT)")
+
+    def GetMeta(self, Key, Default = None):
+        """
+        Returns the value of a library setting
+
+        >>> library_manager.GetMeta("file_id_strategy")
+        """
+        Rows = self.Fetch("SELECT value FROM library_meta WHERE key = ?", Key)
+        return Rows[0][0] if len(Rows) else Default
+
+    def SetMeta(self, Key, Value):
+        """
+        Sets the value of a library setting
+
+        >>> library_manager.SetMeta("file_id_strategy", "fast")
+        """
+        self.Exec("INSERT OR REPLACE INTO library_meta(key, value) VALUES (?, ?)", Key, Value)
+
+    def Create_JournalTable(self):
+        """
+        Creates the scan journal table, it stores the queued scan roots, their
+        status (queued, scanning, done) and the last directory committed
+        """
+        self.ExeQuery("""
+        CREATE TABLE IF NOT EXISTS scan_journal(
+        root TEXT PRIMARY KEY,
+        filters TEXT,
+        status TEXT,
+        last_dir TEXT,
+        updated_at INTEGER)
+        """)
+
+    def Create_DuplicatesTable(self):
+        """
+        Creates the duplicates table, it maps every scanned path to its
+        file_id. The library keeps one row per file_id, the other paths of
+        the same file are only recorded here.
+        """
+        self.ExeQuery("""
+        CREATE TABLE IF NOT EXISTS duplicates(
+        path_id TEXT PRIMARY KEY,
+        file_id TEXT,
+        file_path TEXT,
+        size INTEGER)
+        """)
+        self.ExeQuery("CREATE INDEX IF NOT EXISTS duplicates_file_id ON duplicates(file_id)")
+
+    def Create_DimensionTables(self):
+        """
+        Creates the artist, album, genre and folder dimension tables and the
+        triggers that fill them and the *_id columns of the library on every
+        insert, update and delete. Libraries created before the dimensions
+        get the columns added and the dimensions built from their rows.
+        """
+        Query = self.ExeQuery("SELECT name FROM pragma_table_info('library')")
+        Columns = [Row[0] for Row in self.fetchAll(Query, 1)]
+        for Field, Table in DIMENSIONS.items():
+            self.ExeQuery(f"""
+            CREATE TABLE IF NOT EXISTS {Table}(
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            tracks INTEGER NOT NULL DEFAULT 0)
+            """)
+            if f"{Field}_id" not in Columns:
+                self.ExeQuery(f"ALTER TABLE library ADD COLUMN {Field}_id INTEGER REFERENCES {Table}(id)")
+            self.ExeQuery(f"CREATE INDEX IF NOT EXISTS library_{Field}_id ON library({Field}_id)")
+
+        Inserts = "\n".join([f"""
+            INSERT OR IGNORE INTO {Table}(name) SELECT {DimensionName(Field, "NEW")} WHERE {DimensionName(Field, "NEW")} IS NOT NULL;
+            UPDATE {Table} SET tracks = tracks + 1 WHERE name = {DimensionName(Field, "NEW")};"""
+            for Field, Table in DIMENSIONS.items()])
+        Ids = ", ".join([f"{Field}_id = (SELECT id FROM {Table} WHERE name = {DimensionName(Field, 'NEW')})"
+                         for Field, Table in DIMENSIONS.items()])
+        Deletes = "\n".join([f"""
+            UPDATE {Table} SET tracks = tracks - 1 WHERE id = OLD.{Field}_id;
+            DELETE FROM {Table} WHERE id = OLD.{Field}_id AND tracks <= 0;"""
+            for Field, Table in DIMENSIONS.items()])
+        self.ExeQuery(f"""
+        CREATE TRIGGER IF NOT EXISTS library_dimensions_insert AFTER INSERT ON library BEGIN
+            {Inserts}
+            UPDATE library SET {Ids} WHERE rowid = NEW.rowid;
+        END
+        """)
+        self.ExeQuery(f"""
+        CREATE TRIGGER IF NOT EXISTS library_dimensions_delete AFTER DELETE ON library BEGIN
+            {Deletes}
+        END
+        """)
+        # retags and moves only touch the dimensions whose name changed
+        for Field, Table in DIMENSIONS.items():
+            Column = "file_path" if Field == "folder" else Field
+            Old, New = DimensionName(Field, "OLD"), DimensionName(Field, "NEW")
+            self.ExeQuery(f"""
+            CREATE TRIGGER IF NOT EXISTS library_{Field}_update AFTER UPDATE OF {Column} ON library
+            WHEN {Old} IS NOT {New} BEGIN
+                UPDATE {Table} SET tracks = tracks - 1 WHERE id = OLD.{Field}_id;
+                DELETE FROM {Table} WHERE id = OLD.{Field}_id AND tracks <= 0;
+                INSERT OR IGNORE INTO {Table}(name) SELECT {New} WHERE {New} IS NOT NULL;
+                UPDATE {Table} SET tracks = tracks + 1 WHERE name = {New};
+                UPDATE library SET {Field}_id = (SELECT id FROM {Table} WHERE name = {New}) WHERE rowid = NEW.rowid;
+            END
+            """)
+
+        if self.GetMeta("dimensions") == None:
+            self.Rebuild_Dimensions()
+
+    def Rebuild_Dimensions(self):
+        """
+        Rebuilds the dimension tables and the *_id columns from the library
+        rows in a single transaction
+        """
+        self.db_driver.transaction()
+        for Field, Table in DIMENSIONS.items():
+            Name = DimensionName(Field)
+            self.ExeQuery(f"DELETE FROM {Table}")
+            self.ExeQuery(f"INSERT OR IGNORE INTO {Table}(name) SELECT DISTINCT {Name} FROM library WHERE {Name} IS NOT NULL")
+            self.ExeQuery(f"UPDATE library SET {Field}_id = (SELECT id FROM {Table} WHERE name = {Name})")
+            self.ExeQuery(f"UPDATE {Table} SET tracks = (SELECT count(*) FROM library WHERE {Field}_id = {Table}.id)")
+        self.SetMeta("dimensions", 1)
+        self.db_driver.commit()
+
+    def Create_SearchIndex(self):
+        """
+        Creates the library_fts full text index over the SEARCH_FIELDS of the
+        library and the triggers that keep it in sync. The index uses the
+        library as its content table, tokens are matched case and diacritic
+        insensitive and the 2 and 3 character prefixes are indexed for the
+        search as you type. A missing or stale index is rebuilt.
+        """
+        Fields = ", ".join(SEARCH_FIELDS)
+        New = ", ".join([f"NEW.{Field}" for Field in SEARCH_FIELDS])
+        Old = ", ".join([f"OLD.{Field}" for Field in SEARCH_FIELDS])
+        self.ExeQuery(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(
+        {Fields},
+        content = 'library',
+        content_rowid = 'rowid',
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3')
+        """)
+        self.ExeQuery(f"""
+        CREATE TRIGGER IF NOT EXISTS library_fts_insert AFTER INSERT ON library BEGIN
+            INSERT INTO library_fts(rowid, {Fields}) VALUES (NEW.rowid, {New});
+        END
+        """)
+        self.ExeQuery(f"""
+        CREATE TRIGGER IF NOT EXISTS library_fts_delete AFTER DELETE ON library BEGIN
+            INSERT INTO library_fts(library_fts, rowid, {Fields}) VALUES ('delete', OLD.rowid, {Old});
+        END
+        """)
+        self.ExeQuery(f"""
+        CREATE TRIGGER IF NOT EXISTS library_fts_update AFTER UPDATE OF {Fields} ON library BEGIN
+            INSERT INTO library_fts(library_fts, rowid, {Fields}) VALUES ('delete', OLD.rowid, {Old});
+            INSERT INTO library_fts(rowid, {Fields}) VALUES (NEW.rowid, {New});
+        END
+        """)
+
+        if self.GetMeta("search_index") == None:
+            self.ExeQuery("INSERT INTO library_fts(library_fts) VALUES ('rebuild')")
+            self.SetMeta("search_index", 1)
+
+    def Create_StatsTable(self):
+        """
+        Creates the single row library_stats table of the library aggregates.
+        The track count, duration and size are kept by triggers on the library
+        and the dimension counts by triggers on the dimension tables, so the
+        stats are read without scanning the library.
+        """
+        Dimensions = ", ".join([f"{Table} INTEGER NOT NULL DEFAULT 0" for Table in DIMENSIONS.values()])
+        self.ExeQuery(f"""
+        CREATE TABLE IF NOT EXISTS library_stats(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        tracks INTEGER NOT NULL DEFAULT 0,
+        duration_ms INTEGER NOT NULL DEFAULT 0,
+        filesize_bytes INTEGER NOT NULL DEFAULT 0,
+        {Dimensions})
+        """)
+        self.ExeQuery("""
+        CREATE TRIGGER IF NOT EXISTS library_stats_insert AFTER INSERT ON library BEGIN
+            UPDATE library_stats SET tracks = tracks + 1,
+            duration_ms = duration_ms + coalesce(NEW.duration_ms, 0),
+            filesize_bytes = filesize_bytes + coalesce(NEW.filesize_bytes, 0);
+        END
+        """)
+        self.ExeQuery("""
+        CREATE TRIGGER IF NOT EXISTS library_stats_delete AFTER DELETE ON library BEGIN
+            UPDATE library_stats SET tracks = tracks - 1,
+            duration_ms = duration_ms - coalesce(OLD.duration_ms, 0),
+            filesize_bytes = filesize_bytes - coalesce(OLD.filesize_bytes, 0);
+        END
+        """)
+        self.ExeQuery("""
+        CREATE TRIGGER IF NOT EXISTS library_stats_update AFTER UPDATE OF duration_ms, filesize_bytes ON library BEGIN
+            UPDATE library_stats SET
+            duration_ms = duration_ms - coalesce(OLD.duration_ms, 0) + coalesce(NEW.duration_ms, 0),
+            filesize_bytes = filesize_bytes - coalesce(OLD.filesize_bytes, 0) + coalesce(NEW.filesize_bytes, 0);
+        END
+        """)
+        for Table in DIMENSIONS.values():
+            self.ExeQuery(f"""
+            CREATE TRIGGER IF NOT EXISTS {Table}_stats_insert AFTER INSERT ON {Table} BEGIN
+                UPDATE library_stats SET {Table} = {Table} + 1;
+            END
+            """)
+            self.ExeQuery(f"""
+            CREATE TRIGGER IF NOT EXISTS {Table}_stats_delete AFTER DELETE ON {Table} BEGIN
+                UPDATE library_stats SET {Table} = {Table} - 1;
+            END
+            """)
+
+        if self.GetMeta("stats") == None:
+            self.Rebuild_Stats()
+
+    def Rebuild_Stats(self):
+        """
+        Recomputes the library_stats row from the library and the dimension tables
+        """
+        Dimensions = ", ".join(DIMENSIONS.values())
+        Counts = ", ".join([f"(SELECT count(*) FROM {Table})" for Table in DIMENSIONS.values()])
+        self.db_driver.transaction()
+        self.ExeQuery(f"""
+        INSERT OR REPLACE INTO library_stats(id, tracks, duration_ms, filesize_bytes, {Dimensions})
+        SELECT 1, count(*), coalesce(sum(duration_ms), 0), coalesce(sum(filesize_bytes), 0), {Counts}
+        FROM library
+        """)
+        self.SetMeta("stats", 1)
+        self.db_driver.commit()
+
     def Create_EmptyView(self, view_name): # Tested
         """
         Creates an empty view as an placeholder for display
@@ -264,7 +885,7 @@ class DataBaseManager:
             view_name: String
                 Valid view name from (now_playing)
         """
-        query = QSqlQuery()
+        query = QSqlQuery(self.db_driver)
         columns = ", ".join([f"NULL AS {k}" for k in  self.db_fields])
         querystate = query.prepare(f"""
                                    CREATE VIEW IF NOT EXISTS {view_name} AS
@@ -284,7 +905,7 @@ class DataBaseManager:
 
         :Args:
             view_name: String
-                Valid view name from (now_playing)
+                Valid view name, the nowplaying view is backed by the queue table
             FilterField: String
                 Valid field to select data from
             Selector: List
@@ -298,12 +919,54 @@ class DataBaseManager:
             Filter: Bool
                 Query Type to use for selecting data
         """
+        if view_name == "nowplaying":
+            raise Exception("nowplaying is the view of the queue table, use the Queue functions")
+
         # Drops thgiven view to create a new view
         self.DropView(view_name)
-        query = QSqlQuery()
+        self.ExeQuery(f"CREATE VIEW IF NOT EXISTS {view_name} AS {self.SelectionQuery(view_name, Selector, **kwargs)}")
+
+        # gets the data that has been applied and selected
+        return self.IndexSelector(view_name, "file_id")
+
+    def SelectIndexes(self, Selector, **kwargs):
+        """
+        Returns the file_ids of the library rows a selection matches without
+        creating a view, used to fill the queue
+
+        >>> library_manager.SelectIndexes(["Adele"], Filter = True, FilterField = "artist")
+
+        :Args:
+            Selector: List
+                Valid Selector to select and filter out Rows from the table
+            kwargs:
+                Query type and fields of CreateView
+        """
+        # the selection is bound to the query, a read writes nothing to the database
+        return [Row[0] for Row in self.Fetch(f"""
+        WITH selected AS (SELECT value FROM json_each(?)), selected_id AS (SELECT value FROM json_each(?))
+        SELECT file_id FROM ({self.SelectionQuery(None, Selector, **kwargs)})
+        """, json.dumps(list(Selector)), json.dumps(list(kwargs.get("ID") or [])))]
+
+    def SelectionQuery(self, Name, Selector, **kwargs):
+        """
+        Returns the select query of the library rows matching a selection, the
+        selected items are stored in the selection_set under the name
 
-        # creates a a query string of items needed to be selected
-        FilterItems =  ", ".join([f"'{value}'"for value in Selector])
+        :Args:
+            Name: String
+                Name of the selection, None reads the items from the selected
+                and selected_id tables of the enclosing query
+            Selector: List
+                Valid Selector to select and filter out Rows from the table
+            kwargs:
+                Query type and fields of CreateView
+        """
+        if Name == None:
+            Selection, ID = "SELECT value FROM selected", "SELECT value FROM selected_id"
+        else:
+            Selection = self.SetSelection(Name, Selector)
+        Library = self.LibraryTable
 
         # sets the column used to look data from
         if kwargs.get("FilterField") == None:
@@ -313,47 +976,45 @@ class DataBaseManager:
 
         # a list of all file ID used for indexing
         if kwargs.get("Filter") != None:
-            if kwargs.get("ID") != None:
-                ID = ", ".join([f"'{v}'"for v in kwargs.get("ID")])
-            else:
-                ID = ""
-
-            querystate = query.prepare(f"""
-            CREATE VIEW IF NOT EXISTS {view_name} AS
-            SELECT * FROM library WHERE file_id IN (
-            SELECT file_id
-            FROM library
-            WHERE {Field} IN ({FilterItems})
-            OR lower({Field}) IN ({FilterItems})
-            OR file_id IN ({ID})
+            if Name != None:
+                ID = self.SetSelection(f"{Name}_id", kwargs.get("ID") or [])
+
+            # the grouping fields are looked up in their dimension and matched by the indexed ids,
+            # every match is its own union term so each one searches its index
+            if Field in DIMENSIONS:
+                Table = DIMENSIONS[Field]
+                # the ids are looked up in the dimension of every attached library
+                Members = "".join([f"""
+                SELECT file_id FROM {Schema}.library WHERE {Field}_id IN (
+                SELECT id FROM {Schema}.{Table} WHERE name IN ({Selection})
+                UNION SELECT id FROM {Schema}.{Table} WHERE lower(name) IN ({Selection}))
+                UNION""" for Source, Schema in self.Sources(Library)])
+                return f"""
+                SELECT * FROM {Library} WHERE file_id IN ({Members} {ID}
+                )
+                ORDER BY file_id
+                """
+            return f"""
+            SELECT * FROM {Library} WHERE file_id IN (
+            SELECT file_id FROM {Library} WHERE {Field} IN ({Selection})
+            UNION SELECT file_id FROM {Library} WHERE lower({Field}) IN ({Selection})
+            UNION {ID}
             )
-            """)
+            """
 
         # indexing items and shuffling the order
-        elif kwargs.get("Shuffled") != None:
-            querystate = query.prepare(f"""
-            CREATE VIEW IF NOT EXISTS {view_name} AS
-            SELECT * FROM library WHERE {Field} IN ({FilterItems})
+        if kwargs.get("Shuffled") != None:
+            return f"""
+            SELECT * FROM {Library} WHERE {Field} IN ({Selection})
             ORDER BY RANDOM()
-            """)
+            """
 
         # normal filtering using the selected indexes
-        elif kwargs.get("Normal") != None:
-            querystate = query.prepare(f"""
-            CREATE VIEW IF NOT EXISTS {view_name} AS
-            SELECT * FROM library WHERE {Field} IN ({FilterItems})
-            """)
-        else:
-             pass
-
-        # Error handling and execution of the query
-        if querystate:
-            self.ExeQuery(query)
-        else:
-            raise Exception("Query Build Failed")
-
-        # gets the data that has been applied and selected
-        return self.IndexSelector("nowplaying", "file_id")
+        if kwargs.get("Normal") != None:
+            return f"""
+            SELECT * FROM {Library} WHERE {Field} IN ({Selection})
+            """
+        raise Exception("Query Build Failed")
 
     def DropTable(self, tablename):
         """
@@ -365,7 +1026,7 @@ class DataBaseManager:
         :Error:
             Exceptions are raised if the query fails
         """
-        query = QSqlQuery()
+        query = QSqlQuery(self.db_driver)
         querystate = query.prepare(f"DROP TABLE IF EXISTS {tablename}")
         # Error handling and execution of the query
         if querystate:
@@ -386,7 +1047,7 @@ class DataBaseManager:
         :Error:
             Exceptions are raised if the query fails
         """
-        query = QSqlQuery()
+        query = QSqlQuery(self.db_driver)
         querystate = query.prepare(f"DROP VIEW IF EXISTS {viewname}")
         # Error handling and execution of the query
         if querystate:
@@ -395,262 +1056,2766 @@ class DataBaseManager:
             raise Exception("Query Build Failed")
 
 
-    def BatchInsert_Metadata(self, metadata):
+    @contextlib.contextmanager
+    def BulkLoad(self, Deferred = False):
+        """
+        Context that switches the connection to the BULK_PRAGMAS for a large
+        insert and restores its settings after. The journal stays in WAL, so
+        the readers of the other connections keep reading the committed rows
+        while the load runs. The yielded dict counts the loaded rows and
+        gets the seconds and rows_per_second of the load when it exits,
+        nested loads share the dict of the outer one.
+
+        >>> with library_manager.BulkLoad() as Load:
+        ...     library_manager.Insert_Metadata(metadata)
+        ...     Load["rows"] += 100
+        >>> Load["rows_per_second"]
+        52000.0
+
+        :Args:
+            Deferred: Bool
+                drops the insert triggers of the dimensions, the search index
+                and the stats for the load and rebuilds them from the library
+                after it. Only for loads that neither delete nor update rows,
+                the rows of the load are missing from the search and the
+                dimensions until it exits.
+        """
+        if getattr(self, "Load", None) != None:
+            yield self.Load
+            return
+
+        Previous = {Pragma: self.Fetch(f"PRAGMA {Pragma}")[0][0] for Pragma in self.BULK_PRAGMAS}
+        for Pragma, Value in self.BULK_PRAGMAS.items():
+            QSqlQuery(f"PRAGMA {Pragma} = {Value}", self.db_driver).finish()
+        if Deferred:
+            for Trigger in ["library_dimensions_insert", "library_fts_insert", "library_stats_insert"]:
+                self.ExeQuery(f"DROP TRIGGER IF EXISTS {Trigger}")
+            self.ExeQuery("DELETE FROM library_meta WHERE key IN ('dimensions', 'search_index', 'stats')")
+        self.Load = {"rows": 0, "seconds": 0.0, "rows_per_second": 0.0}
+        Start = time.perf_counter()
+        try:
+            yield self.Load
+        finally:
+            Load, self.Load = self.Load, None
+            if Deferred:
+                # the triggers are created again and the missing meta keys rebuild their tables
+                self.Create_DimensionTables()
+                self.Create_SearchIndex()
+                self.Create_StatsTable()
+            for Pragma, Value in Previous.items():
+                QSqlQuery(f"PRAGMA {Pragma} = {Value}", self.db_driver).finish()
+            # a passive checkpoint doesnt wait on the readers
+            QSqlQuery("PRAGMA wal_checkpoint(PASSIVE)", self.db_driver).finish()
+            Load["seconds"] = time.perf_counter() - Start
+            if Load["seconds"] > 0:
+                Load["rows_per_second"] = Load["rows"] / Load["seconds"]
+
+    def BatchInsert_Metadata(self, metadata, Upsert = False):
+        """
+        Batch Inserts data into library table in bulk load mode, every
+        BULK_CHUNKSIZE rows are committed in their own transaction
+
+        >>> library_manager.BatchInsert_Metadata(metadata)
+        52000.0
+
+        :Args:
+            metadata: Dict
+                Distonary of all the combined metadata
+            Upsert: Bool
+                updates the rows of the file_ids that are already in the library
+
+        :Return: Float
+            rows inserted per second
+        """
+        Rows = len(next(iter(metadata.values()), []))
+        # a large load into an empty library builds its dimensions and search index once at the end
+        Deferred = (not Upsert) and Rows > self.BULK_CHUNKSIZE and len(self.Fetch("SELECT 1 FROM library LIMIT 1")) == 0
+        with self.BulkLoad(Deferred) as Load:
+            for Start in range(0, Rows, self.BULK_CHUNKSIZE):
+                Chunk = {Field: Values[Start: Start + self.BULK_CHUNKSIZE] for Field, Values in metadata.items()}
+                self.db_driver.transaction()
+                self.Insert_Metadata(Chunk, Upsert)
+                if not self.db_driver.commit():
+                    raise Exception(self.db_driver.lastError().text())
+                Load["rows"] += len(next(iter(Chunk.values())))
+        return Load["rows_per_second"]
+
+    def Insert_Metadata(self, metadata, Upsert = False):
         """
-        Batch Inserts data into library table
+        Inserts data into library table without managing the transaction
 
         :Args:
             metadata: Dict
                 Distonary of all the combined metadata
-        """       
-        query = QSqlQuery()
+            Upsert: Bool
+                updates the rows of the file_ids that are already in the
+                library, a row is only updated by the file of its own path_id,
+                copies at other paths leave it as it is
+        """
         columns =", ".join(metadata.keys())
         placeholders =  ", ".join(["?" for i in range(len(metadata.keys()))])
-        query.prepare(f"""INSERT INTO library ({columns}) VALUES ({placeholders})""")
-        for keys in metadata.keys():
-            query.addBindValue(metadata.get(keys))
-            
-
-        self.db_driver.transaction()
-        
-        QSqlQuery("PRAGMA journal_mode = MEMORY").exec_()
+        QueryStr = f"""INSERT INTO library ({columns}) VALUES ({placeholders})"""
+        if Upsert:
+            Updates = ", ".join([f"{Field} = excluded.{Field}" for Field in metadata.keys() if Field != "file_id"])
+            QueryStr += f" ON CONFLICT(file_id) DO UPDATE SET {Updates}"
+            if "path_id" in metadata:
+                QueryStr += " WHERE library.path_id IS excluded.path_id"
+        self.ExecBatch(QueryStr, list(metadata.values()))
+
+    def DeleteFileIds(self, tablename, FileIds):
+        """
+        Deletes the rows of the file ids from a table
 
-        if not query.execBatch():
-            raise Exception(query.lastError().text())
-        
-        QSqlQuery("PRAGMA journal_mode = WAL").exec_()
-        
-        self.db_driver.commit()
+        >>> library_manager.DeleteFileIds("library", ["id1", "id2"])
 
-########################################################################################################################
-# Table Stats Query
-########################################################################################################################
+        :Args:
+            tablename: String
+                Name of the table, the rows of nowplaying are removed from the queue
+                and the rows of library_all from every attached library. The
+                library rows are removed from the queue too.
+            FileIds: List
+                file_id of the rows to delete
+        """
+        if tablename == "nowplaying":
+            tablename = "queue"
+        if tablename in ["library", "library_all"]:
+            # the queued tracks of the removed rows would point at nothing
+            self.DeleteFileIds("queue", FileIds)
+        if tablename == "library_all":
+            for Source, Schema in self.Sources():
+                self.DeleteFileIds(f"{Schema}.library", FileIds)
+            return True
+        return self.Exec(f"DELETE FROM {tablename} WHERE file_id IN (SELECT value FROM json_each(?))",
+                         json.dumps(list(FileIds)))
 
-    def TableSize(self, tablename):
+    def SetRating(self, tablename, FileIds, Amount):
         """
-        Calculates the total size in Gigabytes of all the files monitered.
-        Returns the Gigabyte as a Float.
+        Sets the rating of the rows of the file ids
+
+        >>> library_manager.SetRating("library", ["id1", "id2"], 5)
 
         :Args:
             tablename: String
-                Name of the table or view to be queried
+                Name of the table
+            FileIds: List
+                file_id of the rows to rate
+            Amount: Int
+                rating to set
         """
-        query = QSqlQuery(f"SELECT round(sum(filesize)/1024, 2) FROM {tablename}")
-        query.exec_()
-        if query.next():
-            value = (query.value(0))
-            if value != "":
-                return value
-            else:
-                return 0
-        else:
-            return 0
+        if tablename == "library_all":
+            for Source, Schema in self.Sources():
+                self.SetRating(f"{Schema}.library", FileIds, Amount)
+            return True
+        return self.Exec(f"UPDATE {tablename} SET rating = ? WHERE file_id IN (SELECT value FROM json_each(?))",
+                         Amount, json.dumps(list(FileIds)))
 
-    def TablePlaytime(self, tablename):
+    def Queue_FileIds(self):
         """
-        Calculates the total playtime of all the files monitered.
-        Returns the Playtime as a String.
+        Returns the file_ids of the queue in queue order
+        """
+        return [Row[0] for Row in self.Fetch("SELECT file_id FROM queue ORDER BY position")]
 
-        :Args:
-            tablename: String
-                Name of the table or view to be queried
+    def Queue_Set(self, FileIds):
         """
-        query = QSqlQuery(f"""
-                          SELECT sum(substr(length,1,1))*360 + sum(substr(length,3,2))*60 +sum(substr(length,6,2))
-                          FROM {tablename}""")
-        query.exec_()
-        if query.next():
-            value = query.value(0)
-            value = "0" if value == "" else datetime.timedelta(seconds = value)
+        Replaces the queue with the file ids
 
-            return value
-        else:
-            return "0"
+        >>> library_manager.Queue_Set(["id1", "id2"])
+        """
+        self.db_driver.transaction()
+        self.Exec("DELETE FROM queue")
+        self.Queue_Insert(FileIds)
+        self.db_driver.commit()
 
-    def TableAlbumcount(self, tablename):
+    def Queue_Insert(self, FileIds, Index = None):
         """
-        Calculates the total count of album of all the files monitered.
-        Returns the album count as a Int.
+        Inserts the file ids into the queue before the track at an index, the
+        new positions are spaced out between the neighbouring positions so
+        only the inserted rows are written. The queue is renumbered once the
+        gap between two neighbours runs out.
+
+        >>> library_manager.Queue_Insert(["id3"], Index = 1)
 
         :Args:
-            tablename: String
-                Name of the table or view to be queried
+            FileIds: List
+                file_id of the tracks to insert
+            Index: Int
+                index of the track to insert before, appends if None or past the end
         """
-        query = QSqlQuery(f"SELECT count(DISTINCT album) FROM {tablename}")
-        query.exec_()
-        if query.next():
-            return (query.value(0))
-        else:
-            return 0
+        FileIds = list(FileIds)
+        if len(FileIds) == 0:
+            return None
 
-    def TableArtistcount(self, tablename):
+        Before, After = self.Queue_Neighbours(Index)
+        if After == None:
+            After = Before + self.QUEUE_GAP * (len(FileIds) + 1)
+        Step = (After - Before) // (len(FileIds) + 1)
+        if Step < 1:
+            # no room left between the neighbours, the queue is rewritten with the tracks in place
+            Queue = self.Queue_FileIds()
+            Index = len(Queue) if Index == None else max(0, Index)
+            return self.Queue_Renumber(Queue[:Index] + FileIds + Queue[Index:])
+
+        Positions = [Before + Step * (Offset + 1) for Offset in range(len(FileIds))]
+        return self.ExecBatch("INSERT INTO queue(position, file_id) VALUES (?, ?)", [Positions, FileIds])
+
+    def Queue_Neighbours(self, Index = None):
         """
-        Calculates the total count of albumartist of all the files monitered.
-        Returns the albumartist count as a Int.
+        Returns the positions of the tracks before and at an index of the
+        queue, 0 stands in for the start and None for the end of the queue
+        """
+        if Index == None:
+            return self.Fetch("SELECT max(position) FROM queue")[0][0] or 0, None
+        if Index <= 0:
+            return 0, self.Fetch("SELECT min(position) FROM queue")[0][0]
+        Rows = self.Fetch("SELECT position FROM queue ORDER BY position LIMIT 2 OFFSET ?", Index - 1)
+        if len(Rows) == 0:
+            # past the end of the queue
+            return self.Queue_Neighbours()
+        return Rows[0][0], (Rows[1][0] if len(Rows) == 2 else None)
+
+    def Queue_Remove(self, Start, End = None):
+        """
+        Removes the tracks between two indexes of the queue
+
+        >>> library_manager.Queue_Remove(2, 5)
 
         :Args:
-            tablename: String
-                Name of the table or view to be queried
+            Start: Int
+                index of the first track to remove
+            End: Int
+                index after the last track, removes the track at Start if None
         """
-        query = QSqlQuery(f"SELECT count(DISTINCT artist) FROM {tablename}")
-        query.exec_()
-        if query.next():
-            return (query.value(0))
-        else:
-            return 0
+        End = Start + 1 if End == None else End
+        return self.Exec("""
+        DELETE FROM queue WHERE position IN (
+        SELECT position FROM queue ORDER BY position LIMIT ? OFFSET ?)
+        """, End - Start, Start)
 
-    def TableTrackcount(self, tablename):
+    def Queue_Renumber(self, FileIds = None):
+        """
+        Rewrites the queue with its positions QUEUE_GAP apart again
+
+        :Args:
+            FileIds: List
+                file_id of the tracks in their new order, the current queue if None
+        """
+        FileIds = self.Queue_FileIds() if FileIds == None else FileIds
+        # a savepoint nests inside the transactions of the callers
+        self.ExeQuery("SAVEPOINT queue_renumber")
+        self.Exec("DELETE FROM queue")
+        self.ExecBatch("INSERT INTO queue(position, file_id) VALUES (?, ?)",
+                       [[self.QUEUE_GAP * (Index + 1) for Index in range(len(FileIds))], FileIds])
+        self.ExeQuery("RELEASE queue_renumber")
+
+    def Update_Manifest(self, Entries):
+        """
+        Inserts or replaces the manifest entries of scanned files
+
+        :Args:
+            Entries: List
+                List of (path_id, file_id, file_path, mtime_ns, size, inode, id_strategy)
+        """
+        self.ExecBatch("INSERT OR REPLACE INTO file_manifest VALUES (?, ?, ?, ?, ?, ?, ?)", list(zip(*Entries)))
+
+    def Delete_PathIds(self, PathIds):
+        """
+        Deletes the library rows and manifest entries of the given path ids
+
+        :Args:
+            PathIds: List
+                path_id of the files to purge
+        """
+        # copies of a purged library row lose their manifest entry, so the next
+        # rescan reads one of them back into the library
+        self.ExecBatch("""
+        DELETE FROM file_manifest WHERE path_id IN (
+        SELECT copies.path_id FROM library
+        JOIN duplicates AS copies ON copies.file_id = library.file_id AND copies.path_id != library.path_id
+        WHERE library.path_id = ?)
+        """, [PathIds])
+        self.ExecBatch("DELETE FROM library WHERE path_id = ?", [PathIds])
+        self.ExecBatch("DELETE FROM file_manifest WHERE path_id = ?", [PathIds])
+        self.ExecBatch("DELETE FROM duplicates WHERE path_id = ?", [PathIds])
+
+    def Update_Duplicates(self, Entries):
+        """
+        Records the file_id of the scanned paths
+
+        :Args:
+            Entries: List
+                List of (path_id, file_id, file_path, size)
+        """
+        self.ExecBatch("INSERT OR REPLACE INTO duplicates VALUES (?, ?, ?, ?)", list(zip(*Entries)))
+
+########################################################################################################################
+# Federation
+########################################################################################################################
+
+    def Federate(self, Libraries, Source = "main"):
+        """
+        Attaches the other library databases to the connection so they are
+        queried as one library through the library_all view, the libraries
+        stay in their own files
+
+        >>> library_manager.Federate({"Laptop": "laptop.db", "NAS": "nas.db"}, Source = "Default")
+        >>> library_manager.LibraryTable
+        'library_all'
+
+        :Args:
+            Libraries: Dict
+                name and path of the libraries to attach
+            Source: String
+                source name of the rows of the main database
+        """
+        self.Source = Source
+        for Name, Path in Libraries.items():
+            self.Attach_Library(Name, Path)
+        self.Create_FederatedViews()
+
+    def Attach_Library(self, Name, Path):
+        """
+        Attaches a library database under a name, the member is opened on its
+        own first so its schema is migrated and its indexes exist, the queries
+        of library_all search the indexes of every member
+
+        >>> library_manager.Attach_Library("NAS", "nas.db")
+
+        :Args:
+            Name: String
+                source name of the rows of the library
+            Path: String
+                path of the library database
+        """
+        if os.path.abspath(Path) == os.path.abspath(self.db_driver.databaseName()) or Name in self.Members:
+            raise Exception(f"<{Name}> Library is already attached")
+
+        Member = LibraryManager(Path)
+        Member.Release_Connection()
+        Schema = f"member_{len(self.Members)}_{re.sub(r'[^0-9A-Za-z_]', '_', Name)}"
+        self.Exec(f"ATTACH DATABASE ? AS {Schema}", os.path.abspath(Path))
+        self.Members[Name] = Schema
+
+    def Detach_Library(self, Name):
+        """
+        Detaches a library and rebuilds the federated views without it
+
+        >>> library_manager.Detach_Library("NAS")
+        """
+        Schema = self.Members.pop(Name)
+        self.Create_FederatedViews()
+        self.ExeQuery(f"DETACH DATABASE {Schema}")
+
+    def Sources(self, tablename = "library_all"):
+        """
+        Returns the (source, schema) of the libraries a table reads from, the
+        library table only reads the main database
+
+        >>> library_manager.Sources()
+        [('Default', 'main'), ('NAS', 'member_0_NAS')]
+        """
+        Sources = [(self.Source, "main")]
+        if tablename != "library":
+            Sources += list(self.Members.items())
+        return Sources
+
+    def Create_FederatedViews(self):
+        """
+        Creates the temporary library_all view, the union of the libraries
+        with the source column of their rows, and a temporary nowplaying view
+        that reads the queue from it. Both are dropped when no library is
+        attached. SQLite pushes the filters on library_all into every member
+        of the union, so each one searches its own indexes.
+        """
+        self.ExeQuery("DROP VIEW IF EXISTS temp.nowplaying")
+        self.ExeQuery("DROP VIEW IF EXISTS temp.library_all")
+        if len(self.Members) == 0:
+            self.LibraryTable = "library"
+            return
+
+        Columns = ", ".join(DBFIELDS)
+        Members = ", ".join([f"member.{Field}" for Field in DBFIELDS])
+        Sources = [(Source.replace("'", "''"), Schema) for Source, Schema in self.Sources()]
+        Union = "\nUNION ALL ".join([f"SELECT {Members}, '{Source}' AS source FROM {Schema}.library AS member"
+                                     for Source, Schema in Sources])
+        self.ExeQuery(f"CREATE TEMP VIEW library_all AS\n{Union}")
+        # a join on library_all is materialized, the queue is joined with every member on its own instead
+        Joins = "\nUNION ALL ".join([f"SELECT queue.position, {Members}, '{Source}' AS source FROM queue "
+                                     f"CROSS JOIN {Schema}.library AS member ON member.file_id = queue.file_id"
+                                     for Source, Schema in Sources])
+        self.ExeQuery(f"CREATE TEMP VIEW nowplaying AS\nSELECT {Columns}, source FROM (\n{Joins})\nORDER BY position")
+        self.LibraryTable = "library_all"
+
+########################################################################################################################
+# Duplicates
+########################################################################################################################
+
+    def DuplicateReport(self, By = "hash", MinCount = 2):
+        """
+        Groups the scanned files that are likely copies of each other, the
+        groups are sorted by the space that deleting the copies reclaims.
+
+        >>> library_manager.DuplicateReport("tags")
+        [{"key": "artist - title", "files": [[path, size], ...], "size": 10, "reclaimable": 5}, ...]
+
+        :Args:
+            By: String
+                hash: files with the same file_id
+                size: files with the same size, candidates for a closer check
+                tags: files with matching artist and title whose lengths are
+                      within DUPLICATE_LENGTH_TOLERANCE seconds
+            MinCount: Int
+                minimum number of files in a group
+
+        :Return: List
+            groups as dicts of key, files, size and reclaimable bytes
+        """
+        if By in ["hash", "size"]:
+            Column = "file_id" if By == "hash" else "size"
+            Query = QSqlQuery(self.db_driver)
+            Query.prepare(f"""
+            SELECT {Column}, file_path, size FROM duplicates
+            WHERE {Column} IN (SELECT {Column} FROM duplicates GROUP BY {Column} HAVING count(*) >= ?)
+            ORDER BY {Column}, file_path
+            """)
+            Query.addBindValue(MinCount)
+            self.ExeQuery(Query)
+            Groups = collections.defaultdict(list)
+            while Query.next():
+                Groups[Query.value(0)].append([Query.value(1), Query.value(2)])
+            Groups = list(Groups.items())
+
+        elif By == "tags":
+            Query = self.ExeQuery("""
+            SELECT library.artist, library.title, library.duration_ms, library.file_path, coalesce(duplicates.size, 0)
+            FROM library LEFT JOIN duplicates ON duplicates.path_id = library.path_id
+            """)
+            Tracks = collections.defaultdict(list)
+            while Query.next():
+                Key = f"{self.FuzzyTag(Query.value(0))} - {self.FuzzyTag(Query.value(1))}"
+                if Key != " - ":
+                    Tracks[Key].append(((Query.value(2) or 0) / 1000, Query.value(3), Query.value(4)))
+
+            # tracks of a key are split where the length gap is over the tolerance
+            Groups = []
+            for Key, Files in Tracks.items():
+                Files.sort()
+                Group = []
+                for Length, Path, Size in Files:
+                    if len(Group) != 0 and Length - Group[-1][0] > self.DUPLICATE_LENGTH_TOLERANCE:
+                        Groups.append((Key, [[P, S] for L, P, S in Group]))
+                        Group = []
+                    Group.append((Length, Path, Size))
+                Groups.append((Key, [[P, S] for L, P, S in Group]))
+            Groups = [(Key, Files) for Key, Files in Groups if len(Files) >= MinCount]
+
+        else:
+            raise Exception(f"Invalid Duplicate Report: {By}")
+
+        Report = []
+        for Key, Files in Groups:
+            Sizes = [Size or 0 for Path, Size in Files]
+            Report.append({"key": Key, "files": Files, "size": sum(Sizes), "reclaimable": sum(Sizes) - max(Sizes)})
+        Report.sort(key = lambda Group: Group["reclaimable"], reverse = True)
+        return Report
+
+    def FuzzyTag(self, Value):
+        """
+        Normalizes a tag for the fuzzy duplicate match, drops the bracketed
+        parts like (Remastered) and everything that isnt a letter or digit
+        """
+        Value = re.sub(r"[\(\[].*?[\)\]]", " ", str(Value or "").lower())
+        return " ".join(re.findall(r"\w+", Value))
+
+########################################################################################################################
+# Scan Journal
+########################################################################################################################
+
+    def Journal_Queue(self, Root, Filters):
+        """
+        Adds a scan root to the journal. Roots that are already pending keep
+        their checkpoint, finished roots are queued again from the start.
+
+        >>> library_manager.Journal_Queue("E:\\music", [".mp3"])
+        """
+        Query = QSqlQuery(self.db_driver)
+        Query.prepare("""
+        INSERT INTO scan_journal(root, filters, status, last_dir, updated_at)
+        VALUES (?, ?, 'queued', NULL, ?)
+        ON CONFLICT(root) DO UPDATE SET
+        filters = excluded.filters,
+        last_dir = CASE WHEN status = 'done' THEN NULL ELSE last_dir END,
+        status = CASE WHEN status = 'done' THEN 'queued' ELSE status END,
+        updated_at = excluded.updated_at
+        """)
+        Query.addBindValue(os.path.normpath(Root))
+        Query.addBindValue(json.dumps(list(Filters)))
+        Query.addBindValue(int(time.time()))
+        self.ExeQuery(Query)
+
+    def Journal_Pending(self):
+        """
+        Returns the unfinished scan roots in the order they were queued as a
+        list of [root, filters, last_dir]
+        """
+        Query = self.ExeQuery("SELECT root, filters, last_dir FROM scan_journal WHERE status != 'done' ORDER BY rowid")
+        return [[Root, json.loads(Filters), LastDir or None] for Root, Filters, LastDir in self.fetchAll(Query)]
+
+    def Journal_Get(self, Root):
+        """
+        Returns [status, last_dir] of a scan root, None if it isnt journaled
+        """
+        Query = QSqlQuery(self.db_driver)
+        Query.prepare("SELECT status, last_dir FROM scan_journal WHERE root = ?")
+        Query.addBindValue(os.path.normpath(Root))
+        self.ExeQuery(Query)
+        if Query.next():
+            return [Query.value(0), Query.value(1) or None]
+        return None
+
+    def Journal_Update(self, Root, Status = None, LastDir = None):
+        """
+        Updates the status and or the last committed directory of a scan root
+
+        :Args:
+            Root: String
+                scan root
+            Status: String
+                queued, scanning or done
+            LastDir: String
+                last directory whose files are committed
+        """
+        Query = QSqlQuery(self.db_driver)
+        Query.prepare("""
+        UPDATE scan_journal SET
+        status = coalesce(?, status),
+        last_dir = coalesce(?, last_dir),
+        updated_at = ?
+        WHERE root = ?
+        """)
+        Query.addBindValue(Status)
+        Query.addBindValue(LastDir)
+        Query.addBindValue(int(time.time()))
+        Query.addBindValue(os.path.normpath(Root))
+        self.ExeQuery(Query)
+
+########################################################################################################################
+# Schema Migration
+########################################################################################################################
+
+    def SchemaVersion(self):
+        """
+        Returns the schema version of the library table, v1 tables have the
+        length, filesize, bitrate and sample_rate display string columns or
+        the text duration_ms column they were renamed to
+        """
+        Columns = dict(self.Fetch("SELECT name, type FROM pragma_table_info('library')"))
+        if "length" in Columns or Columns.get("duration_ms", "INTEGER").upper() != "INTEGER":
+            return 1
+        return SCHEMA_VERSION
+
+    def Prepare_V1Table(self):
+        """
+        Renames the display string columns of a v1 library table to their v2
+        names and adds the dimension id columns, the table has the v2 layout
+        without rewriting a row so the library opens at once. The rows keep
+        their display strings, and the text affinity of the columns, until
+        Migrate_Schema copies them into a typed table. The rows rescanned in
+        the meantime are recorded in schema_migration_changes.
+        """
+        Columns = [Row[0] for Row in self.Fetch("SELECT name FROM pragma_table_info('library')")]
+        self.db_driver.transaction()
+        for v1, v2 in V1_FIELDS.items():
+            if v1 in Columns:
+                self.ExeQuery(f"ALTER TABLE library RENAME COLUMN {v1} TO {v2}")
+        for Field in DIMENSIONS:
+            if f"{Field}_id" not in Columns:
+                self.ExeQuery(f"ALTER TABLE library ADD COLUMN {Field}_id INTEGER")
+        self.ExeQuery("CREATE TABLE IF NOT EXISTS schema_migration_changes(id INTEGER PRIMARY KEY)")
+        # the ratings and the dimension ids are synced by the migration, only the rescans are recorded
+        Fields = ", ".join([Field for Field in self.db_fields
+                            if Field not in ("rating", "playcount") and not Field.endswith("_id")])
+        self.ExeQuery(f"""
+        CREATE TRIGGER IF NOT EXISTS library_schema_migration AFTER UPDATE OF {Fields} ON library
+        BEGIN
+            INSERT OR IGNORE INTO schema_migration_changes(id) VALUES (NEW.rowid);
+        END
+        """)
+        self.db_driver.commit()
+
+    def Migrate_Schema(self, Slot = lambda msg: '', ChunkSize = None, Cancelled = None):
+        """
+        Migrates a v1 library table to the v2 schema with the integer
+        duration_ms, filesize_bytes, bitrate_bps and sample_rate_hz columns.
+        The rows are copied into library_v2 in chunks that are committed in
+        their own transaction with a checkpoint, so the library stays usable
+        between the chunks and an interrupted migration resumes. The last
+        transaction copies the rows added or rescanned in the meantime, syncs
+        the ratings and playcounts and swaps the tables. Returns the rows
+        migrated, None if it was cancelled between the chunks. Its run by a
+        SchemaMigration_Thread in the background, the library is read with
+        its display strings until the swap.
+
+        >>> library_manager.Migrate_Schema(Slot = print)
+
+        :Args:
+            Slot: Function
+                progress message callback
+            ChunkSize: Int
+                rows per transaction
+            Cancelled: Function
+                returns True to stop after the current chunk, the next
+                migration resumes from it
+        """
+        if self.SchemaVersion() == SCHEMA_VERSION:
+            return 0
+
+        self.Prepare_V1Table()
+        ChunkSize = ChunkSize or self.SCAN_CHUNKSIZE
+        self.Create_LibraryTable("library_v2")
+        Columns = ", ".join(self.db_fields)
+        Placeholders = ", ".join(["?"] * len(self.db_fields))
+        V1Index = {self.db_fields.index(v2): v1 for v1, v2 in V1_FIELDS.items()}
+
+        def CopyRows(Condition, *Values):
+            Rows = self.Fetch(f"SELECT rowid, {Columns} FROM library WHERE {Condition}", *Values)
+            if len(Rows) == 0:
+                return Rows
+            for Row in Rows:
+                for Column, Field in V1Index.items():
+                    Row[Column + 1] = self.V1_Value(Field, Row[Column + 1])
+            # the rows keep their rowid and so their order in the library
+            self.ExecBatch(f"INSERT OR REPLACE INTO library_v2 (rowid, {Columns}) VALUES (?, {Placeholders})",
+                           list(zip(*Rows)))
+            return Rows
+
+        def CopyChunk(LastRow):
+            Rows = CopyRows("rowid > ? ORDER BY rowid LIMIT ?", LastRow, ChunkSize)
+            if len(Rows) != 0:
+                self.SetMeta("schema_migration_rowid", Rows[-1][0])
+            return Rows
+
+        Count = 0
+        LastRow = int(self.GetMeta("schema_migration_rowid", 0))
+        while True:
+            self.db_driver.transaction()
+            Rows = CopyChunk(LastRow)
+            self.db_driver.commit()
+            if len(Rows) == 0:
+                break
+            Count, LastRow = Count + len(Rows), Rows[-1][0]
+            Slot(f"Migrating library schema: {Count} rows")
+            if Cancelled != None and Cancelled():
+                return None
+
+        # rows added, rescanned or removed while the chunks were copied
+        self.db_driver.transaction()
+        Rows = CopyChunk(LastRow)
+        while len(Rows):
+            Rows = CopyChunk(Rows[-1][0])
+        CopyRows("rowid IN (SELECT id FROM schema_migration_changes)")
+        self.ExeQuery("DELETE FROM library_v2 WHERE file_id NOT IN (SELECT file_id FROM library)")
+        self.ExeQuery("""
+        UPDATE library_v2 SET
+        rating = (SELECT rating FROM library WHERE library.file_id = library_v2.file_id),
+        playcount = (SELECT playcount FROM library WHERE library.file_id = library_v2.file_id)
+        """)
+        # the nowplaying view selects from the library, its recreated over the new table
+        self.DropView("nowplaying")
+        self.ExeQuery("DROP TABLE library")
+        self.ExeQuery("DROP TABLE schema_migration_changes")
+        self.ExeQuery("ALTER TABLE library_v2 RENAME TO library")
+        self.Create_Indexes("library")
+        self.Create_QueueView()
+        self.ExeQuery("DELETE FROM library_meta WHERE key IN ('schema_migration_rowid', 'dimensions', 'search_index', 'stats')")
+        self.SetMeta("schema_version", SCHEMA_VERSION)
+        self.db_driver.commit()
+        self.Create_DimensionTables()
+        self.Create_SearchIndex()
+        self.Create_StatsTable()
+
+        Count = self.TableTrackcount("library")
+        Slot(f"Migrated library schema: {Count} rows")
+        return Count
+
+    def V1_Value(self, Field, Value):
+        """
+        Converts a v1 display string to the integer of its v2 column,
+        None for empty or unreadable values
+
+        >>> library_manager.V1_Value("length", "0:03:25.120000")
+        205120
+
+        :Args:
+            Field: String
+                v1 column, one of length, filesize, bitrate, sample_rate
+            Value: String
+                stored display string
+        """
+        Value = str(Value if Value != None else "").strip()
+        if re.fullmatch(r"\d+", Value):
+            # integers written by the scans while the migration runs
+            return int(Value)
+        if Field == "length":
+            Match = re.match(r"(?:(\d+) days?, )?(\d+):(\d+):(\d+(?:\.\d+)?)$", Value)
+            if Match == None:
+                return None
+            Days, Hours, Minutes, Seconds = Match.groups()
+            Seconds = ((int(Days or 0) * 24 + int(Hours)) * 60 + int(Minutes)) * 60 + float(Seconds)
+            return int(round(Seconds * 1000))
+
+        Match = re.match(r"\d+(?:\.\d+)?", Value)
+        if Match == None:
+            return None
+        Number = float(Match.group())
+        if Field == "filesize":
+            # the v1 sizes are Mb, rounded to 2 decimals
+            return int(round(Number * 1048576))
+        elif Field == "bitrate":
+            return int(Number * 1000)
+        else:
+            return int(Number)
+
+########################################################################################################################
+# Table Stats Query
+########################################################################################################################
+
+    def LibraryStats(self, tablename):
+        """
+        Returns all the stats of a table in one call, the library stats are
+        read from the library_stats row and the stats of a view are
+        aggregated over its rows in a single query
+
+        >>> library_manager.LibraryStats("library")
+        {'size': 10.0, 'playtime': datetime.timedelta(seconds=600), 'albums': 10, 'artists': 10, 'tracks': 10}
+
+        :Args:
+            tablename: String
+                Name of the table or view to be queried
+        """
+        if tablename == "library":
+            Rows = self.Fetch("""
+            SELECT round(filesize_bytes / 1073741824.0, 2), duration_ms, albums, artists, tracks
+            FROM library_stats
+            """)
+        elif tablename == "library_all":
+            # the stats rows of the members are summed, albums and artists shared by them are counted once
+            Stats = " UNION ALL ".join([f"SELECT * FROM {Schema}.library_stats" for Source, Schema in self.Sources()])
+            Names = lambda Table: " UNION ".join([f"SELECT name FROM {Schema}.{Table}" for Source, Schema in self.Sources()])
+            Rows = self.Fetch(f"""
+            SELECT round(sum(filesize_bytes) / 1073741824.0, 2), sum(duration_ms),
+            (SELECT count(*) FROM ({Names("albums")})), (SELECT count(*) FROM ({Names("artists")})), sum(tracks)
+            FROM ({Stats})
+            """)
+        else:
+            # the dimension ids of the attached libraries are only unique with their source
+            Id = lambda Field: f"{Field}_id" if len(self.Members) == 0 else f"source || ':' || {Field}_id"
+            Rows = self.Fetch(f"""
+            SELECT round(sum(filesize_bytes) / 1073741824.0, 2), sum(duration_ms),
+            count(DISTINCT {Id("album")}), count(DISTINCT {Id("artist")}), count(DISTINCT file_id)
+            FROM {tablename}
+            """)
+        Size, Playtime, Albums, Artists, Tracks = Rows[0] if len(Rows) else [None] * 5
+        return {"size": 0 if Size in ("", None) else Size,
+                "playtime": "0" if Playtime in ("", None, 0) else datetime.timedelta(seconds = Playtime // 1000),
+                "albums": Albums or 0,
+                "artists": Artists or 0,
+                "tracks": Tracks or 0}
+
+    def TableSize(self, tablename):
+        """
+        Calculates the total size in Gigabytes of all the files monitered.
+        Returns the Gigabyte as a Float.
+
+        :Args:
+            tablename: String
+                Name of the table or view to be queried
+        """
+        return self.LibraryStats(tablename)["size"]
+
+    def TablePlaytime(self, tablename):
+        """
+        Calculates the total playtime of all the files monitered.
+        Returns the Playtime as a String.
+
+        :Args:
+            tablename: String
+                Name of the table or view to be queried
+        """
+        return self.LibraryStats(tablename)["playtime"]
+
+    def TableAlbumcount(self, tablename):
+        """
+        Calculates the total count of album of all the files monitered.
+        Returns the album count as a Int.
+
+        :Args:
+            tablename: String
+                Name of the table or view to be queried
+        """
+        return self.LibraryStats(tablename)["albums"]
+
+    def TableArtistcount(self, tablename):
+        """
+        Calculates the total count of albumartist of all the files monitered.
+        Returns the albumartist count as a Int.
+
+        :Args:
+            tablename: String
+                Name of the table or view to be queried
+        """
+        return self.LibraryStats(tablename)["artists"]
+
+    def GroupValues(self, tablename, Field):
+        """
+        Returns the sorted distinct values of a grouping field, the
+        dimension fields are read from their dimension table
+
+        >>> library_manager.GroupValues("library", "genre")
+
+        :Args:
+            tablename: String
+                Name of the table or view to be queried
+            Field: String
+                Field to group by
+        """
+        if Field in DIMENSIONS:
+            # the ids of a dimension are only valid in their own library
+            Terms = []
+            for Source, Schema in self.Sources(tablename):
+                Rows = "" if len(self.Members) == 0 else f" WHERE source = '{Source.replace(chr(39), chr(39) * 2)}'"
+                Filter = "" if tablename in ["library", "library_all"] else f"AND id IN (SELECT {Field}_id FROM {tablename}{Rows})"
+                Terms.append(f"SELECT name FROM {Schema}.{DIMENSIONS[Field]} WHERE name NOT IN ('', ' ') {Filter}")
+            Query = self.ExeQuery(" UNION ".join(Terms) + " ORDER BY name")
+        elif tablename == "library_all":
+            # the union of the members reads the index of the field in each of them
+            Query = self.ExeQuery(" UNION ".join([f"SELECT {Field} FROM {Schema}.library WHERE ({Field} NOT IN ('', ' '))"
+                                                  for Source, Schema in self.Sources()]) + f" ORDER BY {Field}")
+        else:
+            Query = self.ExeQuery(f"""
+            SELECT DISTINCT {Field}
+            FROM {tablename}
+            WHERE ({Field} NOT IN ('', ' '))
+            ORDER BY {Field}
+            """)
+        return [Row[0] for Row in self.fetchAll(Query, 1)]
+
+    def TableTrackcount(self, tablename):
         """
         Calculates the total count of Tracks of all the files monitered.
         Returns the track count as a Int.
 
         :Args:
-            tablename: String
-                Name of the table or view to be queried
+            tablename: String
+                Name of the table or view to be queried
+        """
+        return self.LibraryStats(tablename)["tracks"]
+
+class FileManager(DataBaseManager):
+    """
+    File manager classes manages:
+    -> Scanning Directories
+    -> Fetching metadata for the related file format
+    
+    Read Supported Formats:
+    -> mp3
+    -> flac
+    """
+    
+    # rows inserted per transaction and files per worker batch while scanning
+    SCAN_CHUNKSIZE = 500
+    SCAN_BATCHSIZE = 16
+    # reads in flight per mount in the async scan mode
+    SCAN_INFLIGHT = 32
+    # bytes read per sampled region by the fast file_id hash
+    HASH_SAMPLESIZE = 16384
+
+    # format readers, each mutagen class only parses the header and tag regions of a file
+    FORMATS = {"mp3": EasyMP3, "flac": FLAC, "mp4": EasyMP4, "aac": AAC, "wav": WAVE,
+               "aiff": AIFF, "ogg": OggVorbis, "opus": OggOpus, "oggflac": OggFLAC, "wma": ASF,
+               "ape": MonkeysAudio, "mpc": Musepack, "wv": WavPack, "tak": TAK}
+    # file extensions mapped to their format
+    READERS = {".mp3": "mp3", ".flac": "flac", ".m4a": "mp4", ".mp4": "mp4", ".m4b": "mp4",
+               ".alac": "mp4", ".aac": "aac", ".wav": "wav", ".aif": "aiff", ".aiff": "aiff",
+               ".ogg": "ogg", ".oga": "ogg", ".opus": "opus", ".wma": "wma", ".asf": "wma",
+               ".ape": "ape", ".mpc": "mpc", ".wv": "wv", ".tak": "tak"}
+    # (offset, magic bytes, format) used for files with a wrong or unknown extension
+    MAGIC = [(0, b"fLaC", "flac"), (4, b"ftyp", "mp4"), (8, b"WAVE", "wav"), (8, b"AIFF", "aiff"),
+             (8, b"AIFC", "aiff"), (28, b"\x01vorbis", "ogg"), (28, b"OpusHead", "opus"),
+             (28, b"\x7fFLAC", "oggflac"), (0, b"0&\xb2u\x8ef\xcf\x11", "wma"), (0, b"MAC ", "ape"),
+             (0, b"MPCK", "mpc"), (0, b"MP+", "mpc"), (0, b"wvpk", "wv"), (0, b"tBaK", "tak")]
+    # tag keys of the formats that dont use the lower case vorbis style keys
+    ID3_KEYS = {"TIT2": "title", "TPE1": "artist", "TPE2": "albumartist", "TALB": "album",
+                "TCON": "genre", "TDRC": "date", "TDOR": "originaldate", "TRCK": "tracknumber",
+                "TPOS": "discnumber", "TSST": "discsubtitle", "TCOM": "composer", "TPE3": "conductor",
+                "TEXT": "lyricist", "TBPM": "bpm", "TCMP": "compilation", "TLAN": "language",
+                "TENC": "encodedby", "TPUB": "organization", "TMOO": "mood", "TMED": "media",
+                "TIT3": "version", "TOLY": "author", "TXXX:PERFORMER": "performer",
+                "TXXX:MusicBrainz Album Release Country": "releasecountry"}
+    ASF_KEYS = {"Title": "title", "Author": "artist", "WM/AlbumArtist": "albumartist",
+                "WM/AlbumTitle": "album", "WM/Genre": "genre", "WM/Year": "date",
+                "WM/TrackNumber": "tracknumber", "WM/PartOfSet": "discnumber", "WM/Composer": "composer",
+                "WM/Conductor": "conductor", "WM/BeatsPerMinute": "bpm", "WM/Language": "language",
+                "WM/EncodedBy": "encodedby", "WM/Publisher": "organization", "WM/Mood": "mood"}
+    APE_KEYS = {"year": "date", "track": "tracknumber", "disc": "discnumber", "album artist": "albumartist"}
+    # ID3v2.3 frames replaced in v2.4 and the frames EasyID3 reads that arent text frames
+    FAST_ID3_KEYS = {b"TYER": "date", b"TORY": "originaldate", b"WOAR": "website", b"TMCL": "performer"}
+    # reads mp3 and flac with the fast tag parsers before falling back to mutagen
+    FAST_TAGS = True
+    MPEG_BITRATES = {
+        (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+        (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]}
+    MPEG_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+    def __init__(self):
+        """Constructor"""
+        self.db_fields = DBFIELDS
+    
+    def TransposeMeatadata(self, Metadata):
+        T_metadata = dict.fromkeys(DBFIELDS, "")
+        for index, key in enumerate(T_metadata.keys()):
+            T_metadata[key] = [value[index] for value in Metadata]            
+        return T_metadata    
+
+   
+    def ScanDirectory(self, Dir, include = [], Slot = lambda msg: '', Workers = 1, PoolType = "process",
+                      Incremental = False, ChunkSize = None, Journal = False):
+        """
+        Scans the directory and inserts the metadata of the files into the
+        library table. The scan is a generator pipeline, files are walked,
+        filtered, hashed and read lazily and inserted in chunks that are
+        committed in their own transaction, so memory stays flat and the
+        committed chunks survive a crash.
+
+        >>> library_manager.ScanDirectory("E:\\music", [".mp3"], Workers = 4)
+
+        :Args:
+            Dir: String
+                Directory to scan
+            include: List
+                File extensions to scan
+            Slot: Method
+                Called with the status messages of the scan
+            Workers: Int
+                Number of extraction workers, None uses the cpu count
+            PoolType: String
+                "process", "thread" or "async". The async mode keeps up to
+                Workers stat and header reads in flight per mount, it suits
+                high latency network mounts where every open and stat is a
+                round trip
+            Incremental: Bool
+                Uses the file manifest to only read new and changed files
+                and to purge deleted files
+            ChunkSize: Int
+                Number of rows inserted per transaction
+            Journal: Bool
+                Records the scan in the scan journal, the last committed
+                directory is checkpointed with every chunk and an unfinished
+                scan of the same root resumes from its checkpoint
+
+        :Return: Dict
+            count of the new, changed, deleted and unchanged files
+        """
+        if ChunkSize == None:
+            ChunkSize = self.SCAN_CHUNKSIZE
+        Stats = {"new": 0, "changed": 0, "deleted": 0, "unchanged": 0}
+        Root = os.path.normpath(Dir) if Journal else None
+        StartAt = None
+        if Journal:
+            Entry = self.Journal_Get(Root)
+            if Entry == None or Entry[0] == "done":
+                self.Journal_Queue(Root, include)
+            else:
+                StartAt = Entry[1]
+            self.Journal_Update(Root, Status = "scanning")
+
+        Failed = []
+        if PoolType == "async":
+            # the stats of the walk are a round trip each, they are kept in flight as well
+            Files = self.AsyncStats(self.WalkDirectory(Dir, include, StartAt, Stat = False, Failed = Failed), Workers)
+        else:
+            Files = self.WalkDirectory(Dir, include, StartAt, Failed = Failed)
+        if Incremental:
+            Manifest = self.GetManifest(Dir, StartAt)
+            Items = self.ChangedFiles(Files, Manifest, Stats)
+        else:
+            Items = self.NewFiles(Files, ChunkSize, Stats)
+
+        Rows = self.FileChecker(self.ExtractStream(Items, Workers, PoolType), set())
+        with self.BulkLoad() as Load:
+            for Chunk in self.Chunked(Rows, ChunkSize):
+                self.InsertChunk(Chunk, Replace = Incremental, Checkpoint = Root)
+                Load["rows"] += len(Chunk)
+                Slot(f"Scanning {Dir}: {Stats['new'] + Stats['changed']} files read")
+
+        # entries left in the manifest are not on the disk anymore, unless
+        # they are under a directory that could not be read
+        self.db_driver.transaction()
+        if Incremental:
+            Deleted = self.MissingPaths(Manifest, Failed)
+            Stats["deleted"] = len(Deleted)
+            self.Delete_PathIds(Deleted)
+        if Journal:
+            self.Journal_Update(Root, Status = "done")
+        self.db_driver.commit()
+
+        for Path in Failed:
+            Slot(f"Failed to read {Path}, its files were kept")
+        Slot(f"Scanned {Dir}: {Stats['new']} new, {Stats['changed']} changed, {Stats['deleted']} deleted"
+             f" at {Load['rows_per_second']:.0f} rows/s")
+        return Stats
+
+    def IncrementalScan(self, Dir, include = [], Slot = lambda msg: '', Workers = 1, PoolType = "process"):
+        """
+        Rescans a directory using the file manifest. Only files that are new
+        or whose mtime, size or inode changed are read again, files missing
+        from the disk are purged from the library.
+
+        >>> library_manager.IncrementalScan("E:\\music", [".mp3"])
+        """
+        return self.ScanDirectory(Dir, include, Slot, Workers, PoolType, Incremental = True)
+
+    def WalkDirectory(self, Dir, include = [], StartAt = None, Stat = True, Failed = None):
+        """
+        Walks the directory with os.scandir and yields the normalized path and
+        the stat of every file with an extension in include. Entries are
+        walked in sorted order, so a walk can be resumed from a directory.
+
+        :Args:
+            Dir: String
+                Directory to walk
+            include: List
+                File extensions to yield
+            StartAt: String
+                Directory to resume the walk from, everything walked before
+                it is skipped
+            Stat: Bool
+                yields None instead of the stat when False
+            Failed: List
+                the directories that could not be read are appended to it
+        """
+        try:
+            with os.scandir(os.path.normpath(Dir)) as Entries:
+                Entries = sorted(Entries, key = lambda Entry: Entry.name)
+        except OSError:
+            # an unmounted or unreadable directory is not an empty one
+            if Failed != None:
+                Failed.append(os.path.normpath(Dir))
+            return
+
+        Start = pathlib.PurePath(os.path.normpath(StartAt)).parts if StartAt != None else None
+        for Entry in Entries:
+            if Start != None:
+                Parts = pathlib.PurePath(Entry.path).parts
+                # walk order is the order of the path components
+                if Parts < Start and Parts != Start[:len(Parts)]:
+                    continue
+            if Entry.is_dir(follow_symlinks = False):
+                # the checkpoint is only passed down to its parent directories
+                Resume = StartAt if (Start != None and Parts == Start[:len(Parts)] and Parts != Start) else None
+                yield from self.WalkDirectory(Entry.path, include, Resume, Stat, Failed)
+            elif os.path.splitext(Entry.name)[1] in include:
+                yield (os.path.normpath(Entry.path), Entry.stat() if Stat else None)
+
+    def AsyncStats(self, Files, Limit = None):
+        """
+        Stats the walked files with an AsyncScanPool and yields (path, stat)
+        in the walk order, files removed since the walk are dropped.
+
+        :Args:
+            Files: Iterable
+                (path, None) of the walked files
+            Limit: Int
+                stats in flight per mount
+        """
+        Pool = AsyncScanPool(Limit or self.SCAN_INFLIGHT)
+        try:
+            for (Path, _), Stat in Pool.Map(StatFile, Files, lambda Item: Item[0], lambda Item: (Item[0],)):
+                if Stat != None:
+                    yield (Path, Stat)
+        finally:
+            Pool.close()
+
+    def NewFiles(self, Files, ChunkSize, Stats):
+        """
+        Yields (path_id, path, stat) for the walked files that are not in the
+        library or duplicates table, the lookup is done a chunk of paths at a time.
+
+        :Args:
+            Files: Iterable
+                (path, stat) of the walked files
+            ChunkSize: Int
+                number of paths looked up per query
+            Stats: Dict
+                scan counters to update
+        """
+        for Chunk in self.Chunked(Files, ChunkSize):
+            Items = {hashlib.md5(Path.encode()).hexdigest(): (Path, Stat) for Path, Stat in Chunk}
+            # copies of a library file are only recorded in the duplicates table
+            Holders = ', '.join('?' * len(Items))
+            Rows = self.Fetch(f"""
+            SELECT path_id FROM library WHERE path_id IN ({Holders})
+            UNION SELECT path_id FROM duplicates WHERE path_id IN ({Holders})
+            """, *(list(Items.keys()) * 2))
+            for Row in Rows:
+                Items.pop(Row[0], None)
+                Stats["unchanged"] += 1
+
+            for ID, (Path, Stat) in Items.items():
+                Stats["new"] += 1
+                yield (ID, Path, Stat)
+
+    def ChangedFiles(self, Files, Manifest, Stats):
+        """
+        Yields (path_id, path, stat) for the walked files that are missing
+        from the manifest or whose mtime, size or inode changed. Matched
+        entries are popped from the Manifest.
+
+        :Args:
+            Files: Iterable
+                (path, stat) of the walked files
+            Manifest: Dict
+                manifest entries from GetManifest
+            Stats: Dict
+                scan counters to update
+        """
+        for Path, Stat in Files:
+            ID = hashlib.md5(Path.encode()).hexdigest()
+            Entry = Manifest.pop(ID, None)
+            if Entry == None:
+                Stats["new"] += 1
+            elif Entry[:3] != (Stat.st_mtime_ns, Stat.st_size, Stat.st_ino):
+                Stats["changed"] += 1
+            else:
+                Stats["unchanged"] += 1
+                continue
+            yield (ID, Path, Stat)
+
+    def MissingPaths(self, Manifest, Failed):
+        """
+        Returns the path_ids of the manifest entries left after a walk,
+        entries under a directory that failed to walk are kept
+
+        :Args:
+            Manifest: Dict
+                manifest entries that were not walked
+            Failed: List
+                directories that could not be read
+        """
+        Prefixes = tuple(os.path.join(Path, "") for Path in Failed)
+        return [ID for ID, Entry in Manifest.items() if not Entry[3].startswith(Prefixes)]
+
+    def GetManifest(self, Dir, StartAt = None):
+        """
+        Returns the manifest entries of the files under the directory as a
+        dict of path_id mapped to (mtime_ns, size, inode, file_path)
+
+        :Args:
+            Dir: String
+                Directory to get the entries for
+            StartAt: String
+                Skips the entries walked before this directory
+        """
+        Prefix = os.path.join(os.path.normpath(Dir), "")
+        # range over the file_path index for all the paths starting with the prefix
+        Query = QSqlQuery(self.db_driver)
+        Query.prepare("""
+        SELECT path_id, mtime_ns, size, inode, file_path FROM file_manifest
+        WHERE file_path >= ? AND file_path < ?
+        """)
+        Query.addBindValue(Prefix)
+        Query.addBindValue(Prefix[:-1] + chr(ord(Prefix[-1]) + 1))
+        self.ExeQuery(Query)
+
+        Start = pathlib.PurePath(os.path.normpath(StartAt)).parts if StartAt != None else None
+        Manifest = {}
+        while Query.next():
+            if Start != None and pathlib.PurePath(Query.value(4)).parts < Start:
+                continue
+            Manifest[Query.value(0)] = (Query.value(1), Query.value(2), Query.value(3), Query.value(4))
+        return Manifest
+
+    def ManifestEntry(self, ID, Filehash, Path, Stat, Strategy = None):
+        """
+        Returns the manifest entry of a file
+        """
+        if Strategy == None:
+            Strategy = self.ScanStrategy()
+        return (ID, Filehash, Path, Stat.st_mtime_ns, Stat.st_size, Stat.st_ino, Strategy)
+
+    def ScanStrategy(self):
+        """
+        Returns the hashing strategy used while scanning. The full payload
+        hash is too slow for the scan, those files get the fast hash and are
+        upgraded by Migrate_FileIds in the background.
+        """
+        Strategy = getattr(self, "FileIdStrategy", "fast")
+        return "fast" if Strategy == "full" else Strategy
+
+    def FileChecker(self, Rows, FileHashes):
+        """
+        Drops the rows of the unreadable files and yields (item, row,
+        duplicate), duplicate is True for the files whose hash has already
+        been seen in the scan.
+
+        :Args:
+            Rows: Iterable
+                (item, row) pairs from ExtractStream
+            FileHashes: Set
+                hashes of the files that are already added
+        """
+        for Item, Row in Rows:
+            if Row == None:
+                continue
+            # file_id is the first field of the row
+            Filehash = Row[0]
+            Duplicate = Filehash in FileHashes
+            FileHashes.add(Filehash)
+            yield (Item, Row, Duplicate)
+
+    def InsertChunk(self, Chunk, Replace = False, Checkpoint = None):
+        """
+        Inserts a chunk of rows and their manifest entries in a single transaction
+
+        :Args:
+            Chunk: List
+                (item, row, duplicate) from FileChecker, item being (path_id, path, stat)
+            Replace: Bool
+                upserts the rows of the changed paths, the old rows of the
+                paths whose file_id changed are deleted first
+            Checkpoint: String
+                journaled scan root to checkpoint with the directory of the
+                last file in the chunk
+        """
+        self.db_driver.transaction()
+        if Replace:
+            # retagged files keep their file_id and are updated in place
+            FileIds = {Item[0]: Row[0] for Item, Row, Duplicate in Chunk}
+            Rows = self.Fetch("SELECT path_id, file_id FROM library WHERE path_id IN (SELECT value FROM json_each(?))",
+                              json.dumps(list(FileIds)))
+            self.Delete_PathIds([PathId for PathId, FileId in Rows if FileIds[PathId] != FileId])
+        self.Insert_Metadata(self.TransposeMeatadata([Row for Item, Row, Duplicate in Chunk if not Duplicate]),
+                             Upsert = Replace)
+        self.Update_Manifest([self.ManifestEntry(Item[0], Row[0], Item[1], Item[2]) for Item, Row, Duplicate in Chunk])
+        self.Update_Duplicates([(Item[0], Row[0], Item[1], Item[2].st_size) for Item, Row, Duplicate in Chunk])
+        if Checkpoint != None:
+            self.Journal_Update(Checkpoint, LastDir = os.path.dirname(Chunk[-1][0][1]))
+        if not self.db_driver.commit():
+            raise Exception(self.db_driver.lastError().text())
+
+    def Chunked(self, Iterable, Size):
+        """
+        Groups an iterable into lists of Size items
+        """
+        Chunk = []
+        for Item in Iterable:
+            Chunk.append(Item)
+            if len(Chunk) >= Size:
+                yield Chunk
+                Chunk = []
+        if len(Chunk) != 0:
+            yield Chunk
+
+    def ExtractStream(self, Items, Workers = 1, PoolType = "process"):
+        """
+        Runs the ScanWorker over the items and yields (item, row) in the same
+        order as the items. Only a bounded window of batches is in flight
+        so the items are consumed lazily.
+
+        :Args:
+            Items: Iterable
+                (path_id, path, ...) tuples
+            Workers: Int
+                Number of extraction workers, None uses the cpu count
+            PoolType: String
+                "process", "thread" or "async", Workers is the number of
+                reads in flight per mount in the async mode
+        """
+        if PoolType == "async":
+            Pool = AsyncScanPool(Workers or self.SCAN_INFLIGHT)
+            Strategy = self.ScanStrategy()
+            try:
+                yield from Pool.Map(ScanWorker, Items, lambda Item: Item[1], lambda Item: (Item[:2], Strategy))
+            finally:
+                Pool.close()
+            return
+
+        if Workers == None:
+            Workers = os.cpu_count()
+
+        if Workers <= 1:
+            for Item in Items:
+                yield (Item, ScanWorker(Item[:2], self.ScanStrategy()))
+            return
+
+        if PoolType == "process":
+            Pool = ProcessPoolExecutor
+        elif PoolType == "thread":
+            Pool = ThreadPoolExecutor
+        else:
+            raise Exception(f"Invalid Pool Type: {PoolType}")
+
+        with Pool(max_workers = Workers) as Executor:
+            Pending = collections.deque()
+            # batches reduce the IPC overhead of the process pool
+            for Batch in self.Chunked(Items, self.SCAN_BATCHSIZE):
+                Pending.append((Batch, Executor.submit(ScanBatch, [Item[:2] for Item in Batch], self.ScanStrategy())))
+                if len(Pending) > Workers * 2:
+                    Batch, Future = Pending.popleft()
+                    yield from zip(Batch, Future.result())
+            while Pending:
+                Batch, Future = Pending.popleft()
+                yield from zip(Batch, Future.result())
+
+    def ExtractRows(self, Items, Workers = 1, PoolType = "process"):
+        """
+        Returns the rows of the items in the same order as the items.
+
+        :Args:
+            Items: List
+                List of (path_id, file path)
+            Workers: Int
+                Number of extraction workers, None uses the cpu count
+            PoolType: String
+                "process" or "thread"
+        """
+        return [Row for Item, Row in self.ExtractStream(Items, Workers, PoolType)]
+
+    def ScanFile(self, Path):
+        """
+        Reads the file metadata and generates a metadata dict and returns it.
+        The reader is picked by the file extension, files with an unknown
+        extension or that fail to read are matched by their magic bytes.
+        None is returned for unsupported or unreadable files.
+
+        :Args:
+            path: String
+                Path of the file        
+        """
+        Format = self.READERS.get(os.path.splitext(Path)[1].lower())
+        Metadata = None
+        if Format != None:
+            Metadata = self.ReadFormat(Path, Format)
+        if Metadata == None:
+            Detected = self.DetectFormat(Path)
+            if Detected != None and Detected != Format:
+                Metadata = self.ReadFormat(Path, Detected)
+        return Metadata
+
+    def RegisterReader(self, Format, Reader, Extensions = [], Magic = []):
+        """
+        Registers a format reader, the reader is a mutagen FileType or any
+        class exposing the info and tags attributes of one.
+
+        >>> library_manager.RegisterReader("dsf", mutagen.dsf.DSF, [".dsf"], [(0, b"DSD ")])
+
+        :Args:
+            Format: String
+                Name of the format
+            Reader: Class
+                Reader used to parse the files
+            Extensions: List
+                Extensions of the format
+            Magic: List
+                (offset, bytes) identifying the format
+        """
+        self.FORMATS[Format] = Reader
+        for Ext in Extensions:
+            self.READERS[Ext.lower()] = Format
+        for Offset, Bytes in Magic:
+            self.MAGIC.append((Offset, Bytes, Format))
+
+    def DetectFormat(self, Path):
+        """
+        Returns the format of a file from its magic bytes or None
+
+        :Args:
+            Path: String
+                Path of the file
+        """
+        try:
+            with open(Path, "rb") as fobj:
+                Head = fobj.read(64)
+                Offset = 0
+                if Head[:3] == b"ID3" and len(Head) >= 10:
+                    # looks past the ID3v2 header, it can prefix most formats
+                    for Byte in Head[6:10]:
+                        Offset = (Offset << 7) | (Byte & 0x7F)
+                    Offset += 10
+                    fobj.seek(Offset)
+                    Head = fobj.read(64)
+        except OSError:
+            return None
+
+        for MagicOffset, Bytes, Format in self.MAGIC:
+            if Head[MagicOffset:MagicOffset + len(Bytes)] == Bytes:
+                return Format
+
+        # MPEG audio frame sync, layer bits set for mp3 and cleared for ADTS aac
+        if len(Head) >= 2 and Head[0] == 0xFF and (Head[1] & 0xE0) == 0xE0:
+            return "mp3" if (Head[1] >> 1) & 0x03 else "aac"
+        if Offset != 0:
+            return "mp3"
+        return None
+
+    def ReadFormat(self, Path, Format):
+        """
+        Reads a file with the reader of the format, returns None if the file
+        cant be read by it
+
+        :Args:
+            Path: String
+                Path of the file
+            Format: String
+                Format name registered in FORMATS
+        """
+        Reader = getattr(self, f"get_{Format.upper()}", None)
+        try:
+            if Reader != None:
+                return Reader(Path)
+            return self.ReadTags(self.FORMATS[Format](Path))
+        except Exception:
+            # corrupt or mislabelled files are skipped instead of stopping the scan
+            return None
+
+    def ReadTags(self, muta_file):
+        """
+        Reads the tags and the stream info of a parsed file into a metadata dict
+
+        :Args:
+            muta_file: mutagen.FileType
+                file parsed by the reader of its format
+        """
+        Path = muta_file.filename
+        metadata = dict.fromkeys(DBFIELDS, "")
+
+        KeyMap = {}
+        if isinstance(muta_file, (WAVE, AIFF)):
+            KeyMap = self.ID3_KEYS
+        elif isinstance(muta_file, ASF):
+            KeyMap = self.ASF_KEYS
+        elif isinstance(muta_file, (MonkeysAudio, Musepack, WavPack, TAK)):
+            KeyMap = self.APE_KEYS
+
+        Tags = muta_file.tags if muta_file.tags != None else {}
+        for key in Tags.keys():
+            # the APEv2 keys keep their case, Year, Track, Album Artist
+            field = KeyMap.get(key) or KeyMap.get(key.lower(), key.lower())
+            if field.startswith("performer:"):
+                # EasyID3 keys the TMCL performers by their role
+                field = "performer"
+            if not field in metadata or metadata[field] != "":
+                continue
+            value = Tags[key]
+            value = getattr(value, "text", value)
+            if isinstance(value, list):
+                if len(value) == 0:
+                    continue
+                value = value[0]
+            metadata[field] = str(value)
+
+        Info = muta_file.info
+        # formats without a sample rate store 0 instead of a made up one
+        return self.StreamMetadata(metadata, Path, Info.length, getattr(Info, "bitrate", 0),
+                                   getattr(Info, "sample_rate", 0), getattr(Info, "channels", ""))
+
+    def StreamMetadata(self, metadata, Path, Length, Bitrate, SampleRate, Channels):
+        """
+        Fills the stream and file fields of a metadata dict, shared by the
+        mutagen readers and the fast tag parsers
+
+        :Args:
+            metadata: Dict
+                metadata dict with the tags filled in
+            Path: String
+                Path of the file
+            Length: Float
+                length in seconds
+            Bitrate: Int
+                bitrate in bits per second, estimated from the size when 0
+            SampleRate: Int
+                sample rate in Hz
+            Channels: Int
+                number of channels
+        """
+        Size = os.path.getsize(Path)
+        if not Bitrate and Length:
+            Bitrate = Size * 8 / Length
+        # stored as integers, DisplayValue formats them for the views
+        metadata['sample_rate_hz'] = int(SampleRate or 0)
+        metadata["duration_ms"] = int(round(Length * 1000))
+        metadata["bitrate_bps"] = int(Bitrate)
+        metadata['channels'] = Channels
+        metadata["filesize_bytes"] = Size
+        metadata["file_name"] = os.path.split(Path)[1]
+        metadata["file_path"] = Path
+        metadata["rating"] = 0
+        metadata["playcount"] = 0
+
+        return metadata
+
+    def FileHasher(self, file, hashfun = hashlib.md5, Strategy = "header"):
+        """
+        Creates a hash id for the file path passed and returns hash id.
+
+        Strategies:
+        -> header: hash of the first 1024 bytes of the file
+        -> fast: hash of the audio payload size and three sampled regions of
+           the payload, tags are skipped so retagging keeps the id
+        -> full: hash of the complete audio payload
+
+        :Args:
+            file: String
+                File for which the hash is generated
+            hashfun: Method
+                Hashing algorithm method from hashlib
+            Strategy: String
+                header, fast or full
+        """
+        with open(file, "rb") as fobj:
+            if Strategy == "header":
+                return (hashfun(fobj.read(1024))).hexdigest()
+
+            Start, End = self.AudioPayload(fobj, os.fstat(fobj.fileno()).st_size)
+            Length = End - Start
+            Hash = hashfun(Length.to_bytes(8, "big"))
+
+            if Strategy == "full" or Length <= (3 * self.HASH_SAMPLESIZE):
+                fobj.seek(Start)
+                while Length > 0:
+                    Block = fobj.read(min(Length, 1 << 20))
+                    if not Block:
+                        break
+                    Hash.update(Block)
+                    Length -= len(Block)
+            elif Strategy == "fast":
+                Size = self.HASH_SAMPLESIZE
+                for Offset in [Start, Start + (Length - Size) // 2, End - Size]:
+                    fobj.seek(Offset)
+                    Hash.update(fobj.read(Size))
+            else:
+                raise Exception(f"Invalid Hash Strategy: {Strategy}")
+
+        return Hash.hexdigest()
+
+    def AudioPayload(self, fobj, Size):
+        """
+        Returns the (start, end) offsets of the audio payload of a file,
+        leaving out the tag blocks that are rewritten when a file is retagged.
+
+        Handles:
+        -> ID3v2 headers, ID3v1 and APEv2 footers
+        -> FLAC metadata blocks
+        -> MP4 mdat atoms
+        -> WAV data chunks
+
+        :Args:
+            fobj: File
+                file object opened in binary mode
+            Size: Int
+                size of the file
+        """
+        Start, End = 0, Size
+        fobj.seek(0)
+        Head = fobj.read(12)
+
+        # MP4, payload is the mdat atom
+        if Head[4:8] == b"ftyp":
+            Offset = 0
+            while Offset + 8 <= Size:
+                fobj.seek(Offset)
+                Atom = fobj.read(16)
+                Length, Type = int.from_bytes(Atom[:4], "big"), Atom[4:8]
+                Header = 8
+                if Length == 1:
+                    Length, Header = int.from_bytes(Atom[8:16], "big"), 16
+                elif Length == 0:
+                    Length = Size - Offset
+                if Type == b"mdat":
+                    return (Offset + Header, min(Offset + Length, Size))
+                if Length < 8:
+                    break
+                Offset += Length
+            return (Start, End)
+
+        # WAV, payload is the data chunk
+        if Head[:4] == b"RIFF" and Head[8:12] == b"WAVE":
+            Offset = 12
+            while Offset + 8 <= Size:
+                fobj.seek(Offset)
+                Chunk = fobj.read(8)
+                Length = int.from_bytes(Chunk[4:8], "little")
+                if Chunk[:4] == b"data":
+                    return (Offset + 8, min(Offset + 8 + Length, Size))
+                Offset += 8 + Length + (Length % 2)
+            return (Start, End)
+
+        # ID3v2 header, the size is a syncsafe integer
+        if Head[:3] == b"ID3":
+            fobj.seek(0)
+            Header = fobj.read(10)
+            Length = 0
+            for Byte in Header[6:10]:
+                Length = (Length << 7) | (Byte & 0x7F)
+            Start = 10 + Length + (10 if Header[5] & 0x10 else 0)
+
+        # FLAC metadata blocks
+        fobj.seek(Start)
+        if fobj.read(4) == b"fLaC":
+            Start += 4
+            while Start < Size:
+                fobj.seek(Start)
+                Block = fobj.read(4)
+                if len(Block) < 4:
+                    break
+                Start += 4 + int.from_bytes(Block[1:4], "big")
+                if Block[0] & 0x80:
+                    break
+
+        # ID3v1 footer
+        if End - Start >= 128:
+            fobj.seek(End - 128)
+            if fobj.read(3) == b"TAG":
+                End -= 128
+
+        # APEv2 footer
+        if End - Start >= 32:
+            fobj.seek(End - 32)
+            Footer = fobj.read(32)
+            if Footer[:8] == b"APETAGEX":
+                Length = int.from_bytes(Footer[12:16], "little")
+                Flags = int.from_bytes(Footer[20:24], "little")
+                End -= Length + (32 if Flags & 0x80000000 else 0)
+
+        return (min(Start, Size), max(min(Start, Size), End))
+
+    def Migrate_FileIds(self, Strategy, Slot = lambda msg: '', ChunkSize = None):
+        """
+        Recomputes the file_id of the library rows that were hashed with a
+        different strategy. Rows are migrated in chunks that commit on their
+        own, so the migration can run in the background and be resumed.
+        Rows whose new id is already held by another library row are copies
+        of that file under the new strategy, they are moved to the duplicates.
+
+        >>> library_manager.Migrate_FileIds("fast")
+
+        :Args:
+            Strategy: String
+                header, fast or full
+            Slot: Method
+                Called with the status messages of the migration
+            ChunkSize: Int
+                Number of rows migrated per transaction
+
+        :Return: Int
+            count of the rows migrated
+        """
+        if ChunkSize == None:
+            ChunkSize = self.SCAN_CHUNKSIZE
+        self.SetMeta("file_id_strategy", Strategy)
+        self.FileIdStrategy = Strategy
+
+        Count, Duplicates = 0, 0
+        LastRow = ""
+        while True:
+            Query = QSqlQuery(self.db_driver)
+            Query.prepare("""
+            SELECT paths.path_id, paths.file_path,
+            (SELECT file_id FROM library WHERE library.path_id = paths.path_id) FROM (
+            SELECT path_id, file_path FROM library UNION SELECT path_id, file_path FROM duplicates) AS paths
+            LEFT JOIN file_manifest ON file_manifest.path_id = paths.path_id
+            WHERE coalesce(file_manifest.id_strategy, 'header') != ? AND paths.path_id > ?
+            ORDER BY paths.path_id LIMIT ?
+            """)
+            Query.addBindValue(Strategy)
+            Query.addBindValue(LastRow)
+            Query.addBindValue(ChunkSize)
+            Rows = self.fetchAll(self.ExeQuery(Query), 3)
+            if len(Rows) == 0:
+                break
+            LastRow = Rows[-1][0]
+
+            Updates, Entries, Queued, LibraryPaths = [], [], [], set()
+            for ID, Path, FileId in Rows:
+                try:
+                    Filehash = self.FileHasher(Path, Strategy = Strategy)
+                    Stat = os.stat(Path)
+                except OSError:
+                    # missing files are left for the rescans to purge
+                    continue
+                Updates.append((Filehash, ID))
+                Entries.append(self.ManifestEntry(ID, Filehash, Path, Stat, Strategy))
+                if FileId not in (None, ""):
+                    Queued.append((Filehash, FileId))
+                    LibraryPaths.add(ID)
+
+            self.db_driver.transaction()
+            # the file_id conflicts are ignored, a row that kept its id collided with the row holding the new one
+            Collided = [ID for Filehash, ID in Updates if ID in LibraryPaths and
+                        self.Exec("UPDATE library SET file_id = ? WHERE path_id = ?", Filehash, ID).numRowsAffected() == 0]
+            self.ExecBatch("DELETE FROM library WHERE path_id = ?", [Collided])
+            self.ExecBatch("UPDATE duplicates SET file_id = ? WHERE path_id = ?", list(zip(*Updates)))
+            # the queue follows the library rows, the ids of the rows that kept theirs are still in the library
+            self.ExecBatch("UPDATE queue SET file_id = ? WHERE file_id = ? AND file_id NOT IN (SELECT file_id FROM library)",
+                           list(zip(*Queued)))
+            self.Update_Manifest(Entries)
+            self.db_driver.commit()
+            Count += len(Updates)
+            Duplicates += len(Collided)
+            Slot(f"Migrating file ids: {Count} files, {Duplicates} duplicates")
+
+        return Count
+
+    def get_MP3(self, Path): 
+        if self.FAST_TAGS:
+            metadata = self.FastMP3(Path)
+            if metadata != None:
+                return metadata
+
+        muta_file = self.FORMATS["mp3"](Path)
+        metadata = self.ReadTags(muta_file)
+
+        metadata["bitrate_mode"] = str(muta_file.info.bitrate_mode).replace(')', "").replace('BitrateMode(', "")
+        metadata['album_gain'] = muta_file.info.album_gain
+        metadata['encoder_info'] = muta_file.info.encoder_info
+        metadata['encoder_settings'] = muta_file.info.encoder_settings
+        metadata['frame_offset'] = muta_file.info.frame_offset
+        metadata['layer'] = muta_file.info.layer
+        metadata['mode'] = muta_file.info.mode
+        metadata['padding'] = muta_file.info.padding
+        metadata['protected'] = muta_file.info.protected
+        metadata['track_gain'] = muta_file.info.track_gain
+        metadata['track_peak'] = muta_file.info.track_peak
+        metadata['version'] = muta_file.info.version
+
+        return metadata
+
+    def get_FLAC(self, Path):
+        if self.FAST_TAGS:
+            metadata = self.FastFLAC(Path)
+            if metadata != None:
+                return metadata
+        return self.ReadTags(self.FORMATS["flac"](Path))
+
+########################################################################################################################
+# Fast Tag Parsers
+########################################################################################################################
+    def MapFile(self, Path):
+        """
+        Maps a file read only, only the pages that are sliced are read from
+        the disk so large embedded pictures are never loaded.
+        Returns None for empty or unreadable files.
+        """
+        try:
+            with open(Path, "rb") as fobj:
+                return mmap.mmap(fobj.fileno(), 0, access = mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+    def ParseID3v2(self, Data, metadata):
+        """
+        Parses the text frames of an ID3v2.3/2.4 tag into the metadata dict
+        and returns the offset of the end of the tag. None is returned for
+        the tags the parser doesnt handle (v2.2, unsynchronised, extended
+        headers, compressed or encrypted frames).
+
+        :Args:
+            Data: mmap
+                mapped file starting with the ID3 header
+            metadata: Dict
+                metadata dict to fill
+        """
+        Version, Flags = Data[3], Data[5]
+        if Version not in (3, 4) or Flags & 0xC0:
+            return None
+        Size = 0
+        for Byte in Data[6:10]:
+            Size = (Size << 7) | (Byte & 0x7F)
+        End = 10 + Size
+        if End > len(Data):
+            return None
+
+        Offset = 10
+        while Offset + 10 <= End:
+            Header = Data[Offset:Offset + 10]
+            FrameID = Header[:4]
+            if FrameID[0] == 0:
+                # padding
+                break
+            if Version == 4:
+                FrameSize = 0
+                for Byte in Header[4:8]:
+                    FrameSize = (FrameSize << 7) | (Byte & 0x7F)
+            else:
+                FrameSize = int.from_bytes(Header[4:8], "big")
+            FrameFlags = Header[9]
+            Start = Offset + 10
+            Offset = Start + FrameSize
+            if Offset > End:
+                return None
+
+            Field = self.ID3_KEYS.get(FrameID.decode("latin-1"), self.FAST_ID3_KEYS.get(FrameID))
+            if FrameID != b"TXXX" and (Field == None or metadata[Field] != ""):
+                continue
+            if FrameFlags & (0x0C if Version == 3 else 0x0F):
+                # compressed, encrypted or unsynchronised frame
+                return None
+            Frame = Data[Start:Offset]
+            if FrameID == b"TXXX":
+                # user text frames are mapped by their description like EasyID3
+                Texts = self.DecodeTexts(Frame) + [""]
+                Field, Value = self.ID3_KEYS.get(f"TXXX:{Texts[0]}"), Texts[1]
+                if Field == None or metadata[Field] != "":
+                    continue
+            elif FrameID == b"WOAR":
+                # url frames have no encoding byte
+                Value = Frame.split(b"\x00")[0].decode("latin-1", "replace")
+            elif FrameID == b"TMCL":
+                # (role, performer) pairs, the first performer is kept
+                Value = (self.DecodeTexts(Frame) + ["", ""])[1]
+            else:
+                Value = self.DecodeText(Frame)
+            if Field == "genre":
+                Value = self.ID3Genre(Value)
+            metadata[Field] = Value
+        return End
+
+    def DecodeTexts(self, Frame):
+        """
+        Decodes the null separated values of an ID3 text frame
+        """
+        if len(Frame) == 0:
+            return [""]
+        Encoding, Text = Frame[0], Frame[1:]
+        if Encoding in (1, 2):
+            Codec = "utf-16" if Encoding == 1 else "utf-16-be"
+            # every utf-16 value starts with its own byte order mark
+            Text = Text.decode(Codec, "replace").replace("\ufeff", "")
+        else:
+            Text = Text.decode("utf-8" if Encoding == 3 else "latin-1", "replace")
+        return Text.split("\x00")
+
+    def DecodeText(self, Frame):
+        """
+        Decodes the first value of an ID3 text frame
+        """
+        return self.DecodeTexts(Frame)[0]
+
+    def ID3Genre(self, Value):
+        """
+        Resolves the numeric ID3v1 genre references used by TCON
+        """
+        Match = re.fullmatch(r"\(?(\d+)\)?(.*)", Value)
+        if Match != None:
+            Index = int(Match.group(1))
+            if Index < len(GENRES):
+                return GENRES[Index]
+        return Value
+
+    def FastMP3(self, Path):
+        """
+        Reads the ID3v2 tag and the first MPEG frame of a mp3 from a single
+        mapping of the file. Files with tags or headers it doesnt handle
+        return None and are read by mutagen.
+
+        :Args:
+            Path: String
+                Path of the file
+        """
+        Data = self.MapFile(Path)
+        if Data == None:
+            return None
+        with Data:
+            metadata = dict.fromkeys(DBFIELDS, "")
+            Offset = 0
+            if Data[:3] == b"ID3":
+                Offset = self.ParseID3v2(Data, metadata)
+                if Offset == None:
+                    return None
+
+            # zero padding can follow the tag before the first frame
+            Limit = min(len(Data), Offset + 4096)
+            while Offset < Limit and Data[Offset] == 0:
+                Offset += 1
+            Frame = self.MPEGFrame(Data, Offset)
+            if Frame == None:
+                return None
+
+            Length, Bitrate, Mode, Encoder = Frame["length"], Frame["bitrate"], "UNKNOWN", ""
+            Xing = self.XingFrames(Data, Frame)
+            if Xing == False:
+                return None
+            if Xing != None:
+                Mode, Length, Bitrate, Encoder = Xing
+            elif Length == None:
+                # cbr without a vbr header, verifies the next frame before trusting the size estimate
+                Next = Offset + Frame["frame_length"]
+                if Next + 4 <= len(Data) and self.MPEGFrame(Data, Next) == None:
+                    return None
+                Length = 8 * (len(Data) - Offset) / float(Bitrate)
+
+            self.StreamMetadata(metadata, Path, Length, Bitrate, Frame["sample_rate"], Frame["channels"])
+            metadata["bitrate_mode"] = f"BitrateMode.{Mode}"
+            metadata['frame_offset'] = Offset
+            for field in ["layer", "mode", "padding", "protected", "version"]:
+                metadata[field] = Frame[field]
+            for field in ["album_gain", "track_gain", "track_peak"]:
+                metadata[field] = None
+            metadata["encoder_info"] = Encoder
+            return metadata
+
+    def MPEGFrame(self, Data, Offset):
+        """
+        Parses the MPEG audio frame header at the offset, None if there is
+        no valid header
+        """
+        Header = Data[Offset:Offset + 4]
+        if len(Header) < 4 or Header[0] != 0xFF or (Header[1] & 0xE0) != 0xE0:
+            return None
+        Version = (Header[1] >> 3) & 0x03
+        Layer = (Header[1] >> 1) & 0x03
+        BitrateIndex = Header[2] >> 4
+        RateIndex = (Header[2] >> 2) & 0x03
+        if Version == 1 or Layer == 0 or RateIndex == 3 or BitrateIndex in (0, 15):
+            return None
+
+        Version = [2.5, None, 2, 1][Version]
+        Layer = 4 - Layer
+        Bitrate = self.MPEG_BITRATES[(1 if Version == 1 else 2, Layer if Version == 1 or Layer == 1 else 2)][BitrateIndex] * 1000
+        SampleRate = self.MPEG_RATES[Version][RateIndex]
+        Padding = (Header[2] >> 1) & 0x01
+        Mode = Header[3] >> 6
+
+        if Layer == 1:
+            FrameSize, Slot = 384, 4
+        elif Version >= 2 and Layer == 3:
+            FrameSize, Slot = 576, 1
+        else:
+            FrameSize, Slot = 1152, 1
+
+        return {"offset": Offset, "version": Version, "layer": Layer, "bitrate": Bitrate,
+                "sample_rate": SampleRate, "padding": bool(Padding), "mode": Mode,
+                "channels": 1 if Mode == 3 else 2, "protected": not (Header[1] & 0x01),
+                "frame_size": FrameSize, "length": None,
+                "frame_length": ((FrameSize // 8 * Bitrate) // SampleRate + Padding) * Slot}
+
+    def XingFrames(self, Data, Frame):
+        """
+        Reads the Xing/Info header of the first frame and returns
+        (bitrate mode, length, bitrate, encoder), None when the frame has no vbr
+        header and False when it has one the parser doesnt handle (VBRI)
+        """
+        if Frame["layer"] != 3:
+            return None
+        if Frame["version"] == 1:
+            Side = 17 if Frame["channels"] == 1 else 32
+        else:
+            Side = 9 if Frame["channels"] == 1 else 17
+        Offset = Frame["offset"] + 4
+        if Data[Offset + 32:Offset + 36] == b"VBRI":
+            return False
+        Offset += Side
+        Tag = Data[Offset:Offset + 4]
+        if Tag not in (b"Xing", b"Info"):
+            return None
+
+        Flags = int.from_bytes(Data[Offset + 4:Offset + 8], "big")
+        Cursor = Offset + 8
+        Frames = Bytes = -1
+        if Flags & 0x01:
+            Frames = int.from_bytes(Data[Cursor:Cursor + 4], "big")
+            Cursor += 4
+        if Flags & 0x02:
+            Bytes = int.from_bytes(Data[Cursor:Cursor + 4], "big")
+            Cursor += 4
+        if Flags & 0x04:
+            Cursor += 100
+        if Flags & 0x08:
+            Cursor += 4
+        if Frames == -1:
+            return False
+
+        Samples = Frame["frame_size"] * Frames
+        Bitrate = Frame["bitrate"]
+        if Bytes != -1 and Samples > 0:
+            Bitrate = int(round(max(0, Bytes - Frame["frame_length"]) * 8 * Frame["sample_rate"] / float(Samples)))
+
+        Mode, Encoder = "CBR" if Tag == b"Info" else "VBR", ""
+        Lame = Data[Cursor:Cursor + 24]
+        if Lame[:4] == b"LAME" and len(Lame) == 24:
+            # encoder delay and padding are trimmed from the length, the lame
+            # gains and presets are only decoded by mutagen
+            Method = Lame[9] & 0x0F
+            Mode = {1: "CBR", 8: "CBR", 2: "ABR", 9: "ABR"}.get(Method, "VBR" if Method in (3, 4, 5, 6) else Mode)
+            Encoder = "LAME " + Lame[4:9].decode("latin-1").strip("\x00 .")
+            Delay = int.from_bytes(Lame[21:24], "big")
+            Samples = max(0, Samples - (Delay >> 12) - (Delay & 0xFFF))
+        return (Mode, Samples / Frame["sample_rate"], Bitrate, Encoder)
+
+    def FastFLAC(self, Path):
+        """
+        Reads the STREAMINFO and VORBIS_COMMENT blocks of a flac from a single
+        mapping of the file, picture and padding blocks are skipped without
+        being read. Returns None for files it doesnt handle.
+
+        :Args:
+            Path: String
+                Path of the file
         """
-        query = QSqlQuery(f"SELECT count(DISTINCT file_id) FROM {tablename}")
-        query.exec_()
-        if query.next():
-            return (query.value(0))
-        else:
-            return 0
+        Data = self.MapFile(Path)
+        if Data == None:
+            return None
+        with Data:
+            if Data[:4] != b"fLaC":
+                return None
+            metadata = dict.fromkeys(DBFIELDS, "")
+            Info = None
+            Offset = 4
+            Last = False
+            while not Last:
+                Header = Data[Offset:Offset + 4]
+                if len(Header) < 4:
+                    return None
+                Last = bool(Header[0] & 0x80)
+                Type = Header[0] & 0x7F
+                Size = int.from_bytes(Header[1:4], "big")
+                Start = Offset + 4
+                Offset = Start + Size
+                if Offset > len(Data):
+                    return None
+
+                if Type == 0:
+                    Bits = int.from_bytes(Data[Start + 10:Start + 18], "big")
+                    Info = (Bits >> 44, ((Bits >> 41) & 0x07) + 1, Bits & 0xFFFFFFFFF)
+                elif Type == 4:
+                    self.ParseVorbisComment(Data[Start:Offset], metadata)
+
+            if Info == None or Info[0] == 0:
+                return None
+            SampleRate, Channels, Samples = Info
+            Length = Samples / float(SampleRate)
+            Bitrate = int((len(Data) - Offset) * 8 / Length) if Length else 0
+            return self.StreamMetadata(metadata, Path, Length, Bitrate, SampleRate, Channels)
+
+    def ParseVorbisComment(self, Block, metadata):
+        """
+        Parses a vorbis comment block into the metadata dict, the first value
+        of each key is kept
+        """
+        Offset = 4 + int.from_bytes(Block[:4], "little")
+        Count = int.from_bytes(Block[Offset:Offset + 4], "little")
+        Offset += 4
+        for _ in range(Count):
+            Length = int.from_bytes(Block[Offset:Offset + 4], "little")
+            Comment = Block[Offset + 4:Offset + 4 + Length].decode("utf-8", "replace")
+            Offset += 4 + Length
+            Key, _, Value = Comment.partition("=")
+            Key = Key.lower()
+            if Key in metadata and metadata[Key] == "":
+                metadata[Key] = Value
+
+def ScanWorker(Item, Strategy = "fast"):
+    """
+    Extraction worker used by the FileManager pools. Hashes and reads the
+    metadata of a file and returns it as a compact row tuple ordered as
+    DBFIELDS, None is returned for unsupported files.
+
+    :Args:
+        Item: Tuple
+            (path_id, file path)
+        Strategy: String
+            file_id strategy passed to the FileHasher
+    """
+    ID, Path = Item
+    Manager = FileManager()
+    Metadata = Manager.ScanFile(Path)
+    if Metadata == None:
+        return None
+    Metadata["path_id"] = ID
+    Metadata["file_id"] = Manager.FileHasher(Path, Strategy = Strategy)
+    return tuple(Metadata[field] for field in DBFIELDS)
+
+def ScanBatch(Items, Strategy = "fast"):
+    """
+    Runs the ScanWorker over a batch of items, used to reduce the number of
+    round trips to the pool workers
+    """
+    return [ScanWorker(Item, Strategy) for Item in Items]
 
-class FileManager(DataBaseManager):
+def StatFile(Path):
     """
-    File manager classes manages:
-    -> Scanning Directories
-    -> Fetching metadata for the related file format
-    
-    Read Supported Formats:
-    -> mp3
-    -> flac
+    Returns the stat of a file or None if it doesnt exist anymore
     """
-    
-    def __init__(self):
-        """Constructor"""
-        self.db_fields = DBFIELDS
-    
-    def TransposeMeatadata(self, Metadata):
-        T_metadata = dict.fromkeys(DBFIELDS, "")
-        for index, key in enumerate(T_metadata.keys()):
-            T_metadata[key] = [value[index] for value in Metadata]            
-        return T_metadata    
+    try:
+        return os.stat(Path)
+    except OSError:
+        return None
 
-   
-    def ScanDirectory(self, Dir, include = [], Slot = lambda: ''):
-        BatchMetadata = []
-        FileHashList = []
-        
-        file_paths = {}
-        for D, SD, F in os.walk(os.path.normpath(Dir)):
-            for file in F:
-                if os.path.splitext(file)[1] in include:
-                    file = os.path.normpath(os.path.join(D, file))
-                    file_paths[(hashlib.md5(file.encode())).hexdigest()] = file
-                    
-        ID = ", ".join([f"'{v}'" for v in set(file_paths.keys())])
-        query = QSqlQuery(f"SELECT path_id FROM library WHERE path_id IN ({ID})")
-        query.exec_()
-        while query.next():
-            del file_paths[query.value(0)]
-        self.FileChecker(file_paths, FileHashList, BatchMetadata)            
-        self.BatchInsert_Metadata(self.TransposeMeatadata(BatchMetadata))
-
-    def FileChecker(self, filepath, FileHashList, BatchMetadata):
-        QSqlQuery("BEGIN TRANSCATION").exec_()
-        for ID, file in filepath.items():
-            Filehash = self.FileHasher(file)            
-            if (Filehash not in FileHashList):
-                FileHashList.append(Filehash)
-                Metadata = self.ScanFile(file)
-                Metadata["path_id"] = ID
-                Metadata["file_id"] = Filehash                    
-                BatchMetadata.append(list(Metadata.values()))                        
-                
-    def ScanFile(self, Path):
+class AsyncScanPool:
+    """
+    Runs the blocking file reads of a scan from an asyncio loop. Every mount
+    gets its own semaphore and executor, so up to Limit reads are in flight
+    per mount and the throughput scales with the limit instead of the
+    latency of the mount.
+
+    >>> Pool = AsyncScanPool(32)
+    >>> Stats = list(Pool.Map(os.stat, Paths, lambda Path: Path, lambda Path: (Path,)))
+    >>> Pool.close()
+    """
+    def __init__(self, Limit = 32):
+        self.Limit = max(1, Limit)
+        self.Loop = asyncio.new_event_loop()
+        self.Mounts = {}
+        self.Semaphores = {}
+        self.Executors = {}
+
+    def MountPoint(self, Path):
         """
-        Reads the file metadata and generates a metadata dict and returns it.
+        Returns the mount point of a path, cached per directory
+        """
+        Dir = os.path.dirname(os.path.abspath(Path))
+        if Dir not in self.Mounts:
+            Mount = Dir
+            while not os.path.ismount(Mount) and os.path.dirname(Mount) != Mount:
+                Mount = os.path.dirname(Mount)
+            self.Mounts[Dir] = Mount
+        return self.Mounts[Dir]
+
+    async def Run(self, Mount, Function, Args):
+        """
+        Runs the function in the executor of the mount once a slot is free
+        """
+        if Mount not in self.Semaphores:
+            self.Semaphores[Mount] = asyncio.Semaphore(self.Limit)
+            self.Executors[Mount] = ThreadPoolExecutor(max_workers = self.Limit)
+        async with self.Semaphores[Mount]:
+            return await self.Loop.run_in_executor(self.Executors[Mount], Function, *Args)
+
+    def Map(self, Function, Items, Path, Args):
+        """
+        Runs the function over the items and yields (item, result) in the
+        same order as the items, the items are consumed lazily with a window
+        of a few times the limit
 
         :Args:
-            path: String
-                Path of the file        
+            Function: Method
+                blocking function to run
+            Items: Iterable
+                items to run the function over
+            Path: Method
+                returns the file path of an item, used to find its mount
+            Args: Method
+                returns the function arguments of an item
         """
-        EXT = os.path.splitext(Path)[1]
-        if EXT == ".mp3":
-            return self.get_MP3(Path)
-        
-        elif EXT == ".flac":
-            return self.get_FLAC(Path)
-        
-        else:
-            pass
+        Pending = collections.deque()
+        Window = self.Limit * 4
+        for Item in Items:
+            Task = self.Loop.create_task(self.Run(self.MountPoint(Path(Item)), Function, Args(Item)))
+            Pending.append((Item, Task))
+            if len(Pending) >= Window:
+                Item, Task = Pending.popleft()
+                yield (Item, self.Loop.run_until_complete(Task))
+        while Pending:
+            Item, Task = Pending.popleft()
+            yield (Item, self.Loop.run_until_complete(Task))
+
+    def close(self):
+        """
+        Cancels the reads left and closes the loop and the executors
+        """
+        Tasks = asyncio.all_tasks(self.Loop)
+        for Task in Tasks:
+            Task.cancel()
+        if len(Tasks) != 0:
+            self.Loop.run_until_complete(asyncio.gather(*Tasks, return_exceptions = True))
+        for Executor in self.Executors.values():
+            Executor.shutdown(wait = True)
+        self.Loop.close()
+
+class LibraryTableModel(QtCore.QAbstractTableModel):
+    """
+    Table model that reads the rows of a library table from the database in
+    pages instead of copying every cell into a QStandardItem. The view is
+    given a page of rows at a time through canFetchMore and fetchMore, the
+    rows are read when they are displayed and only the last CACHE_PAGES
+    pages are kept decoded as tuples. A page is read by keyset, it starts
+    after the order values (the sort column and the key of the row, the
+    rowid or the file_id and source of library_all) of the last row of the
+    page before it. Only those bounds of the walked pages are kept and the
+    row count is read from library_stats, so the startup, the memory and
+    the read of a page at the bottom dont grow with the library.
+
+    Only the columns of the projection are read, the file_id and the visible
+    sections of the view, a hidden column is read once it is shown again.
+
+    >>> Model = LibraryTableModel(library_manager, "library")
+    >>> View.setModel(Model)
+    """
+    # rows read per query and exposed per fetchMore
+    PAGE_SIZE = 256
+    # pages of decoded rows kept
+    CACHE_PAGES = 32
+
+    def __init__(self, Manager, Tablename, Parent = None):
+        super().__init__(Parent)
+        self.Manager = Manager
+        self.Tablename = Tablename
+        self.Fields = Manager.db_fields
+        self.Labels = {}
+        # the view has no rowid, its rows are unique by their file_id and source
+        self.Key = ["rowid"] if Tablename != "library_all" else ["file_id", "source"]
+        self.SortColumn, self.Descending = None, False
+        self.Pages = collections.OrderedDict()
+        # order values of the last row of every walked page, page n starts after Bounds[n]
+        self.Bounds = [None]
+        # row of the table shown at every row of the model while it is synced
+        self.Layout = None
+        self.Projection = []
+        self.SetProjection(range(len(self.Fields)), Notify = False)
+        self.Count = self.ReadCount()
+        self.Loaded = min(self.PAGE_SIZE, self.Count)
+
+    def ReadCount(self):
+        """
+        Returns the row count of the table, the count of the libraries is
+        kept in their library_stats row
+        """
+        if self.Tablename == "library":
+            return self.Manager.Fetch("SELECT tracks FROM library_stats")[0][0] or 0
+        if self.Tablename == "library_all":
+            Stats = " UNION ALL ".join([f"SELECT tracks FROM {Schema}.library_stats" for Source, Schema in self.Manager.Sources()])
+            return self.Manager.Fetch(f"SELECT sum(tracks) FROM ({Stats})")[0][0] or 0
+        return self.Manager.Fetch(f"SELECT count(*) FROM {self.Tablename}")[0][0]
+
+    def OrderColumns(self):
+        """
+        Returns the columns the rows are ordered by, the key keeps the rows of equal values in a stable order
+        """
+        return ([self.SortColumn] if self.SortColumn != None else []) + self.Key
 
-    def FileHasher(self, file, hashfun = hashlib.md5):
+    def OrderBy(self, Aliased = False):
         """
-        Creates a hash id for the file path passed and returns hash id.
-        Hash id is calculated with the 1024 bytes of the file.
+        Returns the ORDER BY clause of the rows, the columns are named o0, o1, ... when Aliased
+        """
+        Direction = "DESC" if self.Descending else "ASC"
+        Columns = [f"o{Index}" if Aliased else Column for Index, Column in enumerate(self.OrderColumns())]
+        return "ORDER BY " + ", ".join([f"{Column} {Direction}" for Column in Columns])
+
+    def Compare(self, Bound, After = True):
+        """
+        Returns the condition and the values of the rows ordered after the
+        order values of a row, or of the rows up to and including it. NULLs
+        are ordered first and compare to NULL in the row values, so a sorted
+        column checks them on its own.
+
+        >>> Model.Compare(("titleX9", 10))
+        ('(title, rowid) > (?, ?)', ['titleX9', 10])
 
         :Args:
-            file: String
-                File for which the hash is generated
-            hashfun: Method
-                Hashing algorithm method from hashlib
+            Bound: Tuple
+                order values of the row, None is before the first row
+            After: Bool
+                the rows after the bound, else the rows up to it
         """
-        with open(file, "rb") as fobj:
-            bytes_ = fobj.read(1024)
-            hashval = (hashfun(bytes_)).hexdigest()
-        return hashval    
+        if Bound == None:
+            return ("1" if After else "0"), []
+        Keys, Values = f"({', '.join(self.Key)})", list(Bound[-len(self.Key):])
+        Holders = lambda Count: f"({', '.join('?' * Count)})"
+        Operator = {(True, False): ">", (True, True): "<", (False, False): "<=", (False, True): ">="}[(After, self.Descending)]
+        if self.SortColumn == None:
+            return f"{Keys} {Operator} {Holders(len(Values))}", Values
+
+        # the rows on the greater side of the bound, NULLs are on the lesser side
+        Greater = After != self.Descending
+        Column, Value = self.SortColumn, Bound[0]
+        if Value == None:
+            if Greater:
+                return f"({Column} IS NOT NULL OR {Keys} {Operator} {Holders(len(Values))})", Values
+            return f"({Column} IS NULL AND {Keys} {Operator} {Holders(len(Values))})", Values
+        Rows = f"({Column}, {', '.join(self.Key)}) {Operator} {Holders(len(Values) + 1)}"
+        if Greater:
+            return Rows, [Value] + Values
+        return f"({Rows} OR {Column} IS NULL)", [Value] + Values
+
+    def rowCount(self, Parent = QtCore.QModelIndex()):
+        return 0 if Parent.isValid() else self.Loaded
+
+    def columnCount(self, Parent = QtCore.QModelIndex()):
+        return 0 if Parent.isValid() else len(self.Fields)
+
+    def canFetchMore(self, Parent = QtCore.QModelIndex()):
+        return not Parent.isValid() and self.Loaded < self.Count
+
+    def fetchMore(self, Parent = QtCore.QModelIndex()):
+        """
+        Exposes the next page of rows, they are read once they are displayed
+        """
+        if not self.canFetchMore(Parent):
+            return None
+        Loaded, Count = min(self.Loaded + self.PAGE_SIZE, self.Count), self.Count
+        # the slots of the inserted rows cant fetch more rows before they are counted
+        self.Count = self.Loaded
+        self.beginInsertRows(QtCore.QModelIndex(), self.Loaded, Loaded - 1)
+        self.Loaded = Loaded
+        self.endInsertRows()
+        self.Count = Count
+
+    def FetchAll(self):
+        """
+        Exposes every row of the table without reading them
+        """
+        if self.canFetchMore():
+            Count, self.Count = self.Count, self.Loaded
+            self.beginInsertRows(QtCore.QModelIndex(), self.Loaded, Count - 1)
+            self.Loaded = Count
+            self.endInsertRows()
+            self.Count = Count
+
+    def SetProjection(self, Columns, Notify = True):
+        """
+        Sets the columns read from the table, the file_id is always read.
+        The decoded rows are dropped and the columns that were added are
+        displayed again.
 
-    def get_FLAC(self, Path):
-        muta_file = mutagen.File(Path, easy = True)
-        metadata = dict.fromkeys(DBFIELDS, "")
-        
-        for key in muta_file.keys():
-            metadata[key] = muta_file.get(key)[0]
-            
-        metadata['sample_rate'] = f"{muta_file.info.sample_rate}Hz"
-        metadata["length"] = str(datetime.timedelta(seconds = muta_file.info.length))
-        metadata["bitrate"] = f"{int(muta_file.info.bitrate / 1000)}Kbps"                  
-        metadata['channels'] = muta_file.info.channels
-        metadata["filesize"] = f"{round(os.path.getsize(muta_file.filename) * 0.00000095367432, 2)}Mb"
-        metadata["file_name"] = os.path.split(muta_file.filename)[1]
-        metadata["file_path"] = muta_file.filename
-        metadata["rating"] = 0
-        metadata["playcount"] = 0
-        
-        return metadata
-   
-    def get_MP3(self, Path): 
-        muta_file = mutagen.File(Path, easy = True)
-        metadata = dict.fromkeys(DBFIELDS, "")
-        
-        for key in muta_file.keys():
-            metadata[key] = muta_file.get(key)[0]
-            
-        metadata["bitrate_mode"] = str(muta_file.info.bitrate_mode).replace(')', "").replace('BitrateMode(', "")
-        metadata['album_gain'] = muta_file.info.album_gain
-        metadata['encoder_info'] = muta_file.info.encoder_info
-        metadata['encoder_settings'] = muta_file.info.encoder_settings
-        metadata['frame_offset'] = muta_file.info.frame_offset
-        metadata['layer'] = muta_file.info.layer
-        metadata['mode'] = muta_file.info.mode
-        metadata['padding'] = muta_file.info.padding
-        metadata['protected'] = muta_file.info.protected
-        metadata['track_gain'] = muta_file.info.track_gain
-        metadata['track_peak'] = muta_file.info.track_peak
-        metadata['version'] = muta_file.info.version
-        
-        metadata['sample_rate'] = f"{muta_file.info.sample_rate}Hz"
-        metadata["length"] = str(datetime.timedelta(seconds = muta_file.info.length))
-        metadata["bitrate"] = f"{int(muta_file.info.bitrate / 1000)}Kbps"                  
-        metadata['channels'] = muta_file.info.channels
-        metadata["filesize"] = f"{round(os.path.getsize(muta_file.filename) * 0.00000095367432, 2)}Mb"
-        metadata["file_name"] = os.path.split(muta_file.filename)[1]
-        metadata["file_path"] = muta_file.filename
-        metadata["rating"] = 0
-        metadata["playcount"] = 0
-    
-        return metadata
+        >>> Model.SetProjection([0, 1, 7])
+
+        :Args:
+            Columns: Iterable[Int]
+                indexes of the columns to read
+            Notify: Bool
+                emits dataChanged for the added columns
+        """
+        Columns = sorted(set(Columns) | {0})
+        Added = set(Columns) - set(self.Projection)
+        self.Projection = Columns
+        # position of each projected column in the decoded row tuples
+        self.Slots = {Column: Slot for Slot, Column in enumerate(Columns)}
+        self.Pages.clear()
+        if Notify and Added and self.Loaded > 0:
+            self.dataChanged.emit(self.index(0, min(Added)), self.index(self.Loaded - 1, max(Added)))
+
+    def ProjectSections(self, Header):
+        """
+        Projects the columns of the sections that arent hidden in the header
+
+        :Args:
+            Header: QHeaderView
+                header view of the table the model is set into
+        """
+        self.SetProjection([Column for Column in range(self.columnCount()) if not Header.isSectionHidden(Column)])
+
+    def SelectQuery(self):
+        """
+        Returns the query of the projected columns and the order values of
+        the rows, the order values are read as a json array so their NULLs
+        arent read as empty strings
+        """
+        Columns = ", ".join([self.Fields[Column] for Column in self.Projection])
+        return f"SELECT {Columns}, json_array({', '.join(self.OrderColumns())}) FROM {self.Tablename}"
+
+    def Walk(self, Page):
+        """
+        Reads the bounds of the pages up to a page in one pass over the rows
+        after the last walked bound, only the order values of the last row
+        of every page are kept
+
+        :Args:
+            Page: Int
+                page to walk to
+        """
+        Walked = len(self.Bounds) - 1
+        if Page <= Walked:
+            return None
+        Condition, Values = self.Compare(self.Bounds[-1])
+        Columns = self.OrderColumns()
+        Aliases = ", ".join([f"o{Index}" for Index in range(len(Columns))])
+        Rows = self.Manager.Fetch(f"""
+        SELECT json_array({Aliases}) FROM (
+        SELECT {Aliases}, row_number() OVER ({self.OrderBy(Aliased = True)}) AS n FROM (
+        SELECT {', '.join([f'{Column} AS o{Index}' for Index, Column in enumerate(Columns)])}
+        FROM {self.Tablename} WHERE {Condition} {self.OrderBy()} LIMIT ?))
+        WHERE n % ? = 0 ORDER BY n
+        """, *Values, (Page - Walked) * self.PAGE_SIZE, self.PAGE_SIZE)
+        self.Bounds.extend([tuple(json.loads(Row[0])) for Row in Rows])
+
+    def ReadPage(self, Page):
+        """
+        Returns the projected values and the order values of the rows of a
+        walked page, the bound of the next page is kept once it is full
+        """
+        Condition, Values = self.Compare(self.Bounds[Page])
+        Rows = self.Manager.Fetch(f"{self.SelectQuery()} WHERE {Condition} {self.OrderBy()} LIMIT ?",
+                                  *Values, self.PAGE_SIZE)
+        Orders = [tuple(json.loads(Row.pop())) for Row in Rows]
+        if len(Rows) == self.PAGE_SIZE and len(self.Bounds) == Page + 1:
+            self.Bounds.append(Orders[-1])
+        return [tuple(Row) for Row in Rows], Orders
+
+    def Row(self, Row):
+        """
+        Returns the values of the projected columns of a row as a tuple, its
+        page is read on a cache miss
+        """
+        if self.Layout != None:
+            # while the rows are synced they are read at their row in the table
+            Row = self.Layout[Row]
+            if Row < 0:
+                return None
+        Page, Offset = divmod(Row, self.PAGE_SIZE)
+        Rows = self.Pages.pop(Page, None)
+        if Rows == None:
+            self.Walk(Page)
+            if Page >= len(self.Bounds):
+                return None
+            Rows = self.ReadPage(Page)
+        self.Pages[Page] = Rows
+        if len(self.Pages) > self.CACHE_PAGES:
+            self.Pages.popitem(last = False)
+        return Rows[0][Offset] if Offset < len(Rows[0]) else None
+
+    def Column(self, Column):
+        """
+        Returns the values of a column for the exposed rows in one pass over
+        the table, they are not cached. The order of the rows is always
+        explicit, the rowid by default, so the single column is read in the
+        order of the pages even when it is answered from an index.
+
+        >>> Model.Column(0)
+        ['file_idX0', 'file_idX1', ...]
+        """
+        Query = self.Manager.Exec(f"SELECT {self.Fields[Column]} FROM {self.Tablename} {self.OrderBy()} LIMIT ?",
+                                  self.Loaded if self.Layout == None else max(self.Layout, default = -1) + 1)
+        Values = []
+        while Query.next():
+            Values.append(Query.value(0))
+        Query.finish()
+        if self.Layout != None:
+            # while the rows are synced they are read at their row in the table
+            Values = [Values[Row] if Row >= 0 else None for Row in self.Layout]
+        return Values
+
+    def data(self, Index, Role = Qt.DisplayRole):
+        if not Index.isValid() or Role not in (Qt.DisplayRole, Qt.UserRole):
+            return None
+        # a column outside of the projection is added to it when it is read
+        if Index.column() not in self.Slots:
+            self.SetProjection(self.Projection + [Index.column()], Notify = False)
+        Row = self.Row(Index.row())
+        if Row == None:
+            return None
+        Value = Row[self.Slots[Index.column()]]
+        if Role == Qt.UserRole:
+            return Value
+        return DisplayValue(self.Fields[Index.column()], Value)
+
+    def headerData(self, Section, Orientation, Role = Qt.DisplayRole):
+        if Role != Qt.DisplayRole:
+            return None
+        if Orientation == Qt.Horizontal:
+            return self.Labels.get(Section, str(Section + 1))
+        return str(Section + 1)
+
+    def setHeaderData(self, Section, Orientation, Value, Role = Qt.EditRole):
+        if Orientation != Qt.Horizontal or Role not in (Qt.DisplayRole, Qt.EditRole):
+            return False
+        self.Labels[Section] = Value
+        self.headerDataChanged.emit(Orientation, Section, Section)
+        return True
+
+    def sort(self, Column, Order = Qt.AscendingOrder):
+        """
+        Sorts the rows in the database by the stored value of the column
+        """
+        self.layoutAboutToBeChanged.emit()
+        self.SortColumn, self.Descending = self.Fields[Column], Order == Qt.DescendingOrder
+        self.Bounds = [None]
+        self.Pages.clear()
+        self.layoutChanged.emit()
+
+    def removeRows(self, Row, Count, Parent = QtCore.QModelIndex()):
+        """
+        Drops rows that were deleted from the table, the rows after them move up
+        """
+        if Count <= 0 or Row < 0 or Row + Count > self.Loaded:
+            return False
+        self.beginRemoveRows(Parent, Row, Row + Count - 1)
+        self.Count -= Count
+        self.Loaded -= Count
+        # the pages from the one of the first removed row hold other rows now
+        del self.Bounds[Row // self.PAGE_SIZE + 1:]
+        self.Pages.clear()
+        self.endRemoveRows()
+        return True
+
+    def Invalidate(self):
+        """
+        Drops the decoded rows, the rows are read again from the table
+        """
+        self.Pages.clear()
+        if self.Loaded > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(self.Loaded - 1, len(self.Fields) - 1))
+
+    def Refresh(self):
+        """
+        Reads the row count of the table again after it was written, as many
+        rows as before stay exposed
+        """
+        self.beginResetModel()
+        self.Pages.clear()
+        self.Bounds = [None]
+        self.Count = self.ReadCount()
+        self.Loaded = min(max(self.Loaded, self.PAGE_SIZE), self.Count)
+        self.endResetModel()
+
+    def KeptKeys(self, Old, Positions):
+        """
+        Returns the keys of the longest run of rows that are still in the
+        table and kept their order, the other rows moved or were removed
+
+        :Args:
+            Old: Sequence
+                keys of the rows before the write
+            Positions: Dict
+                position of each key after the write
+        """
+        Survivors = [(Positions[Key], Key) for Key in Old if Key in Positions]
+        # longest increasing subsequence of the new positions
+        Tails, TailIndexes, Previous = [], [], [None] * len(Survivors)
+        for Index, (Position, Key) in enumerate(Survivors):
+            Slot = bisect.bisect_left(Tails, Position)
+            if Slot == len(Tails):
+                Tails.append(Position)
+                TailIndexes.append(Index)
+            else:
+                Tails[Slot] = Position
+                TailIndexes[Slot] = Index
+            Previous[Index] = TailIndexes[Slot - 1] if Slot > 0 else None
+
+        Kept = set()
+        Index = TailIndexes[-1] if len(TailIndexes) else None
+        while Index != None:
+            Kept.add(Survivors[Index][1])
+            Index = Previous[Index]
+        return Kept
+
+    def Runs(self, Rows):
+        """
+        Returns the (first, last) ranges of consecutive rows of a sorted list
+        """
+        Runs = []
+        for Row in Rows:
+            if len(Runs) and Runs[-1][1] == Row - 1:
+                Runs[-1][1] = Row
+            else:
+                Runs.append([Row, Row])
+        return Runs
+
+    def PageSizes(self, Walked, Flag, *Values):
+        """
+        Returns the row count and the changed flag of every walked page
+        after a write in one pass over the rows up to the last bound, the
+        rows are counted between the bounds, which stay valid as values
+
+        :Args:
+            Walked: Int
+                count of the exposed walked pages
+            Flag: String
+                sql expression of the changed rows
+            Values: Any
+                values bound to the flag
+        """
+        Sizes, Changed = [0] * Walked, [False] * Walked
+        if Walked == 0:
+            return Sizes, Changed
+        Columns = self.OrderColumns()
+        Upper, UpperValues = self.Compare(self.Bounds[Walked], After = False)
+        # the bounds of the pages are merged into the ordered rows, a row is counted in the page of the bounds before it
+        Rows = self.Manager.Fetch(f"""
+        SELECT bucket, count(*), max(flag) FROM (
+        SELECT marker, flag, sum(marker) OVER ({self.OrderBy(Aliased = True)}, marker) AS bucket FROM (
+        SELECT {', '.join([f'{Column} AS o{Index}' for Index, Column in enumerate(Columns)])}, 0 AS marker, {Flag} AS flag
+        FROM {self.Tablename} WHERE {Upper}
+        UNION ALL SELECT {', '.join([f"json_extract(value, '$[{Index}]')" for Index in range(len(Columns))])}, 1, 0
+        FROM json_each(?)))
+        WHERE marker = 0 GROUP BY bucket
+        """, *Values, *UpperValues, json.dumps(self.Bounds[1:Walked]))
+        for Page, Size, Flagged in Rows:
+            Sizes[Page], Changed[Page] = Size, bool(Flagged)
+        return Sizes, Changed
+
+    def PageKeys(self, Page, Limit, Flag, *Values):
+        """
+        Returns the keys and the changed flags of the rows of a page after a
+        write, the rows after its bound up to the next bound or up to Limit rows
+        """
+        Condition, Bound = self.Compare(self.Bounds[Page])
+        Upper, UpperValues = self.Compare(self.Bounds[Page + 1], After = False) if Limit == None else ("1", [])
+        Rows = self.Manager.Fetch(f"""
+        SELECT {', '.join(self.Key)}, {Flag} FROM {self.Tablename}
+        WHERE {Condition} AND {Upper} {self.OrderBy()} LIMIT ?
+        """, *Values, *Bound, *UpperValues, -1 if Limit == None else Limit)
+        return [tuple(Row[:-1]) for Row in Rows], [bool(Row[-1]) for Row in Rows]
+
+    def Sync(self, Condition = "", *Values):
+        """
+        Counts the rows of the exposed pages again after the table was written
+        and emits the removal and insertion of the rows that changed instead of
+        a reset, so the views keep their scroll position and selection. The
+        bounds of the pages stay valid, so only the rows up to the last
+        exposed bound are counted. The pages that are still cached are diffed
+        by their keys, rows that moved in the sort order are removed and
+        inserted at their new position and the changed rows that stayed in
+        place emit dataChanged. The other pages that changed are shrunk or
+        grown at their end and emit dataChanged.
+
+        >>> Model.Sync("file_path >= ? AND file_path < ?", "E:/music/", "E:/music0")
+
+        :Args:
+            Condition: String
+                where clause of the rows rewritten in place, every row may
+                have changed if empty
+            Values: Any
+                values bound to the condition
+        """
+        Flag = f"coalesce(({Condition}), 0)" if Condition else "1"
+        Exposed, Cached = self.Loaded, dict(self.Pages)
+        # the exposed rows after the last walked bound are the tail
+        Walked = min(len(self.Bounds) - 1, Exposed // self.PAGE_SIZE)
+        Sizes, Changed = self.PageSizes(Walked, Flag, *Values)
+        Count = self.ReadCount()
+        Tail = Exposed - Walked * self.PAGE_SIZE
+        Sizes.append(min(Tail, max(Count - sum(Sizes), 0)))
+        Changed.append(True)
+
+        Layout, Updated = array("q"), []
+        for Page, (Size, Flagged) in enumerate(zip(Sizes, Changed)):
+            Start, Old = sum(Sizes[:Page]), Tail if Page == Walked else self.PAGE_SIZE
+            Keys = None
+            if Page in Cached and (Flagged or Size != Old) and len(Cached[Page][1]) >= Old:
+                Keys, Flags = self.PageKeys(Page, Size if Page == Walked else None, Flag, *Values)
+            if Keys != None:
+                # the rows of a cached page are diffed by their keys
+                Positions = {Key: Start + Row for Row, Key in enumerate(Keys)}
+                OldKeys = [Order[-len(self.Key):] for Order in Cached[Page][1][:Old]]
+                Kept = self.KeptKeys(OldKeys, Positions)
+                Layout.extend([Positions[Key] if Key in Kept else -1 for Key in OldKeys])
+                Updated.extend([Positions[Key] for Key, Flagged in zip(Keys, Flags) if Flagged and Key in Kept])
+            else:
+                Layout.extend([Start + Row if Row < Size else -1 for Row in range(Old)])
+                if Flagged or Size != Old:
+                    Updated.extend(range(Start, Start + Size))
+
+        # the bounds hold until the first page whose row count changed
+        Resized = [Page for Page in range(Walked) if Sizes[Page] != self.PAGE_SIZE]
+        del self.Bounds[(Resized[0] if Resized else Walked) + 1:]
+        self.Pages.clear()
+        self.Layout = Layout
+        # no rows are fetched by the views until the exposed rows match the table
+        self.Count = self.Loaded
+
+        # removed and moved rows, from the last so the rows before keep their position
+        for First, Last in reversed(self.Runs([Row for Row in range(self.Loaded) if Layout[Row] < 0])):
+            self.beginRemoveRows(QtCore.QModelIndex(), First, Last)
+            del Layout[First:Last + 1]
+            self.Loaded = self.Count = len(Layout)
+            self.endRemoveRows()
+
+        # the rows left are in the order of the table, the missing rows are inserted in order
+        Present = set(Layout)
+        for First, Last in self.Runs([Row for Row in range(sum(Sizes)) if Row not in Present]):
+            self.beginInsertRows(QtCore.QModelIndex(), First, Last)
+            Layout[First:First] = array("q", range(First, Last + 1))
+            self.Loaded = self.Count = len(Layout)
+            self.endInsertRows()
+        self.Layout = None
+        # as many rows as before stay exposed
+        Loaded = min(max(Exposed, self.PAGE_SIZE), Count)
+        if self.Loaded < Loaded:
+            self.beginInsertRows(QtCore.QModelIndex(), self.Loaded, Loaded - 1)
+            self.Loaded = self.Count = Loaded
+            self.endInsertRows()
+        self.Count = Count
+
+        for First, Last in self.Runs(sorted(Row for Row in set(Updated) if Row < self.Loaded)):
+            self.dataChanged.emit(self.index(First, 0), self.index(Last, len(self.Fields) - 1))
+
+class FileIdFilterModel(QtCore.QSortFilterProxyModel):
+    """
+    Proxy model that filters the rows of a table model by a set of file_ids,
+    a filter change is a single reset of the proxy instead of a show or
+    hide call for every row of the view. The file_ids of a paged library
+    model are read in one query and kept until its rows change. The text
+    filter of QSortFilterProxyModel filters the rows of a column.
+
+    >>> Proxy = FileIdFilterModel(View)
+    >>> Proxy.setSourceModel(Model)
+    >>> Proxy.SetFileIds(["file_idX1", "file_idX8"])
+    """
+
+    def __init__(self, Parent = None):
+        super().__init__(Parent)
+        self.FileIds = None
+        self.Ids = None
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+    def setSourceModel(self, Model):
+        """
+        Sets the model to filter, a new model starts without a filter
+        """
+        self.FileIds = None
+        self.Ids = None
+        # the ids are dropped before the proxy maps the changed rows, a
+        # replaced model would still clear the ids of the new one
+        for Source, Connect in ((self.sourceModel(), False), (Model, True)):
+            if Source == None:
+                continue
+            for Signal in (Source.rowsAboutToBeInserted, Source.rowsAboutToBeRemoved,
+                           Source.layoutAboutToBeChanged, Source.modelAboutToBeReset):
+                if Connect:
+                    Signal.connect(self.ClearIds)
+                else:
+                    Signal.disconnect(self.ClearIds)
+        super().setSourceModel(Model)
+
+    def ClearIds(self, *args):
+        self.Ids = None
+
+    def SetFileIds(self, FileIds):
+        """
+        Shows only the rows of the given file_ids, every row is shown for None
+
+        :Args:
+            FileIds: Iterable, None
+                file_ids of the rows to show
+        """
+        Source = self.sourceModel()
+        if FileIds != None and isinstance(Source, LibraryTableModel):
+            Source.FetchAll()
+        # the rows are mapped again in one reset, invalidateFilter would
+        # emit the removal and insertion of every range of changed rows
+        self.beginResetModel()
+        self.FileIds = None if FileIds == None else set(FileIds)
+        self.endResetModel()
+
+    def filterAcceptsRow(self, Row, Parent):
+        if not super().filterAcceptsRow(Row, Parent):
+            return False
+        if self.FileIds == None:
+            return True
+        Source = self.sourceModel()
+        if not isinstance(Source, LibraryTableModel):
+            return Source.index(Row, 0, Parent).data() in self.FileIds
+        if self.Ids == None:
+            self.Ids = Source.Column(0)
+        return Row < len(self.Ids) and self.Ids[Row] in self.FileIds
+
+    def sort(self, Column, Order = Qt.AscendingOrder):
+        """
+        Sorts the rows of the source, by its stored values or in the database
+        """
+        self.sourceModel().sort(Column, Order)
 
 class ModelView_Manager(FileManager):
     """"""
@@ -713,8 +3878,8 @@ class ModelView_Manager(FileManager):
             None: if Tablename is invalid
         """
         #  Runs a select query to return QueryPointer
-        query = QSqlQuery()
-        if Tablename in ["library", 'nowplaying']:
+        query = QSqlQuery(self.db_driver)
+        if Tablename in ["library", "library_all", 'nowplaying']:
             if not query.prepare(f"SELECT * FROM {Tablename}"):
                 msg = dedenter(f"""
                                Query(SELECT * FROM {Tablename})
@@ -735,6 +3900,11 @@ class ModelView_Manager(FileManager):
         if not(len(Order) == 0):
             TableModel = self.OrderedSqlTableModel(query, Order)
 
+        # the library is read in pages as it is scrolled
+        elif Tablename in ["library", "library_all"]:
+            query.finish()
+            TableModel = LibraryTableModel(self, Tablename)
+
         # Table population by Normal method
         elif len(Order) == 0:
             TableModel = self.SqlTableModel(query)
@@ -742,15 +3912,21 @@ class ModelView_Manager(FileManager):
         else:
             pass
 
+        # the view shows the model through its filter proxy
+        Proxy = View.model() if isinstance(View.model(), FileIdFilterModel) else FileIdFilterModel(View)
+        Proxy.setSourceModel(TableModel)
+        View.setModel(Proxy)
+        if isinstance(TableModel, LibraryTableModel):
+            TableModel.ProjectSections(View.horizontalHeader())
+
         # Sets all the header labels
-        View.setModel(TableModel)
         if  Headers == None:
             Headers = list(range(TableModel.columnCount()))
         self.SetTable_horizontalHeader(View, Headers)
 
         return TableModel
 
-    def OrderedSqlTableModel(self, Query, Order): # untested
+    def OrderedSqlTableModel(self, Query, Order):
         """
         Returns a TableModel Ordered according to the Order.
 
@@ -764,27 +3940,26 @@ class ModelView_Manager(FileManager):
 
         :Return: QStandardItemModel
         """
-        TableModel = QtGui.QStandardItemModel()
-        Cols = range(len(self.db_fields))
+        # position of each file_id in the order, a repeated file_id keeps its first position
+        Positions = {}
+        for Position, FileId in enumerate(Order):
+            Positions.setdefault(FileId, Position)
 
-        TableModel.beginInsertRows(QtCore.QModelIndex(), 0, len(Order) - 1)
-
-        # uses the query to get data
+        # uses the query to get the rows into their positions
+        Cols = range(len(self.db_fields))
+        Rows = [None] * len(Order)
         while Query.next():
-            for Column in Cols:
-                Item = Query.value(Column)
-                if Column == 0:
-                    Row = Order.index(Item)
-                # set the query items into the TableModel
-                TableModel.setItem(Row, Column, QtGui.QStandardItem(Item))
-
-        TableModel.endInsertRows()
-
-        # removes the rows that are empty
-        for Row in range(TableModel.rowCount()):
-            if TableModel.item(Row) == None:
-                TableModel.removeRow(Row)
-
+            Position = Positions.get(Query.value(0))
+            if Position != None:
+                Rows[Position] = [self.TableItem(Column, Query.value(Column)) for Column in Cols]
+
+        # the rows missing from the query are left out
+        Rows = [Row for Row in Rows if Row != None]
+        TableModel = QtGui.QStandardItemModel(len(Rows), len(Cols))
+        for Row, Items in enumerate(Rows):
+            for Column, Item in enumerate(Items):
+                TableModel.setItem(Row, Column, Item)
+        TableModel.setSortRole(Qt.UserRole)
         return TableModel
 
     def SqlTableModel(self, Query): # untested
@@ -805,10 +3980,26 @@ class ModelView_Manager(FileManager):
 
         # gets and sets the query item
         while Query.next():
-            TableModel.insertRow(Row, [QtGui.QStandardItem(str(Query.value(Column))) for Column in Cols])
+            TableModel.insertRow(Row, [self.TableItem(Column, Query.value(Column)) for Column in Cols])
             Row += 1
+        TableModel.setSortRole(Qt.UserRole)
         return TableModel
 
+    def TableItem(self, Column, Value):
+        """
+        Returns the item of a table cell, the formatted value is displayed
+        and the stored value is kept in the UserRole for sorting
+
+        :Args:
+            Column: Int
+                Column of the value in the db fields
+            Value: Any
+                Value stored in the table
+        """
+        Item = QtGui.QStandardItem(DisplayValue(self.db_fields[Column], Value))
+        Item.setData(Value, Qt.UserRole)
+        return Item
+
     def Refresh_TableModelData(self, View) -> "QStandardItemModel":
         """
         Refreshes the TableModel
@@ -820,13 +4011,152 @@ class ModelView_Manager(FileManager):
         Table = View.property("DB_Table")
         return self.SetTableModle(Table, View, View.property("DB_Columns"))
 
+    def Refresh_DirectoryRows(self, View, Dirs) -> "QStandardItemModel":
+        """
+        Refreshes only the rows of the files under the given directories,
+        rows are updated in place, removed files are dropped and new files
+        are appended to the model
+
+        >>> library_manager.Refresh_DirectoryRows(View, ["E:\\music\\new"])
+
+        :Args:
+            View: QTableView
+                View containing the library model
+            Dirs: List
+                Directories that were rescanned
+        """
+        TableModel = self.SourceModel(View)
+        Table = View.property("DB_Table")
+        if Table not in ["library", "library_all"] or TableModel == None:
+            return TableModel
+        Prefixes = [os.path.join(os.path.normpath(Dir), "") for Dir in Dirs]
+        if isinstance(TableModel, LibraryTableModel):
+            # the rows under the folders are updated in place, the other rows only move
+            Ranges = []
+            for Prefix in Prefixes:
+                Ranges.extend([Prefix, Prefix[:-1] + chr(ord(Prefix[-1]) + 1)])
+            TableModel.Sync(" OR ".join(["(file_path >= ? AND file_path < ?)"] * len(Prefixes)), *Ranges)
+            return TableModel
+
+        Cols = range(TableModel.columnCount())
+        Rows = {}
+        for Prefix in Prefixes:
+            Query = QSqlQuery(self.db_driver)
+            Query.prepare(f"SELECT * FROM {Table} WHERE file_path >= ? AND file_path < ?")
+            Query.addBindValue(Prefix)
+            Query.addBindValue(Prefix[:-1] + chr(ord(Prefix[-1]) + 1))
+            self.ExeQuery(Query)
+            while Query.next():
+                Rows[str(Query.value(1))] = [Query.value(Column) for Column in Cols]
+
+        for Row in reversed(range(TableModel.rowCount())):
+            Path = TableModel.index(Row, 3).data()
+            if not any(str(Path).startswith(Prefix) for Prefix in Prefixes):
+                continue
+            Data = Rows.pop(TableModel.index(Row, 1).data(), None)
+            if Data == None:
+                TableModel.removeRow(Row)
+                continue
+            for Column in Cols:
+                Index = TableModel.index(Row, Column)
+                if Index.data(Qt.UserRole) != Data[Column]:
+                    TableModel.setData(Index, DisplayValue(self.db_fields[Column], Data[Column]))
+                    TableModel.setData(Index, Data[Column], Qt.UserRole)
+
+        for Data in Rows.values():
+            TableModel.appendRow([self.TableItem(Column, Value) for Column, Value in enumerate(Data)])
+        return TableModel
+
+    def Refresh_QueueRows(self, View) -> "QStandardItemModel":
+        """
+        Updates the nowplaying model to the order of the queue. The rows of
+        the model are diffed with the queue, only the inserted rows are read
+        from the library and the removed rows are dropped from the model.
+
+        >>> library_manager.Queue_Insert(["id3"], Index = 1)
+        >>> library_manager.Refresh_QueueRows(View)
+
+        :Args:
+            View: QTableView
+                View containing the nowplaying model
+        """
+        TableModel = self.SourceModel(View)
+        if View.property("DB_Table") != "nowplaying" or TableModel == None:
+            return self.Refresh_TableModelData(View)
+
+        Old = [TableModel.index(Row, 0).data() for Row in range(TableModel.rowCount())]
+        New = [Row[0] for Row in self.Fetch("SELECT file_id FROM nowplaying")]
+        Opcodes = difflib.SequenceMatcher(None, Old, New, autojunk = False).get_opcodes()
+
+        Inserted = {FileId for Tag, _, _, Start, End in Opcodes if Tag in ("insert", "replace") for FileId in New[Start:End]}
+        Rows = {Row[0]: Row for Row in self.Fetch(f"SELECT * FROM {self.LibraryTable} WHERE file_id IN (SELECT value FROM json_each(?))",
+                                                  json.dumps(list(Inserted)))}
+        # applied from the end so the indexes of the earlier opcodes stay valid
+        for Tag, OldStart, OldEnd, Start, End in reversed(Opcodes):
+            if Tag in ("delete", "replace"):
+                TableModel.removeRows(OldStart, OldEnd - OldStart)
+            if Tag in ("insert", "replace"):
+                for Offset, FileId in enumerate(New[Start:End]):
+                    TableModel.insertRow(OldStart + Offset, [self.TableItem(Column, Value)
+                                                             for Column, Value in enumerate(Rows[FileId])])
+        return TableModel
+
 ########################################################################################################################
 # Table Searches
 ########################################################################################################################
+    def FilterModel(self, View):
+        """
+        Returns the filter proxy of a view, the model of a view without one
+        is set into a new proxy
+
+        :Args:
+            View: QTableView
+                View to filter
+        """
+        Model = View.model()
+        if not isinstance(Model, FileIdFilterModel):
+            Proxy = FileIdFilterModel(View)
+            Proxy.setSourceModel(Model)
+            View.setModel(Proxy)
+            Model = Proxy
+        return Model
+
+    def SourceModel(self, View):
+        """
+        Returns the model a view shows through its filter proxy
+
+        :Args:
+            View: QTableView
+                View containing the model
+        """
+        Model = View.model()
+        if isinstance(Model, QtCore.QSortFilterProxyModel):
+            return Model.sourceModel()
+        return Model
+
+    def ModelIds(self, TableModel):
+        """
+        Returns the file_ids of the rows of a model in their order, a paged
+        model exposes all its rows and reads the ids in one query
+
+        :Args:
+            TableModel: QAbstractTableModel
+                Model of a table view
+        """
+        if isinstance(TableModel, LibraryTableModel):
+            TableModel.FetchAll()
+            return TableModel.Column(0)
+        return [TableModel.index(Row, 0).data() for Row in range(TableModel.rowCount())]
+
     def ClearView_Masks(self, View = QtWidgets.QTableView):
-        TableModel = View.model()
-        for Row in range(TableModel.rowCount()):
-            View.showRow(Row)
+        """
+        Shows every row of the view again after a search
+
+        :Args:
+            View: QtWidgets.QTableView
+                View to clear the filter of
+        """
+        self.FilterModel(View).SetFileIds(None)
 
     def TableSearch(self, Line_Edit = QtWidgets.QLineEdit, View = QtWidgets.QTableView):
         """
@@ -844,51 +4174,65 @@ class ModelView_Manager(FileManager):
         """
         Text = Line_Edit.text().strip()
         if Text == "":
-            [View.showRow(Row) for Row in range(View.model().rowCount())]
-            return None
+            return self.ClearView_Masks(View)
 
         tablename = View.property("DB_Table")
-        query = QSqlQuery()
-
-        if tablename in ["library", 'nowplaying']:
-            querystate = query.prepare(f"""
-            SELECT file_id FROM {tablename}
-            WHERE
-            album LIKE '%{Text}%'
-            OR albumartist LIKE '%{Text}%'
-            OR artist LIKE '%{Text}%'
-            OR author LIKE '%{Text}%'
-            OR composer LIKE '%{Text}%'
-            OR performer LIKE '%{Text}%'
-            OR title LIKE '%{Text}%'
-            OR lower(album) LIKE '%{Text}%'
-            OR lower(albumartist) LIKE '%{Text}%'
-            OR lower(artist) LIKE '%{Text}%'
-            OR lower(author) LIKE '%{Text}%'
-            OR lower(composer) LIKE '%{Text}%'
-            OR lower(performer) LIKE '%{Text}%'
-            OR lower(title) LIKE '%{Text}%'
-            """)
-        else:
-            querystate = False
-
-        query_exe = query.exec_()
-        if query_exe == False and querystate == False:
+        if tablename not in ["library", "library_all", 'nowplaying']:
             raise Exception(f"<{tablename}> View Not Created")
-
         # shows matching rows
-        QueryData = []
-        Row = 0
-        while query.next():
-            QueryData.append(str(query.value(0)))
-            Row += 1
+        self.FilterModel(View).SetFileIds(self.SearchIds(Text, tablename))
 
-        TableModel = View.model()
-        for Row in range(TableModel.rowCount()):
-            if TableModel.index(Row, 0).data() in QueryData:
-                View.showRow(Row)
-            else:
-                View.hideRow(Row)
+    def SearchIds(self, Text, tablename = "library", Limit = None, Cancelled = None):
+        """
+        Searches the full text index and returns the matching file_ids
+        ranked best match first. Every word of the text has to match the
+        start of a word in one of the SEARCH_FIELDS.
+
+        >>> library_manager.SearchIds("beat rev")
+        ['9a0364b9e99bb480dd25e1f0284c8555', ...]
+
+        :Args:
+            Text: String
+                Search text
+            tablename: String
+                library or a view of it to search in
+            Limit: Int
+                Max number of file_ids returned
+            Cancelled: Method
+                returns True once the search is stale, the rows left arent
+                read and None is returned. QtSql has no progress handler or
+                interrupt, so it is checked before the query and between the
+                rows only, the match and the ranking of every row run to
+                completion before the first row is returned.
+        """
+        Tokens = re.findall(r"\w+", Text)
+        if len(Tokens) == 0:
+            return []
+
+        Sources = self.Sources(tablename)
+        Filter = "" if tablename in ["library", "library_all"] else f"WHERE file_id IN (SELECT file_id FROM {tablename})"
+        # every attached library is matched in its own index
+        Members = "\nUNION ALL ".join([f"""
+        SELECT member.file_id, fts.rank FROM {Schema}.library_fts AS fts
+        JOIN {Schema}.library AS member ON member.rowid = fts.rowid
+        WHERE fts.library_fts MATCH ?""" for Source, Schema in Sources])
+        # every token is a quoted prefix query, the text never reaches the sql
+        Match = " ".join([f'"{Token}"*' for Token in Tokens])
+        if Cancelled != None and Cancelled():
+            return None
+        Query = self.Exec(f"""
+        SELECT file_id FROM ({Members}) {Filter}
+        ORDER BY rank
+        LIMIT ?
+        """, *([Match] * len(Sources)), -1 if Limit == None else Limit)
+        FileIds = []
+        while Query.next():
+            if Cancelled != None and Cancelled():
+                FileIds = None
+                break
+            FileIds.append(Query.value(0))
+        Query.finish()
+        return FileIds
 
     def SearchSimilarField(self, View, Field, Indexes):
         """
@@ -908,31 +4252,18 @@ class ModelView_Manager(FileManager):
         if Indexes in ["", None, []]:
             return False
 
-        # creates a query to filter
+        # the selected values are bound as a json array
         Tablename = View.property("DB_Table")
-        exp = "({0} LIKE '%{1}%') OR (lower({2}) LIKE '%{3}%')"
-        LikeExpression = [exp.format(Field, Upper, Field, Upper) for Upper in Indexes]
-        LikeExpression = " OR ".join(LikeExpression)
-
-        Query = QSqlQuery()
-        if not (Query.prepare(f"SELECT file_id FROM {Tablename} WHERE {LikeExpression}")):
-            print(f"SELECT file_id FROM {Tablename} WHERE {LikeExpression}")
-            raise Exception("Query Build Failed")
-        Query = self.ExeQuery(Query)
+        Rows = self.Fetch(f"""
+        SELECT file_id FROM {Tablename}
+        WHERE EXISTS (
+        SELECT 1 FROM json_each(?) AS selected
+        WHERE {Field} LIKE '%' || selected.value || '%'
+        OR lower({Field}) LIKE '%' || selected.value || '%')
+        """, json.dumps(list(Indexes)))
 
         # shows matching rows
-        QueryData = []
-        Row = 0
-        while Query.next():
-            QueryData.append(str(Query.value(0)))
-            Row += 1
-
-        TableModel = View.model()
-        for Row in range(TableModel.rowCount()):
-            if TableModel.index(Row, 0).data() in QueryData:
-                View.showRow(Row)
-            else:
-                View.hideRow(Row)
+        self.FilterModel(View).SetFileIds(str(Row[0]) for Row in Rows)
 
     def TableSearchAdvanced(self, query, View):
         """
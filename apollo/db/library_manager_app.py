@@ -1,4 +1,4 @@
-import sys, os
+import sys, os, pathlib
 from queue import Queue
 
 from PyQt5.QtSql import QSqlDatabase, QSqlQuery
@@ -67,12 +67,15 @@ tempconfig = {
 class FileScanner_Thread(QThread):
     """"""
     
-    def __init__(self, DB):
+    def __init__(self, DB, Workers = None, PoolType = "thread", IdStrategy = None):
         """Constructor"""
         super().__init__()
         self.setObjectName("FileScanner")
         self.FileManager = FileManager()
         self.DB = DB
+        self.Workers = Workers
+        self.PoolType = PoolType
+        self.IdStrategy = IdStrategy
                 
     def connect(self, DB):        
         self.FileManager.connect(DB)
@@ -86,25 +89,89 @@ class FileScanner_Thread(QThread):
     def run(self):
         try:
             self.connect(self.DB)
-            if self.FileManager.IsConneted():            
-                while self.Queue.not_empty:                
-                    item = self.Queue.get()
-                    self.FileManager.BatchInsert_Metadata(self.FileManager.scan_directory(item[0], item[1], self.scannerSlot))
-            self.FileManager.close_connection()
+            if self.FileManager.IsConneted():
+                # the journal holds the queued roots, unfinished scans of an
+                # earlier run are resumed from their last committed directory
+                while True:
+                    while not self.Queue.empty():
+                        item = self.Queue.get()
+                        self.FileManager.Journal_Queue(item[0], item[1])
+                    Pending = self.FileManager.Journal_Pending()
+                    if len(Pending) == 0:
+                        break
+                    Root, Filters, LastDir = Pending[0]
+                    self.FileManager.ScanDirectory(Root, Filters, self.scannerSlot,
+                                                   Workers = self.Workers, PoolType = self.PoolType,
+                                                   Incremental = True, Journal = True)
+                # rows hashed with another file_id strategy are rehashed once the scans are done
+                if self.IdStrategy != None:
+                    self.FileManager.Migrate_FileIds(self.IdStrategy, self.scannerSlot)
+            self.FileManager.Release_Connection()
             self.finished.emit()
         except Exception as e:
             print(e)
             self.finished.emit()
-            self.FileManager.close_connection()
+            self.FileManager.Release_Connection()
                
                         
+class SchemaMigration_Thread(QThread):
+    """
+    Migrates a v1 library to the v2 schema on its own connection of the pool.
+    The library is read with its v1 display strings until Migrated is
+    emitted, the views reload their rows then.
+
+    >>> Thread = SchemaMigration_Thread("default.db")
+    >>> Thread.Progress.connect(print)
+    >>> Thread.start()
+    """
+    Progress = QtCore.pyqtSignal(str)
+    # emitted with the rows migrated
+    Migrated = QtCore.pyqtSignal(int)
+    Error = QtCore.pyqtSignal(str)
+
+    def __init__(self, DB):
+        """
+        :Args:
+            DB: String
+                path of the library database
+        """
+        super().__init__()
+        self.setObjectName("SchemaMigration")
+        self.DB = DB
+        if QtCore.QCoreApplication.instance() != None:
+            QtCore.QCoreApplication.instance().aboutToQuit.connect(self.Stop)
+
+    def run(self):
+        Manager = FileManager()
+        try:
+            Manager.connect(self.DB)
+            Count = Manager.Migrate_Schema(self.Progress.emit, Cancelled = self.isInterruptionRequested)
+        except Exception as e:
+            self.Error.emit(f"schema migration failed: {e}")
+        else:
+            if Count != None:
+                self.Migrated.emit(Count)
+        if hasattr(Manager, "db_driver"):
+            Manager.Release_Connection()
+
+    def Stop(self):
+        """
+        Stops the migration after its current chunk, its resumed on the next start
+        """
+        self.requestInterruption()
+        self.wait()
+
+
 class FileScanner:
     """"""
-    def __init__(self, Label):
+    def __init__(self, Label, Workers = None, PoolType = "thread", IdStrategy = None):
         """Constructor"""
         self.ScannerQueue = Queue()
         self.SCANNING = False
         self.Label = Label
+        self.Workers = Workers
+        self.PoolType = PoolType
+        self.IdStrategy = IdStrategy
         
     def setLabelMsg(self, msg):
         self.Label.showMessage(msg)
@@ -113,13 +180,17 @@ class FileScanner:
         self.ScannerQueue.put(item)    
 
     def start(self, DB):
+        """
+        Starts the scanner thread over the queued items and the unfinished
+        scans recorded in the journal of the DB
+        """
         def onComplete():
             self.SCANNING = False
             
         # launch a thread to connect to a database and start the scan
         if self.SCANNING == False:                   
             self.SCANNING = True
-            Thread = FileScanner_Thread(DB)
+            Thread = FileScanner_Thread(DB, self.Workers, self.PoolType, self.IdStrategy)
             Thread.setQueue(self.ScannerQueue)
             Thread.finished.connect(onComplete)
             Thread.scannerSlot = self.setLabelMsg
@@ -134,7 +205,506 @@ class FileScanner:
             print("Thread Scanning Directory")
             
 
-                        
+
+class WatcherWorker(QtCore.QObject):
+    """
+    Runs the blocking work of a LibraryWatcher, the walks of the folders, the
+    polls of their mtimes and the rescans. The worker of a database file runs
+    in its own thread on its own connection of the pool.
+    """
+    Walked = QtCore.pyqtSignal(list)
+    Polled = QtCore.pyqtSignal(list)
+    Rescanned = QtCore.pyqtSignal(list, list)
+    Error = QtCore.pyqtSignal(str)
+
+    def __init__(self, DB, Manager = None, Workers = 1):
+        """
+        :Args:
+            DB: String
+                path of the library database
+            Manager: FileManager
+                connected manager used instead of opening one, for the
+                in memory databases
+            Workers: Int
+                extraction workers used by the rescans
+        """
+        super().__init__()
+        self.DB = DB
+        self.Manager = Manager
+        self.Owned = Manager == None
+        self.Workers = Workers
+        # mtimes of the polled folders
+        self.Mtimes = {}
+
+    def SubDirectories(self, Root):
+        """
+        Returns the folder and all of its sub folders
+        """
+        return [os.path.normpath(Dir) for Dir, _, _ in os.walk(Root)]
+
+    def Mtime(self, Dir):
+        try:
+            return os.stat(Dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def Walk(self, Root):
+        """
+        Emits Walked with the folder and all of its sub folders
+        """
+        self.Walked.emit(self.SubDirectories(Root))
+
+    def AddPolled(self, Dirs):
+        """
+        Starts polling the mtimes of the folders
+        """
+        for Dir in Dirs:
+            self.Mtimes[Dir] = self.Mtime(Dir)
+
+    def RemovePolled(self, Dirs):
+        for Dir in Dirs:
+            self.Mtimes.pop(Dir, None)
+
+    def Poll(self):
+        """
+        Emits Polled with the polled folders whose mtime changed, removed
+        folders stop being polled
+        """
+        Changed = []
+        for Dir, Old in list(self.Mtimes.items()):
+            New = self.Mtime(Dir)
+            if New != Old:
+                Changed.append(Dir)
+            if New == None:
+                del self.Mtimes[Dir]
+            else:
+                self.Mtimes[Dir] = New
+        self.Polled.emit(Changed)
+
+    def Rescan(self, Dirs, Filters):
+        """
+        Rescans the folders and emits Rescanned with them and their sub folders
+
+        :Args:
+            Dirs: List
+                coalesced folders to rescan
+            Filters: List
+                file extensions to scan of each folder
+        """
+        try:
+            if self.Manager == None:
+                self.Manager = FileManager()
+                self.Manager.connect(self.DB)
+            SubDirs = []
+            for Dir, DirFilters in zip(Dirs, Filters):
+                self.Manager.IncrementalScan(Dir, DirFilters, Workers = self.Workers, PoolType = "thread")
+                SubDirs.extend(self.SubDirectories(Dir))
+        except Exception as e:
+            self.Error.emit(f"rescan of {Dirs} failed: {e}")
+            return None
+        self.Rescanned.emit(Dirs, SubDirs)
+
+    def Close(self):
+        """
+        Releases the connection of the worker
+        """
+        if self.Owned and self.Manager != None:
+            self.Manager.Release_Connection()
+            self.Manager = None
+
+
+class LibraryWatcher(QtCore.QObject):
+    """
+    Watches the monitored folders of a library and keeps the library table in
+    sync with the disk. Directory events are debounced and coalesced into
+    incremental rescans of the changed folders, Changed is emitted with the
+    rescanned folders so the views can refresh only the rows under them.
+
+    Folders are watched with QFileSystemWatcher (inotify on linux), the
+    folders that cant be watched fall back to polling their mtimes. Directory
+    events only report added, removed and renamed entries, files rewritten in
+    place are picked up by the next rescan.
+
+    The walks, polls and rescans run on a WatcherWorker in its own thread and
+    connection, the GUI thread only gets the results. An in memory database
+    cant be opened by a second connection, its work runs on the calling thread.
+
+    >>> Watcher = LibraryWatcher(library_manager)
+    >>> Watcher.Changed.connect(lambda Dirs: library_manager.Refresh_DirectoryRows(View, Dirs))
+    >>> Watcher.Watch("E:\\music", [".mp3", ".flac"])
+    """
+    Changed = QtCore.pyqtSignal(list)
+    # emitted with the message of a failed rescan
+    Error = QtCore.pyqtSignal(str)
+    WalkRequested = QtCore.pyqtSignal(str)
+    PollRequested = QtCore.pyqtSignal()
+    AddPolledRequested = QtCore.pyqtSignal(list)
+    RemovePolledRequested = QtCore.pyqtSignal(list)
+    RescanRequested = QtCore.pyqtSignal(list, list)
+    Closing = QtCore.pyqtSignal()
+
+    def __init__(self, Manager, Debounce = 1500, PollInterval = 10000, Polling = False, Workers = 1):
+        """
+        :Args:
+            Manager: FileManager
+                connected manager of the library
+            Debounce: Int
+                msec to wait for the events to settle before rescanning
+            PollInterval: Int
+                msec between the polls of the polled folders
+            Polling: Bool
+                polls all the folders instead of using the filesystem events
+            Workers: Int
+                extraction workers used by the rescans
+        """
+        super().__init__()
+        self.Manager = Manager
+        self.Polling = Polling
+        self.Roots = {}
+        self.Polled = set()
+        self.Pending = set()
+
+        self.Watcher = QtCore.QFileSystemWatcher(self)
+        self.Watcher.directoryChanged.connect(self.DirectoryChanged)
+
+        self.DebounceTimer = QtCore.QTimer(self)
+        self.DebounceTimer.setSingleShot(True)
+        self.DebounceTimer.setInterval(Debounce)
+        self.DebounceTimer.timeout.connect(self.Flush)
+
+        self.PollTimer = QtCore.QTimer(self)
+        self.PollTimer.setInterval(PollInterval)
+        self.PollTimer.timeout.connect(self.Poll)
+
+        DB = Manager.db_driver.databaseName()
+        self.Thread = None
+        self.Worker = WatcherWorker(DB, None if DB != ":memory:" else Manager, Workers)
+        if DB != ":memory:":
+            self.Thread = QThread(self)
+            self.Thread.setObjectName("LibraryWatcher")
+            self.Worker.moveToThread(self.Thread)
+            self.Closing.connect(self.Worker.Close, Qt.BlockingQueuedConnection)
+            if QtCore.QCoreApplication.instance() != None:
+                QtCore.QCoreApplication.instance().aboutToQuit.connect(self.Stop)
+        self.WalkRequested.connect(self.Worker.Walk)
+        self.PollRequested.connect(self.Worker.Poll)
+        self.AddPolledRequested.connect(self.Worker.AddPolled)
+        self.RemovePolledRequested.connect(self.Worker.RemovePolled)
+        self.RescanRequested.connect(self.Worker.Rescan)
+        self.Worker.Walked.connect(self.AddWatches)
+        self.Worker.Polled.connect(self.PolledChanges)
+        self.Worker.Rescanned.connect(self.Rescanned)
+        self.Worker.Error.connect(self.Error)
+        if self.Thread != None:
+            self.Thread.start()
+
+    def Watch(self, Root, Filters):
+        """
+        Starts watching a monitored folder, its sub folders are walked by the worker
+
+        :Args:
+            Root: String
+                folder to watch
+            Filters: List
+                file extensions to scan
+
+        :Return: Bool
+            False if the folder doesnt exist
+        """
+        Root = os.path.normpath(Root)
+        if not os.path.isdir(Root):
+            return False
+        self.Roots[Root] = Filters
+        self.WalkRequested.emit(Root)
+        return True
+
+    def Unwatch(self, Root):
+        """
+        Stops watching a monitored folder
+        """
+        Root = os.path.normpath(Root)
+        self.Roots.pop(Root, None)
+        Dirs = [Dir for Dir in self.Watcher.directories() if self.RootOf(Dir) == None]
+        if len(Dirs) != 0:
+            self.Watcher.removePaths(Dirs)
+        Dirs = [Dir for Dir in self.Polled if self.RootOf(Dir) == None]
+        self.Polled.difference_update(Dirs)
+        self.RemovePolledRequested.emit(Dirs)
+        if len(self.Polled) == 0:
+            self.PollTimer.stop()
+
+    def AddWatches(self, Dirs):
+        """
+        Watches the folders that arent watched yet, only the folders the
+        watcher cant take are polled
+        """
+        Watched = set(self.Watcher.directories())
+        Dirs = [Dir for Dir in Dirs if Dir not in Watched and Dir not in self.Polled and self.RootOf(Dir) != None]
+        if len(Dirs) == 0:
+            return None
+        # out of watches or the filesystem has no events
+        Failed = Dirs if self.Polling else self.Watcher.addPaths(Dirs)
+        if len(Failed) != 0:
+            self.Polled.update(Failed)
+            self.AddPolledRequested.emit(list(Failed))
+            if not self.PollTimer.isActive():
+                self.PollTimer.start()
+
+    def RootOf(self, Path):
+        """
+        Returns the watched root that contains the path or None
+        """
+        Parts = pathlib.PurePath(os.path.normpath(Path)).parts
+        for Root in self.Roots:
+            RootParts = pathlib.PurePath(Root).parts
+            if Parts[:len(RootParts)] == RootParts:
+                return Root
+        return None
+
+    def DirectoryChanged(self, Path):
+        """
+        Records a changed folder and restarts the debounce timer
+        """
+        self.Pending.add(os.path.normpath(Path))
+        self.DebounceTimer.start()
+
+    def Poll(self):
+        """
+        Asks the worker for the polled folders that changed
+        """
+        self.PollRequested.emit()
+
+    def PolledChanges(self, Dirs):
+        for Dir in Dirs:
+            self.DirectoryChanged(Dir)
+
+    def Coalesce(self, Paths):
+        """
+        Reduces the changed folders to the smallest set of existing folders
+        covering them, removed folders are rescanned from their parent
+
+        :Return: List
+        """
+        Dirs = set()
+        for Path in Paths:
+            Root = self.RootOf(Path)
+            if Root == None:
+                continue
+            while not os.path.isdir(Path) and Path != Root:
+                Path = os.path.dirname(Path)
+            if os.path.isdir(Path):
+                Dirs.add(Path)
+
+        Coalesced = []
+        for Dir in sorted(Dirs, key = lambda Dir: pathlib.PurePath(Dir).parts):
+            Parts = pathlib.PurePath(Dir).parts
+            if not any(Parts[:len(Done)] == Done for Done in map(lambda D: pathlib.PurePath(D).parts, Coalesced)):
+                Coalesced.append(Dir)
+        return Coalesced
+
+    def Flush(self):
+        """
+        Sends the pending folders to the worker to rescan, Changed is emitted
+        once they are rescanned
+
+        :Return: List
+            folders sent to rescan
+        """
+        Dirs = self.Coalesce(self.Pending)
+        self.Pending = set()
+        if len(Dirs) != 0:
+            self.RescanRequested.emit(Dirs, [self.Roots[self.RootOf(Dir)] for Dir in Dirs])
+        return Dirs
+
+    def Rescanned(self, Dirs, SubDirs):
+        """
+        Watches the new sub folders of the rescanned folders and emits Changed
+        """
+        self.AddWatches(SubDirs)
+        self.Changed.emit(Dirs)
+
+    def Stop(self):
+        """
+        Stops the timers and the worker thread
+        """
+        self.DebounceTimer.stop()
+        self.PollTimer.stop()
+        if self.Thread != None and self.Thread.isRunning():
+            self.Closing.emit()
+            self.Thread.quit()
+            self.Thread.wait()
+
+
+class SearchWorker(QtCore.QObject):
+    """
+    Runs the searches of a SearchController in its thread, the worker opens
+    its own connection of the pool and attaches the same libraries as the
+    manager of the view
+    """
+    Found = QtCore.pyqtSignal(int, object)
+    Error = QtCore.pyqtSignal(str)
+
+    def __init__(self, DB, Libraries, Source, Latest):
+        """
+        :Args:
+            DB: String
+                path of the library database
+            Libraries: Dict
+                name and path of the federated libraries
+            Source: String
+                source name of the rows of the main database
+            Latest: Method
+                returns the generation of the latest search
+        """
+        super().__init__()
+        self.DB = DB
+        self.Libraries = Libraries
+        self.Source = Source
+        self.Latest = Latest
+        self.Manager = None
+
+    def Run(self, Generation, Text, Tablename):
+        """
+        Searches the text and emits Found with the file_ids, searches that
+        went stale before or while they ran emit nothing
+        """
+        if Generation != self.Latest():
+            return None
+        try:
+            if self.Manager == None:
+                self.Manager = LibraryManager(self.DB)
+                if len(self.Libraries) != 0:
+                    self.Manager.Federate(self.Libraries, Source = self.Source)
+            FileIds = self.Manager.SearchIds(Text, Tablename, Cancelled = lambda: Generation != self.Latest())
+        except Exception as e:
+            self.Error.emit(f"search of {Text} failed: {e}")
+            return None
+        if FileIds != None:
+            self.Found.emit(Generation, FileIds)
+
+    def Close(self):
+        """
+        Releases the connection of the worker
+        """
+        if self.Manager != None:
+            self.Manager.Release_Connection()
+            self.Manager = None
+
+
+class SearchController(QtCore.QObject):
+    """
+    Runs the search as you type of a table view off the GUI thread. The text
+    is debounced, the search runs on the connection of a worker thread and
+    only the result of the latest text is applied to the view, the searches
+    of older texts are skipped or stop reading their rows. An in memory
+    database cant be opened by a second connection, its searches run on the
+    calling thread once the text settles.
+
+    >>> Controller = SearchController(library_manager, View)
+    >>> LEDT.textChanged.connect(Controller.Search)
+    >>> LEDT.returnPressed.connect(Controller.SearchNow)
+    """
+    Requested = QtCore.pyqtSignal(int, str, str)
+    Closing = QtCore.pyqtSignal()
+    # emitted with the text once its result is shown
+    Applied = QtCore.pyqtSignal(str)
+    # emitted with the message of a failed search
+    Error = QtCore.pyqtSignal(str)
+
+    def __init__(self, Manager, View, Debounce = 200, Parent = None):
+        """
+        :Args:
+            Manager: LibraryManager
+                connected manager of the view
+            View: QTableView
+                view to filter
+            Debounce: Int
+                msec to wait for the text to settle before searching
+        """
+        super().__init__(Parent)
+        self.Manager = Manager
+        self.View = View
+        self.Generation = 0
+        self.Text = ""
+        self.Pending = ""
+
+        self.DebounceTimer = QtCore.QTimer(self)
+        self.DebounceTimer.setSingleShot(True)
+        self.DebounceTimer.setInterval(Debounce)
+        self.DebounceTimer.timeout.connect(self.Dispatch)
+
+        self.Thread = None
+        DB = Manager.db_driver.databaseName()
+        if DB != ":memory:":
+            # the attached libraries are attached again by the worker connection
+            Files = {Row[1]: Row[2] for Row in Manager.Fetch("PRAGMA database_list")}
+            Libraries = {Name: Files[Schema] for Name, Schema in Manager.Members.items()}
+            self.Thread = QThread(self)
+            self.Thread.setObjectName("SearchWorker")
+            self.Worker = SearchWorker(DB, Libraries, Manager.Source, lambda: self.Generation)
+            self.Worker.moveToThread(self.Thread)
+            self.Requested.connect(self.Worker.Run)
+            self.Closing.connect(self.Worker.Close, Qt.BlockingQueuedConnection)
+            self.Worker.Found.connect(self.Apply)
+            self.Worker.Error.connect(self.Error)
+            self.Thread.start()
+            if QtCore.QCoreApplication.instance() != None:
+                QtCore.QCoreApplication.instance().aboutToQuit.connect(self.Stop)
+
+    def Search(self, Text):
+        """
+        Records the text and restarts the debounce timer
+        """
+        self.Pending = Text
+        self.DebounceTimer.start()
+
+    def SearchNow(self, Text = None):
+        """
+        Searches the pending text or the given text without waiting
+        """
+        self.DebounceTimer.stop()
+        self.Dispatch(Text)
+
+    def Dispatch(self, Text = None):
+        """
+        Starts the search of the text, the searches still running are stale
+        """
+        self.Text = (self.Pending if Text == None else Text).strip()
+        self.Generation += 1
+        if self.Text == "":
+            self.Manager.ClearView_Masks(self.View)
+            self.Applied.emit(self.Text)
+            return None
+
+        Tablename = self.View.property("DB_Table")
+        if Tablename not in ["library", "library_all", 'nowplaying']:
+            raise Exception(f"<{Tablename}> View Not Created")
+        if self.Thread == None:
+            self.Apply(self.Generation, self.Manager.SearchIds(self.Text, Tablename))
+        else:
+            self.Requested.emit(self.Generation, self.Text, Tablename)
+
+    def Apply(self, Generation, FileIds):
+        """
+        Shows the rows of the file_ids if they are the result of the latest search
+        """
+        if Generation != self.Generation:
+            return None
+        self.Manager.FilterModel(self.View).SetFileIds(FileIds)
+        self.Applied.emit(self.Text)
+
+    def Stop(self):
+        """
+        Cancels the searches and stops the worker thread
+        """
+        self.DebounceTimer.stop()
+        self.Generation += 1
+        if self.Thread != None and self.Thread.isRunning():
+            self.Closing.emit()
+            self.Thread.quit()
+            self.Thread.wait()
+
+
 class App_DataBaseManager:
     """
     Class that manages all function and mannagement of the database for Apollo using A GUI 
@@ -156,7 +726,10 @@ class App_DataBaseManager:
         self.Dialog = LEDT_Dialog()
         self.Dialog.setWindowTitle("Add Directory")
         
-        self.FileScanner = FileScanner(self.UI.statusbar)
+        self.FileScanner = FileScanner(self.UI.statusbar,
+                                       Workers = self.UI.CONFG.Getvalue("SCAN_WORKERS"),
+                                       PoolType = self.UI.CONFG.Getvalue("SCAN_POOLTYPE") or "thread",
+                                       IdStrategy = self.UI.CONFG.Getvalue("FILE_ID_STRATEGY"))
         
     def init_UIbindings(self):
         """
@@ -195,10 +768,7 @@ class App_DataBaseManager:
         """
         defines the scanning filters for the File Manager
         """
-        filters = [".mp3",
-                   ".flac", 
-                   ".aac", 
-                   ".wav"]
+        filters = sorted(FileManager.READERS)
         return filters       
         
 
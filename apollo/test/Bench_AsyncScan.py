@@ -0,0 +1,100 @@
+import os, sys, time, tempfile, builtins
+from PyQt5.QtWidgets import QApplication
+
+from apollo.db.library_manager import LibraryManager
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the async scan mode against a fake network mount
+#
+# python -m apollo.test.Bench_AsyncScan            -> 5ms per open/stat
+# python -m apollo.test.Bench_AsyncScan 20         -> 20ms per open/stat
+
+
+class LatencyFS:
+    """
+    Filesystem shim that adds a fixed latency to every open, stat and
+    directory listing, like the round trips of a SMB/NFS mount.
+    The calls sleep so the latency overlaps between threads like real I/O.
+
+    >>> with LatencyFS(0.005):
+    ...     library_manager.ScanDirectory(Dir, [".mp3"], PoolType = "async")
+    """
+    def __init__(self, Latency = 0.005):
+        self.Latency = Latency
+
+    def __enter__(self):
+        self.Open, self.Stat, self.Scandir = builtins.open, os.stat, os.scandir
+        Latency, Open, Stat, Scandir = self.Latency, self.Open, self.Stat, self.Scandir
+
+        class Entry:
+            # DirEntry whose stat is a round trip
+            def __init__(self, entry):
+                self.entry = entry
+                self.name, self.path = entry.name, entry.path
+
+            def is_dir(self, **kw):
+                return self.entry.is_dir(**kw)
+
+            def stat(self, **kw):
+                time.sleep(Latency)
+                return self.entry.stat(**kw)
+
+        class Listing:
+            def __init__(self, path):
+                time.sleep(Latency)
+                self.listing = Scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self.listing.close()
+
+            def __iter__(self):
+                return (Entry(entry) for entry in self.listing)
+
+        def open_(*args, **kw):
+            time.sleep(Latency)
+            return Open(*args, **kw)
+
+        def stat_(*args, **kw):
+            time.sleep(Latency)
+            return Stat(*args, **kw)
+
+        builtins.open, os.stat, os.scandir = open_, stat_, Listing
+        return self
+
+    def __exit__(self, *args):
+        builtins.open, os.stat, os.scandir = self.Open, self.Stat, self.Scandir
+
+
+def Bench_Scan(Dir, Latency, PoolType, Workers):
+    """
+    Scans the directory into a new in memory library behind the latency
+    shim and returns the files scanned per second
+    """
+    Manager = LibraryManager(":memory:")
+    with LatencyFS(Latency):
+        Start = time.perf_counter()
+        Stats = Manager.ScanDirectory(Dir, [".mp3", ".flac"], Workers = Workers, PoolType = PoolType)
+        Elapsed = time.perf_counter() - Start
+    return Stats["new"] / Elapsed
+
+
+def Bench_Main(Latency = 0.005, Count = 200):
+    """
+    Prints the scan throughput of the serial, thread and async modes
+    """
+    with tempfile.TemporaryDirectory() as TempDir:
+        TesterObjects.Gen_AudioFiles(TempDir, Count)
+        print(f"latency {Latency * 1000:.1f}ms, {Count} files")
+        print(f"{'mode':<8}{'limit':>8}{'files/s':>12}")
+        print(f"{'serial':<8}{1:>8}{Bench_Scan(TempDir, Latency, 'thread', 1):>12.1f}")
+        print(f"{'thread':<8}{8:>8}{Bench_Scan(TempDir, Latency, 'thread', 8):>12.1f}")
+        for Limit in [1, 4, 16, 64]:
+            print(f"{'async':<8}{Limit:>8}{Bench_Scan(TempDir, Latency, 'async', Limit):>12.1f}")
+
+
+if __name__ == "__main__":
+    App = QApplication([])
+    Bench_Main(float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005)
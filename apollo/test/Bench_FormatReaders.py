@@ -0,0 +1,82 @@
+import os, sys, time, tempfile, collections
+
+from apollo.db.library_manager import FileManager
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the format readers of the FileManager
+#
+# python -m apollo.test.Bench_FormatReaders             -> generated samples of the formats the tests can write
+# python -m apollo.test.Bench_FormatReaders E:\music    -> every readable file under the folder, grouped by extension
+#
+# the mp3 and flac files are also read with FAST_TAGS off to compare the fast tag parsers with mutagen
+
+
+def Bench_Readers(Paths, Repeat = 3):
+    """
+    Reads every file with ScanFile and returns the reader stats per extension
+    as a dict of extension mapped to (files, seconds, tags per second)
+
+    :Args:
+        Paths: List
+            Files to read
+        Repeat: Int
+            Number of reads per file, the best run is kept
+    """
+    Manager = FileManager()
+    Groups = collections.defaultdict(list)
+    for Path in Paths:
+        Groups[os.path.splitext(Path)[1].lower()].append(Path)
+
+    Stats = {}
+    for Ext, Files in sorted(Groups.items()):
+        Best = None
+        for _ in range(Repeat):
+            Start = time.perf_counter()
+            Read = sum(1 for Path in Files if Manager.ScanFile(Path) != None)
+            Elapsed = time.perf_counter() - Start
+            Best = Elapsed if Best == None else min(Best, Elapsed)
+        Stats[Ext] = (Read, Best, Read / Best if Best else 0)
+    return Stats
+
+
+def Bench_FastTags(Paths):
+    """
+    Compares the files per second of the fast tag parsers and the mutagen
+    readers for the mp3 and flac files, returns a dict of extension mapped
+    to (fast files/s, mutagen files/s)
+    """
+    Paths = [Path for Path in Paths if os.path.splitext(Path)[1].lower() in (".mp3", ".flac")]
+    try:
+        FileManager.FAST_TAGS = True
+        Fast = Bench_Readers(Paths)
+        FileManager.FAST_TAGS = False
+        Mutagen = Bench_Readers(Paths)
+    finally:
+        FileManager.FAST_TAGS = True
+    return {Ext: (Fast[Ext][2], Mutagen[Ext][2]) for Ext in Fast}
+
+
+def Bench_Main(Dir = None, Count = 200):
+    """
+    Runs the reader benchmarks and prints a table of the results
+    """
+    with tempfile.TemporaryDirectory() as TempDir:
+        if Dir == None:
+            Formats = (".mp3", ".flac", ".wav", ".ogg", ".opus")
+            Paths = TesterObjects.Gen_AudioFiles(TempDir, Count, Formats)
+        else:
+            Include = set(FileManager.READERS)
+            Paths = [os.path.join(Root, File) for Root, _, Files in os.walk(Dir) for File in Files
+                     if os.path.splitext(File)[1].lower() in Include]
+
+        print(f"{'format':<8}{'files':>8}{'seconds':>12}{'tags/s':>12}")
+        for Ext, (Read, Elapsed, Rate) in Bench_Readers(Paths).items():
+            print(f"{Ext:<8}{Read:>8}{Elapsed:>12.4f}{Rate:>12.1f}")
+
+        print(f"\n{'format':<8}{'fast/s':>12}{'mutagen/s':>12}{'speedup':>10}")
+        for Ext, (Fast, Mutagen) in Bench_FastTags(Paths).items():
+            print(f"{Ext:<8}{Fast:>12.1f}{Mutagen:>12.1f}{Fast / Mutagen if Mutagen else 0:>10.2f}")
+
+
+if __name__ == "__main__":
+    Bench_Main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,128 @@
+import sys, time
+from PyQt5.QtWidgets import QApplication
+
+from apollo.db.library_manager import LibraryManager
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the library queries on synthetic libraries and checks that their
+# query plans search the intended indexes instead of scanning the library
+#
+# python -m apollo.test.Bench_Indexes                  -> 10k, 100k and 1M rows
+# python -m apollo.test.Bench_Indexes 10000 50000      -> 10k and 50k rows
+
+
+def Group_Query(Field, tablename):
+    # the distinct values query of GroupValues for the fields without a dimension
+    return f"""
+    SELECT DISTINCT {Field}
+    FROM {tablename}
+    WHERE ({Field} NOT IN ('', ' '))
+    ORDER BY {Field}
+    """
+
+
+# (name, call of the LibraryManager query, the query it runs as (query, values), indexes its plan has to use)
+# the calls and queries get the manager and the row number the lookups use
+PLAN_CASES = [
+    ("path_id delete", lambda M, Row: M.Delete_PathIds([f"missing{Row}"]),
+     lambda M, Row: ("DELETE FROM library WHERE path_id = ?", [f"path_idX{Row}"]),
+     ["library_path_id"]),
+    ("new files lookup", lambda M, Row: M.Fetch("""
+            SELECT path_id FROM library WHERE path_id IN (?)
+            UNION SELECT path_id FROM duplicates WHERE path_id IN (?)
+            """, f"path_idX{Row}", f"path_idX{Row}"),
+     lambda M, Row: ("""
+            SELECT path_id FROM library WHERE path_id IN (?)
+            UNION SELECT path_id FROM duplicates WHERE path_id IN (?)
+            """, [f"path_idX{Row}"] * 2),
+     ["library_path_id", "sqlite_autoindex_duplicates_1"]),
+    ("file_id selection", lambda M, Row: M.SelectIndexes([f"file_idX{Row + Offset}" for Offset in range(100)], Normal = True),
+     lambda M, Row: (M.SelectionQuery("selection", [f"file_idX{Row}"], Normal = True), []),
+     ["sqlite_autoindex_library_1"]),
+    ("album filter", lambda M, Row: M.SelectIndexes([f"ALBUMX{Row}"], Filter = True, FilterField = "album"),
+     lambda M, Row: (M.SelectionQuery("selection", [f"albumx{Row}"], Filter = True, FilterField = "album"), []),
+     ["library_album_id", "albums_lower_name", "sqlite_autoindex_library_1"]),
+    ("albumartist filter", lambda M, Row: M.SelectIndexes([f"albumartistx{Row}"], Filter = True, FilterField = "albumartist"),
+     lambda M, Row: (M.SelectionQuery("selection", [f"albumartistx{Row}"], Filter = True, FilterField = "albumartist"), []),
+     ["library_albumartist", "library_lower_albumartist", "sqlite_autoindex_library_1"]),
+    ("albumartist groups", lambda M, Row: M.GroupValues("library", "albumartist"),
+     lambda M, Row: (Group_Query("albumartist", "library"), []),
+     ["library_albumartist"]),
+    ("folder rows", lambda M, Row: M.Fetch("SELECT * FROM library WHERE file_path >= ? AND file_path < ?", "file_pathX1", "file_pathX2"),
+     lambda M, Row: ("SELECT * FROM library WHERE file_path >= ? AND file_path < ?", ["file_pathX1", "file_pathX2"]),
+     ["library_file_path"]),
+    ("manifest range", lambda M, Row: M.GetManifest("/music"),
+     lambda M, Row: ("SELECT path_id, mtime_ns, size, inode, file_path FROM file_manifest WHERE file_path >= ? AND file_path < ?",
+                     ["/music/", "/music0"]),
+     ["file_manifest_path"]),
+    ("queue rows", lambda M, Row: M.IndexSelector("nowplaying", "file_id"),
+     lambda M, Row: ("SELECT file_id FROM nowplaying", []),
+     ["sqlite_autoindex_library_1"]),
+    ("queue album groups", lambda M, Row: M.GroupValues("nowplaying", "album"),
+     lambda M, Row: ("SELECT name FROM albums WHERE name NOT IN ('', ' ') AND id IN (SELECT album_id FROM nowplaying) ORDER BY name", []),
+     ["sqlite_autoindex_library_1"]),
+    ("duplicate sizes", lambda M, Row: M.DuplicateReport("size"),
+     lambda M, Row: ("""
+            SELECT size, file_path, size FROM duplicates
+            WHERE size IN (SELECT size FROM duplicates GROUP BY size HAVING count(*) >= ?)
+            ORDER BY size, file_path
+            """, [2]),
+     ["duplicates_size"]),
+]
+
+
+def Bench_Library(Rows, QueueSize = 1000):
+    """
+    Returns an in memory library of synthetic rows with a queue of its first tracks
+    """
+    Manager = LibraryManager(":memory:")
+    DataTable = TesterObjects.Gen_DbTable_Data(Rows)
+    Manager.BatchInsert_Metadata(DataTable)
+    Manager.Queue_Set(DataTable["file_id"][:QueueSize])
+    return Manager
+
+
+def Check_Plans(Manager, Row = 1):
+    """
+    Returns the (name, plan) of the PLAN_CASES whose query plan is missing one
+    of their indexes or scans the whole library
+    """
+    Failed = []
+    for Name, Call, Query, Indexes in PLAN_CASES:
+        QueryStr, Values = Query(Manager, Row)
+        Plan = Manager.QueryPlan(QueryStr, *Values)
+        Text = "\n".join(Plan)
+        if "SCAN library" in Plan or not all(Index in Text for Index in Indexes):
+            Failed.append((Name, Plan))
+    return Failed
+
+
+def Bench_Main(Sizes = (10000, 100000, 1000000), Repeat = 5):
+    """
+    Prints the best time of every PLAN_CASES query for each library size and
+    asserts their query plans
+    """
+    for Rows in Sizes:
+        Start = time.perf_counter()
+        Manager = Bench_Library(Rows)
+        print(f"\n{Rows} rows inserted in {time.perf_counter() - Start:.1f}s")
+        print(f"{'query':<22}{'best ms':>10}")
+        for Name, Call, Query, Indexes in PLAN_CASES:
+            Best = None
+            for Index in range(Repeat):
+                Start = time.perf_counter()
+                Call(Manager, (Rows // 2) + Index)
+                Elapsed = time.perf_counter() - Start
+                Best = Elapsed if Best == None else min(Best, Elapsed)
+            print(f"{Name:<22}{Best * 1000:>10.3f}")
+
+        Failed = Check_Plans(Manager, Rows // 2)
+        for Name, Plan in Failed:
+            print(f"plan of {Name} doesnt use its indexes:\n    " + "\n    ".join(Plan))
+        assert len(Failed) == 0, f"{len(Failed)} query plans regressed"
+        Manager.close_connection()
+
+
+if __name__ == "__main__":
+    App = QApplication([])
+    Bench_Main([int(Arg) for Arg in sys.argv[1:]] or (10000, 100000, 1000000))
@@ -0,0 +1,73 @@
+import sys, time
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+from apollo.db.library_manager import LibraryManager
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the ordered queue model built with a lookup of the position of
+# every row in the order against the list index lookups it used before, the
+# time per track stays flat as the queue grows
+#
+# python -m apollo.test.Bench_OrderedModel                 -> 1k, 10k and 50k track queues
+# python -m apollo.test.Bench_OrderedModel 1000 5000       -> 1k and 5k track queues
+
+
+def Index_OrderedSqlTableModel(Manager, Query, Order):
+    """
+    Builds the ordered model like OrderedSqlTableModel did, the row of every
+    item is looked up with Order.index
+    """
+    TableModel = QtGui.QStandardItemModel()
+    Cols = range(len(Manager.db_fields))
+    TableModel.beginInsertRows(QtCore.QModelIndex(), 0, len(Order) - 1)
+    while Query.next():
+        for Column in Cols:
+            Item = Query.value(Column)
+            if Column == 0:
+                Row = Order.index(Item)
+            TableModel.setItem(Row, Column, Manager.TableItem(Column, Item))
+    TableModel.endInsertRows()
+    TableModel.setSortRole(Qt.UserRole)
+    for Row in range(TableModel.rowCount()):
+        if TableModel.item(Row) == None:
+            TableModel.removeRow(Row)
+    return TableModel
+
+
+def Bench(Function, Manager, Order):
+    """
+    Returns the milliseconds of a model build over the whole library
+    """
+    Query = Manager.ExeQuery("SELECT * FROM library")
+    Start = time.perf_counter()
+    Function(Query, Order)
+    return (time.perf_counter() - Start) * 1000
+
+
+def Bench_Main(Sizes = (1000, 10000, 50000), IndexLimit = 10000):
+    """
+    Prints the build time of the ordered models and the time per 1k tracks,
+    the list index build is skipped above IndexLimit tracks
+    """
+    print(f"{'tracks':<10}{'index ms':>12}{'per 1k':>10}{'dict ms':>12}{'per 1k':>10}")
+    for Rows in Sizes:
+        Manager = LibraryManager(":memory:")
+        DataTable = TesterObjects.Gen_DbTable_Data(Rows)
+        Manager.BatchInsert_Metadata(DataTable)
+        # the queue is the reverse of the library, the rows are never read in order
+        Order = DataTable["file_id"][::-1]
+
+        Index = "-"
+        if Rows <= IndexLimit:
+            Index = Bench(lambda Query, Order: Index_OrderedSqlTableModel(Manager, Query, Order), Manager, Order)
+        Dict = Bench(Manager.OrderedSqlTableModel, Manager, Order)
+        IndexText = f"{Index:>12.1f}{Index * 1000 / Rows:>10.2f}" if Index != "-" else f"{'-':>12}{'-':>10}"
+        print(f"{Rows:<10}{IndexText}{Dict:>12.1f}{Dict * 1000 / Rows:>10.2f}")
+        Manager.close_connection()
+
+
+if __name__ == "__main__":
+    App = QApplication([])
+    Bench_Main([int(Arg) for Arg in sys.argv[1:]] or (1000, 10000, 50000))
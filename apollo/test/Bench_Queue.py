@@ -0,0 +1,116 @@
+import sys, time
+from PyQt5.QtWidgets import QApplication, QTableView
+from PyQt5.QtSql import QSqlQuery
+
+from apollo.db.library_manager import LibraryManager
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the repeated queue operations with the literal IN lists they
+# used to build against the bound selections and the prepared query cache,
+# and the rebuilt nowplaying view against the positional edits of the queue table
+#
+# python -m apollo.test.Bench_Queue              -> 20k rows, 2000 track queue
+# python -m apollo.test.Bench_Queue 100000 20000 -> 100k rows, 20000 track queue
+
+
+def Literal_CreateView(Manager, Selector, Field, ID):
+    """
+    Builds a view and reads it back like CreateView did with literal IN lists
+    """
+    Manager.DropView("literal_view")
+    FilterItems = ", ".join([f"'{value}'" for value in Selector])
+    ID = ", ".join([f"'{v}'" for v in ID])
+    Manager.ExeQuery(f"""
+    CREATE VIEW IF NOT EXISTS literal_view AS
+    SELECT * FROM library WHERE file_id IN (
+    SELECT file_id FROM library
+    WHERE {Field} IN ({FilterItems})
+    OR lower({Field}) IN ({FilterItems})
+    OR file_id IN ({ID}))
+    """)
+    Query = QSqlQuery(Manager.db_driver)
+    Query.prepare("SELECT file_id FROM literal_view")
+    Query.exec_()
+    return [Row[0] for Row in Manager.fetchAll(Query, 1)]
+
+
+def Literal_SetRating(Manager, FileIds, Amount):
+    """
+    Rates the file ids like SetFileRatings did with a literal IN list
+    """
+    ID = ", ".join([f"'{v}'" for v in FileIds])
+    Manager.ExeQuery(f"UPDATE library SET rating = {Amount} WHERE file_id IN ({ID})")
+
+
+def View_QueueNext(Manager, View, Queue, FileIds):
+    """
+    Queues the tracks next like QueueNext did, the view of the whole queue is
+    rebuilt and the model is filled again in the queue order
+    """
+    Queue[1:1] = FileIds
+    Manager.CreateView("view_queue", Queue, Normal = True)
+    View.setModel(Manager.OrderedSqlTableModel(Manager.ExeQuery("SELECT * FROM view_queue"), Queue))
+
+
+def Table_QueueNext(Manager, View, FileIds):
+    """
+    Queues the tracks next with the positional insert and the diffed model
+    """
+    Manager.Queue_Insert(FileIds, Index = 1)
+    Manager.Refresh_QueueRows(View)
+
+
+def Bench(Function, Repeat):
+    """
+    Returns the mean milliseconds of a call
+    """
+    Start = time.perf_counter()
+    for Index in range(Repeat):
+        Function(Index)
+    return (time.perf_counter() - Start) * 1000 / Repeat
+
+
+def Bench_Main(Rows = 20000, QueueSize = 2000, Repeat = 20):
+    """
+    Prints the mean time of the queue operations before and after
+    """
+    Manager = LibraryManager(":memory:")
+    DataTable = TesterObjects.Gen_DbTable_Data(Rows)
+    DataTable["album"] = [f"album{Row % 500}" for Row in range(Rows)]
+    DataTable["genre"] = [f"genre{Row % 40}" for Row in range(Rows)]
+    Manager.BatchInsert_Metadata(DataTable)
+    Queue = DataTable["file_id"][:QueueSize]
+    Albums = lambda Index: [f"album{Index % 500}"]
+
+    print(f"{Rows} rows, {QueueSize} track queue, mean of {Repeat} runs")
+    print(f"{'operation':<20}{'literal ms':>12}{'bound ms':>12}")
+    Cases = [
+        ("queue album next", lambda Index: Literal_CreateView(Manager, Albums(Index), "album", Queue),
+                             lambda Index: Manager.SelectIndexes(Albums(Index), Filter = True,
+                                                                 FilterField = "album", ID = Queue)),
+        ("play genre", lambda Index: Literal_CreateView(Manager, [f"genre{Index % 40}"], "genre", []),
+                       lambda Index: Manager.SelectIndexes([f"genre{Index % 40}"], Filter = True,
+                                                           FilterField = "genre")),
+        ("rate queue", lambda Index: Literal_SetRating(Manager, Queue, Index % 5),
+                       lambda Index: Manager.SetRating("library", Queue, Index % 5)),
+    ]
+    for Name, Literal, Bound in Cases:
+        print(f"{Name:<20}{Bench(Literal, Repeat):>12.2f}{Bench(Bound, Repeat):>12.2f}")
+
+    # the queue next of a single track, the view and the model of the old queue are rebuilt every call
+    Free = DataTable["file_id"][QueueSize:]
+    OldView, NewView = QTableView(), QTableView()
+    NewView.setProperty("DB_Columns", Manager.db_fields)
+    NewView.setProperty("Order", [])
+    Manager.Queue_Set(Queue)
+    Manager.SetTableModle("nowplaying", NewView)
+    OldQueue = list(Queue)
+    print(f"\n{'operation':<20}{'view ms':>12}{'table ms':>12}")
+    print(f"{'queue next':<20}{Bench(lambda Index: View_QueueNext(Manager, OldView, OldQueue, Free[Index:Index + 1]), Repeat):>12.2f}"
+          f"{Bench(lambda Index: Table_QueueNext(Manager, NewView, Free[Repeat + Index:Repeat + Index + 1]), Repeat):>12.2f}")
+
+
+if __name__ == "__main__":
+    App = QApplication([])
+    Args = [int(Arg) for Arg in sys.argv[1:3]]
+    Bench_Main(*Args)
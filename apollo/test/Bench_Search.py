@@ -0,0 +1,65 @@
+import sys, time, random
+from PyQt5.QtWidgets import QApplication
+
+from apollo.db.library_manager import LibraryManager
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the full text search against the LIKE scan it replaced
+#
+# python -m apollo.test.Bench_Search            -> 200k rows
+# python -m apollo.test.Bench_Search 50000      -> 50k rows
+
+# a few thousand words like a real library, with the accented ones searched without their accents
+SYLLABLES = ["ka", "lo", "ve", "ni", "ra", "mu", "sha", "do", "tri", "be", "yon", "cé", "gho", "st", "ri", "ver",
+             "dre", "am", "ci", "ty", "zoë", "mö", "tley", "bjö", "rk", "sé", "ñor", "dé", "jà", "el"]
+WORDS = sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in ["", "n", "s", "ro", "la"]})
+
+
+def Bench_Library(Rows, Seed = 7):
+    """
+    Returns an in memory library filled with rows of random word titles,
+    artists and albums
+    """
+    Random = random.Random(Seed)
+    Words = lambda Count: " ".join(Random.choice(WORDS) for _ in range(Count))
+    DataTable = TesterObjects.Gen_DbTable_Data(Rows)
+    for Field, Count in [("title", 3), ("artist", 2), ("album", 2)]:
+        DataTable[Field] = [f"{Words(Count)} {Row}" for Row in range(Rows)]
+    Manager = LibraryManager(":memory:")
+    Manager.BatchInsert_Metadata(DataTable)
+    return Manager
+
+
+def Bench_Like(Manager, Text):
+    """
+    Runs the LIKE scan of the old TableSearch and returns the matching file_ids
+    """
+    Fields = ["album", "albumartist", "artist", "author", "composer", "performer", "title"]
+    Where = " OR ".join([f"{Field} LIKE '%{Text}%'" for Field in Fields])
+    return [Row[0] for Row in Manager.fetchAll(Manager.ExeQuery(f"SELECT file_id FROM library WHERE {Where}"), 1)]
+
+
+def Bench_Main(Rows = 200000, Repeat = 5):
+    """
+    Prints the best time of the search terms for the fts index and the LIKE scan
+    """
+    Start = time.perf_counter()
+    Manager = Bench_Library(Rows)
+    print(f"{Rows} rows inserted in {time.perf_counter() - Start:.1f}s")
+    print(f"{'search':<16}{'hits':>8}{'fts ms':>10}{'like ms':>10}")
+    for Text in ["lo", "dream", "ghost river", "beyon", "señor", "senor ka", "zzz"]:
+        Times = {}
+        for Name, Search in [("fts", Manager.SearchIds), ("like", lambda Text: Bench_Like(Manager, Text))]:
+            Best = None
+            for _ in range(Repeat):
+                Start = time.perf_counter()
+                Hits = Search(Text)
+                Elapsed = time.perf_counter() - Start
+                Best = Elapsed if Best == None else min(Best, Elapsed)
+            Times[Name] = (len(Hits), Best * 1000)
+        print(f"{Text:<16}{Times['fts'][0]:>8}{Times['fts'][1]:>10.2f}{Times['like'][1]:>10.2f}")
+
+
+if __name__ == "__main__":
+    App = QApplication([])
+    Bench_Main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
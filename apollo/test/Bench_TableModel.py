@@ -0,0 +1,77 @@
+import sys, time, resource
+from PyQt5.QtWidgets import QApplication, QTableView
+
+from apollo.db.library_manager import LibraryManager, LibraryTableModel
+from apollo.test.testUtilities import TesterObjects
+
+# Benchmarks the startup and memory of the paged library model against the
+# QStandardItemModel filled with every cell of the library, and the reads of
+# the paged model with every column against a projection of a few columns
+#
+# python -m apollo.test.Bench_TableModel            -> 200k rows
+# python -m apollo.test.Bench_TableModel 50000      -> 50k rows
+
+
+def MaxRss():
+    """
+    Returns the peak resident memory of the process in MB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def Bench_Model(Name, Build):
+    """
+    Builds a model into a view, scrolls to its end and prints the times and the memory it added
+    """
+    View = QTableView()
+    View.resize(1200, 800)
+    Memory = MaxRss()
+    Start = time.perf_counter()
+    View.setModel(Build())
+    Startup = time.perf_counter() - Start
+    Start = time.perf_counter()
+    View.scrollToBottom()
+    QApplication.processEvents()
+    Scroll = time.perf_counter() - Start
+    print(f"{Name:<12}{Startup * 1000:>12.1f}{Scroll * 1000:>12.1f}{MaxRss() - Memory:>12.1f}")
+    return View
+
+
+def Bench_Projection(Name, Model, Columns):
+    """
+    Reads every page of the model with the projected columns and prints the
+    time and the size of the decoded cache
+    """
+    Model.SetProjection(Columns)
+    Model.FetchAll()
+    Start = time.perf_counter()
+    for Row in range(0, Model.rowCount(), Model.PAGE_SIZE):
+        Model.Row(Row)
+    Elapsed = time.perf_counter() - Start
+    Size = sum(sys.getsizeof(Value) for Rows, Orders in Model.Pages.values() for Values in Rows for Value in Values)
+    print(f"{Name:<12}{len(Model.Projection):>12}{Elapsed * 1000:>12.1f}{Size / 1024 / 1024:>12.2f}")
+
+
+def Bench_Main(Rows = 200000):
+    """
+    Prints the startup time, the time to scroll to the end and the peak memory added by both models
+    """
+    Manager = LibraryManager(":memory:")
+    Manager.BatchInsert_Metadata(TesterObjects.Gen_DbTable_Data(Rows))
+    print(f"{Rows} rows")
+    print(f"{'model':<12}{'startup ms':>12}{'scroll ms':>12}{'peak MB':>12}")
+    # the paged model runs first, the peak memory only grows
+    Views = [Bench_Model("paged", lambda: LibraryTableModel(Manager, "library")),
+             Bench_Model("items", lambda: Manager.SqlTableModel(Manager.ExeQuery("SELECT * FROM library")))]
+
+    # a typical layout of the library view
+    Visible = [Manager.db_fields.index(Field) for Field in ("title", "artist", "album", "duration_ms", "rating")]
+    Model = LibraryTableModel(Manager, "library")
+    print(f"\n{'reads':<12}{'columns':>12}{'read ms':>12}{'cache MB':>12}")
+    Bench_Projection("all", Model, range(len(Manager.db_fields)))
+    Bench_Projection("projected", Model, Visible)
+
+
+if __name__ == "__main__":
+    App = QApplication([])
+    Bench_Main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
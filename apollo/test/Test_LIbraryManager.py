@@ -1,12 +1,19 @@
 from unittest import TestCase
-from unittest.mock import MagicMock, Mock
-import datetime
+from unittest.mock import MagicMock, Mock, patch
+import datetime, tempfile, threading, time, shutil
 import sys, os
 
-from apollo.db.library_manager import LibraryManager
+from apollo.db.library_manager import LibraryManager, LibraryTableModel, FileIdFilterModel, AsyncScanPool, DisplayValue, V1_FIELDS
+from apollo.db.library_manager_app import LibraryWatcher, SearchController, SchemaMigration_Thread
 from apollo.test.testUtilities import TesterObjects
 
+from mutagen.easyid3 import EasyID3
+from mutagen.flac import FLAC
+
 from PyQt5.QtSql import QSqlQuery
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt, QEventLoop, QTimer
+from PyQt5.QtTest import QAbstractItemModelTester
 from PyQt5.QtGui import QStandardItem, QStandardItemModel
 from PyQt5.QtWidgets import QTableView, QApplication, QLineEdit
 
@@ -79,7 +86,7 @@ class Test_LibraryManager(TestCase):
         self.Librarymanager.BatchInsert_Metadata(DataTable)
         
         ## checks if library data is set up correctly
-        Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT * FROM library")) 
+        Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT * FROM library", self.Librarymanager.db_driver)) 
         structData = {}
         while Query.next():
             for col, fields in enumerate(self.Librarymanager.db_fields):
@@ -90,6 +97,36 @@ class Test_LibraryManager(TestCase):
                     structData[fields] = [val]
         self.assertDictEqual(DataTable,structData, msg = "<library> table data not valid")        
         
+    def test_BulkLoad(self):
+        """
+        Checks that the bulk load keeps WAL, restores the connection settings
+        and rebuilds the deferred triggers, and that the upsert updates rows in place
+        """
+        with tempfile.TemporaryDirectory() as TempDir:
+            Manager = LibraryManager(os.path.join(TempDir, "bulk.db"))
+            Manager.BULK_CHUNKSIZE = 4
+            DataTable = TesterObjects.Gen_DbTable_Data(10)
+            self.assertGreater(Manager.BatchInsert_Metadata(DataTable), 0)
+            self.assertEqual([["wal"]], Manager.Fetch("PRAGMA journal_mode"))
+            self.assertEqual([[1]], Manager.Fetch("PRAGMA synchronous"))
+
+            with self.subTest("deferred triggers are rebuilt"):
+                self.assertEqual(3, len(Manager.Fetch("""
+                SELECT name FROM sqlite_master WHERE type = 'trigger'
+                AND name IN ('library_dimensions_insert', 'library_fts_insert', 'library_stats_insert')
+                """)))
+                self.assertEqual(10, Manager.TableTrackcount("library"))
+                self.assertEqual(10, Manager.TableAlbumcount("library"))
+                self.assertEqual(["file_idX3"], Manager.SearchIds("titleX3"))
+
+            with self.subTest("upsert"):
+                DataTable["title"][3] = "retagged"
+                Manager.BatchInsert_Metadata(DataTable, Upsert = True)
+                self.assertEqual(10, Manager.TableTrackcount("library"))
+                self.assertEqual(["file_idX3"], Manager.SearchIds("retagged"))
+                self.assertEqual([], Manager.SearchIds("titleX3"))
+            Manager.Release_Connection()
+
     def test_Create_LibraryTable(self):
         """
         Checks for the Library Table structure Integrity
@@ -98,7 +135,7 @@ class Test_LibraryManager(TestCase):
         self.Librarymanager.Create_LibraryTable()
 
         ## checks if library table is set up correctly
-        Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT cid, name FROM pragma_table_info('library')")) 
+        Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT cid, name FROM pragma_table_info('library')", self.Librarymanager.db_driver)) 
         structTable = []
         while Query.next():
             structTable.append([Query.value(0), Query.value(1)])
@@ -114,7 +151,7 @@ class Test_LibraryManager(TestCase):
         self.Librarymanager.Create_EmptyView("testview")
 
         ## checks if testview table is set up correctly
-        Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT cid, name FROM pragma_table_info('testview')")) 
+        Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT cid, name FROM pragma_table_info('testview')", self.Librarymanager.db_driver)) 
         structTable = []
         while Query.next():
             structTable.append([Query.value(0), Query.value(1)])
@@ -134,7 +171,7 @@ class Test_LibraryManager(TestCase):
         
         ###### checks if testview table is set up correctly
         with (self.subTest(msg = "checks if testview table is set up correctly")):
-            Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT cid, name FROM pragma_table_info('testview')")) 
+            Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT cid, name FROM pragma_table_info('testview')", self.Librarymanager.db_driver)) 
             structTable = []
             while Query.next():
                 structTable.append([Query.value(0), Query.value(1)])
@@ -144,7 +181,7 @@ class Test_LibraryManager(TestCase):
         
         ###### checks if testview data is set up correctly
         with (self.subTest(msg = "checks if testview data is set up correctly")):
-            Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT * FROM testview")) 
+            Query = self.Librarymanager.ExeQuery(QSqlQuery("SELECT * FROM testview", self.Librarymanager.db_driver)) 
             structData = {}
             while Query.next():
                 for col, fields in enumerate(self.Librarymanager.db_fields):
@@ -152,7 +189,194 @@ class Test_LibraryManager(TestCase):
                     self.assertIn(val, DataTable.get(fields), msg = "<testview> table data not valid")
             
         
-    def test_TableSize(self):         
+    def test_QueryCache(self):
+        """
+        Checks the reuse of the prepared queries and the bound selections of the views
+        """
+        Query = self.Librarymanager.Prepared("SELECT value FROM library_meta WHERE key = ?")
+        self.assertIs(Query, self.Librarymanager.Prepared("SELECT value FROM library_meta WHERE key = ?"))
+        # a status check keeps the connection and its prepared queries
+        self.assertTrue(self.Librarymanager.IsConneted())
+        self.assertIs(Query, self.Librarymanager.Prepared("SELECT value FROM library_meta WHERE key = ?"))
+        self.assertEqual("fast", self.Librarymanager.GetMeta("file_id_strategy"))
+
+        DataTable = TesterObjects.Gen_DbTable_Data(5)
+        DataTable["album"] = ["O'Brien", "O'Brien", "B", "C", "D"]
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+
+        with self.subTest("quoted values"):
+            Indexes = self.Librarymanager.SelectIndexes(["O'Brien"], Filter = True, FilterField = "album")
+            self.assertEqual(["file_idX0", "file_idX1"], Indexes)
+
+        with self.subTest("large selections"):
+            Selector = [f"missingX{Row}" for Row in range(50000)] + DataTable["file_id"][2:]
+            Indexes = self.Librarymanager.SelectIndexes(Selector, Normal = True)
+            self.assertEqual(DataTable["file_id"][2:], sorted(Indexes))
+
+        with self.subTest("selections of queries are not stored"):
+            self.assertEqual([], self.Librarymanager.Fetch("SELECT name FROM selection_set"))
+
+        with self.subTest("quoted selection names"):
+            Selection = self.Librarymanager.SetSelection("O'Brien", ["file_idX2"])
+            self.assertEqual([["file_idX2"]], self.Librarymanager.Fetch(f"SELECT file_id FROM library WHERE file_id IN ({Selection})"))
+
+    def test_Queue(self):
+        """
+        Checks the positional edits of the queue table and the diffed nowplaying model
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(10)
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        IDs = DataTable["file_id"]
+        View = QTableView()
+        View.setProperty("DB_Table", "nowplaying")
+        View.setProperty("DB_Columns", self.Librarymanager.db_fields)
+        View.setProperty("Order", [])
+        self.Librarymanager.SetTableModle("nowplaying", View)
+        ModelIds = lambda: [View.model().index(Row, 0).data() for Row in range(View.model().rowCount())]
+
+        self.Librarymanager.Queue_Set(IDs[:4])
+        self.Librarymanager.Queue_Insert(IDs[4:6], Index = 1)
+        self.Librarymanager.Queue_Insert(IDs[6:7], Index = 0)
+        self.Librarymanager.Queue_Insert(IDs[7:8])
+        self.Librarymanager.Queue_Remove(2)
+        Expected = [IDs[6], IDs[0], IDs[5], IDs[1], IDs[2], IDs[3], IDs[7]]
+        self.assertEqual(Expected, self.Librarymanager.Queue_FileIds())
+        self.assertEqual(Expected, self.Librarymanager.IndexSelector("nowplaying", "file_id"))
+        self.Librarymanager.Refresh_QueueRows(View)
+        self.assertEqual(Expected, ModelIds())
+
+        with self.subTest("the model is diffed with the queue"):
+            First = self.Librarymanager.SourceModel(View).item(0)
+            self.Librarymanager.Queue_Remove(4, 6)
+            self.Librarymanager.Queue_Insert(IDs[8:], Index = 2)
+            self.Librarymanager.Refresh_QueueRows(View)
+            Expected = [IDs[6], IDs[0], IDs[8], IDs[9], IDs[5], IDs[1], IDs[7]]
+            self.assertEqual(Expected, ModelIds())
+            self.assertIs(First, self.Librarymanager.SourceModel(View).item(0))
+
+        with self.subTest("renumbers once the gaps run out"):
+            for _ in range(12):
+                self.Librarymanager.Queue_Insert(IDs[2:3], Index = 1)
+            self.assertEqual(Expected[:1] + IDs[2:3] * 12 + Expected[1:], self.Librarymanager.Queue_FileIds())
+
+        with self.subTest("deleted library rows leave the queue"):
+            self.Librarymanager.DeleteFileIds("library", IDs[:3])
+            self.assertEqual([IDs[6], IDs[8], IDs[9], IDs[5], IDs[7]], self.Librarymanager.Queue_FileIds())
+
+    def test_ThreadConnections(self):
+        """
+        Checks that a thread writes on its own pooled connection while the
+        views are read on the main one
+        """
+        with tempfile.TemporaryDirectory() as TempDir:
+            Path = os.path.join(TempDir, "threads.db")
+            Reader = LibraryManager(Path)
+            Reader.BatchInsert_Metadata(TesterObjects.Gen_DbTable_Data(5))
+            self.assertEqual("wal", Reader.Fetch("PRAGMA journal_mode")[0][0])
+
+            Written, Commit, Names = threading.Event(), threading.Event(), []
+            def Write():
+                Writer = LibraryManager(Path)
+                Names.append(Writer.ConnectionName)
+                Writer.db_driver.transaction()
+                Writer.Insert_Metadata(TesterObjects.Gen_DbTable_Data(10))
+                Written.set()
+                Commit.wait(10)
+                Writer.db_driver.commit()
+                Writer.Release_Connection()
+
+            Thread = threading.Thread(target = Write)
+            Thread.start()
+            self.assertTrue(Written.wait(10))
+            with self.subTest("reads the last commit during the write"):
+                Start = time.perf_counter()
+                self.assertEqual(5, Reader.TableTrackcount("library"))
+                self.assertLess(time.perf_counter() - Start, 1)
+            Commit.set()
+            Thread.join(10)
+
+            self.assertNotEqual(Reader.ConnectionName, Names[0])
+            self.assertEqual(10, Reader.TableTrackcount("library"))
+            Reader.Release_Connection()
+
+    def test_Federation(self):
+        """
+        Checks that the attached libraries are searched, grouped and queued as one
+        """
+        with tempfile.TemporaryDirectory() as TempDir:
+            Member = LibraryManager(os.path.join(TempDir, "member.db"))
+            DataTable = TesterObjects.Gen_DbTable_Data(5)
+            DataTable["file_id"] = [f"member{FileId}" for FileId in DataTable["file_id"]]
+            DataTable["album"] = [f"album{Row % 2}" for Row in range(5)]
+            Member.BatchInsert_Metadata(DataTable)
+            Member.Release_Connection()
+
+            Manager = LibraryManager(os.path.join(TempDir, "main.db"))
+            DataTable = TesterObjects.Gen_DbTable_Data(5)
+            DataTable["album"] = [f"album{Row % 3}" for Row in range(5)]
+            Manager.BatchInsert_Metadata(DataTable)
+            Manager.Federate({"NAS": os.path.join(TempDir, "member.db")}, Source = "Default")
+            self.assertEqual("library_all", Manager.LibraryTable)
+            self.assertEqual([[5, "Default"], [5, "NAS"]],
+                             Manager.Fetch("SELECT count(*), source FROM library_all GROUP BY source"))
+
+            with self.subTest("search and grouping"):
+                self.assertEqual(["file_idX2", "memberfile_idX2"], sorted(Manager.SearchIds("titleX2", "library_all")))
+                self.assertEqual(["file_idX2"], Manager.SearchIds("titleX2"))
+                self.assertEqual(["album0", "album1", "album2"], Manager.GroupValues("library_all", "album"))
+                self.assertEqual(["file_idX1", "file_idX4", "memberfile_idX1", "memberfile_idX3"],
+                                 Manager.SelectIndexes(["album1"], Filter = True, FilterField = "album"))
+                Stats = Manager.LibraryStats("library_all")
+                self.assertEqual((10, 3), (Stats["tracks"], Stats["albums"]))
+
+            with self.subTest("queue"):
+                Manager.Queue_Set(["memberfile_idX3", "file_idX0", "memberfile_idX1"])
+                self.assertEqual([["memberfile_idX3", "NAS"], ["file_idX0", "Default"], ["memberfile_idX1", "NAS"]],
+                                 Manager.Fetch("SELECT file_id, source FROM nowplaying"))
+                self.assertEqual(["album0", "album1"], Manager.GroupValues("nowplaying", "album"))
+                Plan = "\n".join(Manager.QueryPlan("SELECT file_id FROM nowplaying"))
+                self.assertNotIn("MATERIALIZE", Plan)
+
+            with self.subTest("detach"):
+                Manager.Detach_Library("NAS")
+                self.assertEqual("library", Manager.LibraryTable)
+                self.assertEqual(["file_idX0"], Manager.Queue_FileIds()[1:2])
+                self.assertEqual([["file_idX0"]], Manager.Fetch("SELECT file_id FROM nowplaying"))
+            Manager.Release_Connection()
+
+    def test_LibraryStats(self):
+        """
+        Checks that the stats kept by the triggers match a full recompute
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(10)
+        DataTable["album"] = [f"album{Row % 4}" for Row in range(10)]
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        self.Librarymanager.DeleteFileIds("library", DataTable["file_id"][:3])
+        self.Librarymanager.Exec("UPDATE library SET duration_ms = 1000, album = 'albumX' WHERE file_id = ?",
+                                 DataTable["file_id"][5])
+
+        Stats = self.Librarymanager.LibraryStats("library")
+        self.assertEqual({"size": 7, "playtime": datetime.timedelta(seconds = 361), "albums": 5,
+                          "artists": 7, "tracks": 7}, Stats)
+        self.Librarymanager.Rebuild_Stats()
+        self.assertEqual(Stats, self.Librarymanager.LibraryStats("library"))
+
+        with self.subTest("stats of the queue"):
+            self.Librarymanager.Queue_Set(DataTable["file_id"][3:5])
+            self.assertEqual({"size": 2, "playtime": datetime.timedelta(minutes = 2), "albums": 2,
+                              "artists": 2, "tracks": 2}, self.Librarymanager.LibraryStats("nowplaying"))
+
+    def test_QueryPlans(self):
+        """
+        Checks that the library queries search their indexes instead of scanning the library
+        """
+        from apollo.test.Bench_Indexes import Check_Plans
+        DataTable = TesterObjects.Gen_DbTable_Data(200)
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        self.Librarymanager.Queue_Set(DataTable["file_id"][:20])
+        self.assertEqual([], Check_Plans(self.Librarymanager, 100))
+
+    def test_TableSize(self):       
         """tests the tablesize in GB"""
         self.assertEqual(10, self.Librarymanager.TableSize("library"))
         
@@ -179,6 +403,113 @@ class Test_LibraryManager(TestCase):
         """tests the TrackCount"""
         self.assertEqual(10, self.Librarymanager.TableArtistcount("library"))
     
+    def Create_V1Library(self, Manager):
+        """
+        Replaces the library table with a v1 table of display strings
+        """
+        V2_FIELDS = {v2: v1 for v1, v2 in V1_FIELDS.items()}
+        Columns = [V2_FIELDS.get(Field, Field) for Field in Manager.db_fields[:-4]]
+        Manager.DropView("nowplaying")
+        Manager.DropTable("library")
+        Manager.ExeQuery(f"CREATE TABLE library({', '.join(Columns)})")
+
+        DataTable = {Field: Data for Field, Data in TesterObjects.Gen_DbTable_Data(5).items() if Field in V2_FIELDS or Field in Columns}
+        DataTable["duration_ms"] = ["1:02:03.500000", "0:03:25", "1 day, 0:00:01", "", None]
+        DataTable["filesize_bytes"] = ["12.5Mb", "0.0Mb", "1024Mb", "", None]
+        DataTable["bitrate_bps"] = ["320Kbps", "128Kbps", "0Kbps", "", None]
+        DataTable["sample_rate_hz"] = ["44100Hz", "48000Hz", "8000Hz", "", None]
+        Manager.ExecBatch(f"INSERT INTO library VALUES ({', '.join(['?'] * len(Columns))})", list(DataTable.values()))
+
+    def test_Migrate_Schema(self):
+        """
+        Checks the migration of a v1 library with display string columns to the typed v2 schema
+        """
+        self.Create_V1Library(self.Librarymanager)
+        self.assertEqual(1, self.Librarymanager.SchemaVersion())
+        with self.subTest("the v1 library opens without being migrated"):
+            self.assertTrue(self.Librarymanager.StartUpChecks())
+            self.assertEqual(1, self.Librarymanager.SchemaVersion())
+            self.assertEqual([["1:02:03.500000", "12.5Mb"]],
+                             self.Librarymanager.Fetch("SELECT duration_ms, filesize_bytes FROM library LIMIT 1"))
+
+        def Rescan(Message):
+            # the first row is rescanned after its chunk was copied
+            if Message == "Migrating library schema: 2 rows":
+                self.Librarymanager.Exec("UPDATE library SET bitrate_bps = ? WHERE rowid = 1", 256000)
+
+        self.assertEqual(5, self.Librarymanager.Migrate_Schema(Rescan, ChunkSize = 2))
+        self.assertEqual(2, self.Librarymanager.SchemaVersion())
+        self.assertEqual(None, self.Librarymanager.GetMeta("schema_migration_rowid"))
+
+        Query = self.Librarymanager.ExeQuery("""
+        SELECT duration_ms, filesize_bytes, bitrate_bps, sample_rate_hz, typeof(duration_ms)
+        FROM library ORDER BY rowid""")
+        self.assertEqual([[3723500, 13107200, 256000, 44100, "integer"],
+                          [205000, 0, 128000, 48000, "integer"],
+                          [86401000, 1073741824, 0, 8000, "integer"]],
+                         self.Librarymanager.fetchAll(Query)[:3])
+        self.assertEqual("1:02:03", DisplayValue("duration_ms", 3723500))
+        self.assertEqual("12.50Mb", DisplayValue("filesize_bytes", 13107200))
+        self.assertTrue(self.Librarymanager.StartUpChecks())
+
+    def test_SchemaMigration_Thread(self):
+        """
+        Checks that a v1 library file opens at once and is migrated by the background thread
+        """
+        with tempfile.TemporaryDirectory() as TempDir:
+            DB = os.path.join(TempDir, "v1.db")
+            Manager = LibraryManager(DB)
+            self.Create_V1Library(Manager)
+            Manager.Release_Connection()
+
+            Manager = LibraryManager(DB)
+            self.assertEqual(1, Manager.SchemaVersion())
+            Thread = SchemaMigration_Thread(DB)
+            Migrated, Loop = [], QEventLoop()
+            Thread.Migrated.connect(Migrated.append)
+            Thread.finished.connect(Loop.quit)
+            QTimer.singleShot(5000, Loop.quit)
+            Thread.start()
+            Loop.exec_()
+            Thread.wait()
+
+            self.assertEqual([5], Migrated)
+            self.assertEqual(2, Manager.SchemaVersion())
+            self.assertEqual([[3723500, "integer"]], Manager.Fetch("SELECT duration_ms, typeof(duration_ms) FROM library LIMIT 1"))
+            self.assertEqual(5, len(Manager.Fetch("SELECT file_id FROM library")))
+            Manager.Release_Connection()
+
+    def test_Dimensions(self):
+        """
+        Checks that the dimension tables and ids follow the inserts, retags and deletes of the library
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(4)
+        DataTable["artist"] = ["A", "A", "B", None]
+        DataTable["file_path"] = [os.path.join(os.sep, "music", Dir, f"{Row}.mp3") for Row, Dir in enumerate("xxyz")]
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        Names = lambda Table: self.Librarymanager.fetchAll(self.Librarymanager.ExeQuery(f"SELECT name, tracks FROM {Table} ORDER BY name"))
+
+        with self.subTest("insert"):
+            self.assertEqual([["A", 2], ["B", 1]], Names("artists"))
+            self.assertEqual([os.path.join(os.sep, "music", Dir) for Dir in "xyz"], [Row[0] for Row in Names("folders")])
+            self.assertEqual(2, self.Librarymanager.TableArtistcount("library"))
+            self.assertEqual(["A", "B"], self.Librarymanager.GroupValues("library", "artist"))
+
+        with self.subTest("retag"):
+            self.Librarymanager.ExeQuery("UPDATE library SET artist = 'C' WHERE artist = 'B'")
+            self.assertEqual([["A", 2], ["C", 1]], Names("artists"))
+
+        with self.subTest("delete"):
+            self.Librarymanager.ExecBatch("DELETE FROM library WHERE file_id = ?", [DataTable["file_id"][:2]])
+            self.assertEqual([["C", 1]], Names("artists"))
+            self.assertEqual(1, self.Librarymanager.TableArtistcount("library"))
+
+        with self.subTest("rebuild"):
+            self.Librarymanager.ExeQuery("DELETE FROM artists")
+            self.Librarymanager.Rebuild_Dimensions()
+            Query = self.Librarymanager.ExeQuery("SELECT artists.name FROM library JOIN artists ON artists.id = library.artist_id")
+            self.assertEqual([["C"]], self.Librarymanager.fetchAll(Query))
+
     def test_horizontalHeader_functions(self):
         """Test For Horizontal Header Initilization and assignment"""
         View = QTableView()
@@ -222,7 +553,7 @@ class Test_LibraryManager(TestCase):
         with (self.subTest("Tests fo data getter and setter for te Db and View bindding")):                    
             for index, column in enumerate(self.Librarymanager.db_fields):
                 data = [Table.index(rows, index).data() for rows in range(Table.rowCount())]
-                original = [str(i) for i in DataTable[column]]
+                original = [DisplayValue(column, i) for i in DataTable[column]]
                 self.assertEqual(original, data)
                 
                 
@@ -250,6 +581,116 @@ class Test_LibraryManager(TestCase):
             original = [str(i) for i in DataTable["file_id"]]
             self.assertEqual(Expected, data)        
         
+    def test_LibraryTableModel(self):
+        """
+        Checks the paged reads, the bounded row cache and the sorting of the library model
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(600)
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        View = QTableView()
+        View.setProperty("Order", [])
+        Model = self.Librarymanager.SetTableModle("library", View)
+        Model.CACHE_PAGES = 2
+        self.assertIsInstance(Model, LibraryTableModel)
+        self.assertEqual(Model.PAGE_SIZE, Model.rowCount())
+
+        with self.subTest("pages are fetched on demand"):
+            while Model.canFetchMore():
+                Model.fetchMore()
+            self.assertEqual(600, Model.rowCount())
+            self.assertEqual(DataTable["file_id"], [Model.index(Row, 0).data() for Row in range(600)])
+            self.assertLessEqual(len(Model.Pages), 2)
+            Column = self.Librarymanager.db_fields.index("duration_ms")
+            self.assertEqual(DataTable["duration_ms"][300], Model.index(300, Column).data(Qt.UserRole))
+            self.assertEqual(DisplayValue("duration_ms", DataTable["duration_ms"][300]), Model.index(300, Column).data())
+
+        with self.subTest("sorting"):
+            Column = self.Librarymanager.db_fields.index("title")
+            Model.sort(Column, Qt.DescendingOrder)
+            self.assertEqual(max(DataTable["title"]), Model.index(0, Column).data())
+
+        with self.subTest("column projection"):
+            Header = View.horizontalHeader()
+            Title = self.Librarymanager.db_fields.index("title")
+            for Column in range(1, Model.columnCount()):
+                if Column != Title:
+                    Header.hideSection(Column)
+            Model.ProjectSections(Header)
+            self.assertEqual([0, Title], Model.Projection)
+            self.assertEqual(2, len(Model.Row(0)))
+            Header.showSection(Column)
+            Model.ProjectSections(Header)
+            self.assertEqual([0, Title, Column], Model.Projection)
+            self.assertEqual(max(DataTable["title"]), Model.index(0, Title).data())
+            # a hidden column is read on demand
+            Album = self.Librarymanager.db_fields.index("album")
+            self.assertIn(Model.index(0, Album).data(), DataTable["album"])
+            self.assertIn(Album, Model.Projection)
+
+        with self.subTest("refresh after writes"):
+            self.Librarymanager.DeleteFileIds("library", DataTable["file_id"][:10])
+            Model.Refresh()
+            self.assertEqual(590, Model.rowCount())
+            self.assertEqual(590, len(self.Librarymanager.ModelIds(Model)))
+
+    def test_LibraryTableModel_Sync(self):
+        """
+        Checks that the library model applies the writes to the table as row
+        inserts, removals and changes instead of a reset
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(60)
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        Model = LibraryTableModel(self.Librarymanager, "library")
+        # the model tester checks the rows of every signal against the model
+        Failures = []
+        QtCore.qInstallMessageHandler(lambda Type, Context, Message: Failures.append(Message) if "FAIL" in Message else None)
+        self.addCleanup(QtCore.qInstallMessageHandler, None)
+        Tester = QAbstractItemModelTester(Model, QAbstractItemModelTester.FailureReportingMode.Warning)
+        Signals = {"reset": 0, "changed": []}
+        Model.modelReset.connect(lambda: Signals.__setitem__("reset", Signals["reset"] + 1))
+        Model.dataChanged.connect(lambda First, Last: Signals["changed"].append((First.row(), Last.row())))
+        ModelIds = lambda: [Model.index(Row, 0).data() for Row in range(Model.rowCount())]
+        TableIds = lambda: [Row[0] for Row in self.Librarymanager.Fetch("SELECT file_id FROM library ORDER BY rowid")]
+        Selected = QtCore.QPersistentModelIndex(Model.index(40, 0))
+
+        self.Librarymanager.Exec("DELETE FROM library WHERE rowid IN (2, 3, 30)")
+        self.Librarymanager.Exec("UPDATE library SET title = 'retagged' WHERE rowid = 10")
+        Added = TesterObjects.Gen_DbTable_Data(62)
+        self.Librarymanager.BatchInsert_Metadata({Field: Values[60:] for Field, Values in Added.items()})
+        Model.Sync("rowid = 10")
+
+        self.assertEqual([], Failures)
+        self.assertEqual(0, Signals["reset"])
+        self.assertEqual([(7, 7)], Signals["changed"])
+        self.assertEqual(TableIds(), ModelIds())
+        self.assertEqual(37, Selected.row())
+        self.assertEqual(DataTable["file_id"][40], Selected.data())
+
+        with self.subTest("rows that moved in the sort order"):
+            Title = self.Librarymanager.db_fields.index("title")
+            Model.sort(Title)
+            Model.FetchAll()
+            First = Model.index(0, 0).data()
+            self.Librarymanager.Exec("UPDATE library SET title = 'zz' WHERE file_id = ?", First)
+            Model.Sync("file_id = ?", First)
+            self.assertEqual([], Failures)
+            self.assertEqual(0, Signals["reset"])
+            self.assertEqual(First, Model.index(Model.rowCount() - 1, 0).data())
+            self.assertEqual([Row[0] for Row in self.Librarymanager.Fetch("SELECT file_id FROM library ORDER BY title, rowid")],
+                             ModelIds())
+
+    def test_OrderedSqlTableModel(self):
+        """
+        Checks that the rows are placed in the order and the ids missing from the query are left out
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(10)
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+        Order = DataTable["file_id"][::-1][:3] + ["missing", DataTable["file_id"][9], DataTable["file_id"][0]]
+        Model = self.Librarymanager.OrderedSqlTableModel(self.Librarymanager.ExeQuery("SELECT * FROM library"), Order)
+        self.assertEqual(["file_idX9", "file_idX8", "file_idX7", "file_idX0"],
+                         [Model.index(Row, 0).data() for Row in range(Model.rowCount())])
+        self.assertEqual(len(self.Librarymanager.db_fields), Model.columnCount())
+
     def test_SearchSimilarField(self):
         """
         Checks for filtering of the TableView and refreshes it.
@@ -277,7 +718,7 @@ class Test_LibraryManager(TestCase):
         Applies a Search and filters out rows in the view with simmilar data
         """
         LEDT = QLineEdit()
-        LEDT.setText("X5")
+        LEDT.setText("titlex5")
         
         # data insertion into library table
         DataTable = TesterObjects.Gen_DbTable_Data(10)
@@ -303,21 +744,611 @@ class Test_LibraryManager(TestCase):
         # Queries the DB and Generates the FileId used to show valid rows 
         self.assertEqual(['file_idX5'], Result)
         
+    def test_SearchIds(self):
+        """
+        Checks the prefix, diacritic insensitive and ranked matches of the full text search
+        """
+        DataTable = TesterObjects.Gen_DbTable_Data(4)
+        DataTable["title"] = ["Beyoncé Halo", "Halo", "Hello", "Shallow"]
+        DataTable["artist"] = ["Beyoncé", "Beyonce", "Adele", "Lady Gaga"]
+        self.Librarymanager.BatchInsert_Metadata(DataTable)
+
+        self.assertEqual(["file_idX0", "file_idX1"], sorted(self.Librarymanager.SearchIds("beyon")))
+        self.assertEqual("file_idX0", self.Librarymanager.SearchIds("beyonce halo")[0])
+        self.assertEqual(["file_idX3"], self.Librarymanager.SearchIds("lady ga"))
+        self.assertEqual([], self.Librarymanager.SearchIds("' OR 1 = 1 --\""))
+
+        with self.subTest("index follows the library"):
+            self.Librarymanager.ExeQuery("UPDATE library SET title = 'Someone Like You' WHERE file_id = 'file_idX2'")
+            self.Librarymanager.ExeQuery("DELETE FROM library WHERE file_id = 'file_idX3'")
+            self.assertEqual(["file_idX2"], self.Librarymanager.SearchIds("someone adele"))
+            self.assertEqual([], self.Librarymanager.SearchIds("shallow"))
+
     def test_ClearView_Masks(self):
         """
         Test the function that clears the filter masks that are applied on searches 
         """
         View = QTableView()
         TableModel = QStandardItemModel()
-        [TableModel.appendRow(QStandardItem(Row)) for Row in range(20)]
+        [TableModel.appendRow(QStandardItem(f"file_idX{Row}")) for Row in range(20)]
         View.setModel(TableModel)
-        View.hideRow(1)
-        View.hideRow(3)        
-        View.hideRow(5)
+        Proxy = self.Librarymanager.FilterModel(View)
+        Proxy.SetFileIds(["file_idX1", "file_idX3", "file_idX5"])
+        self.assertIs(TableModel, self.Librarymanager.SourceModel(View))
+        self.assertEqual(["file_idX1", "file_idX3", "file_idX5"], [Proxy.index(Row, 0).data() for Row in range(Proxy.rowCount())])
         self.Librarymanager.ClearView_Masks(View)        
-        self.assertFalse(View.isRowHidden(1))
-        self.assertFalse(View.isRowHidden(3))
-        self.assertFalse(View.isRowHidden(5))
+        self.assertEqual(20, View.model().rowCount())
+
+    def test_FilterModel_SourceModel(self):
+        """
+        Test that a replaced source model no longer drops the ids of the proxy
+        """
+        Old, New = QStandardItemModel(), QStandardItemModel()
+        Proxy = FileIdFilterModel()
+        Proxy.setSourceModel(Old)
+        Proxy.setSourceModel(New)
+        Proxy.Ids = ["file_idX1"]
+        Old.appendRow(QStandardItem("file_idX2"))
+        self.assertEqual(["file_idX1"], Proxy.Ids)
+        New.appendRow(QStandardItem("file_idX2"))
+        self.assertEqual(None, Proxy.Ids)
+
+
+class Test_FileManager(TestCase):
+
+    def setUp(self):
+        """
+        Generates a temporary directory of audio files and connects to an In memory DB
+        """
+        self.TempDir = tempfile.TemporaryDirectory()
+        self.Paths = TesterObjects.Gen_AudioFiles(self.TempDir.name, 12)
+        self.Librarymanager = LibraryManager(':memory:')
+
+    def tearDown(self):
+        self.Librarymanager.close_connection()
+        self.TempDir.cleanup()
+
+    def LibraryRows(self):
+        Query = self.Librarymanager.ExeQuery("SELECT * FROM library ORDER BY file_path")
+        return self.Librarymanager.fetchAll(Query)
+
+    def test_ScanDirectory(self):
+        """
+        Checks that all the generated files are scanned and inserted
+        """
+        self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"])
+        Rows = self.LibraryRows()
+        self.assertEqual(sorted(self.Paths), [Row[3] for Row in Rows])
+
+        with self.subTest("rescanning doesnt add the files again"):
+            self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"])
+            self.assertEqual(len(self.Paths), len(self.LibraryRows()))
+
+    def test_ScanDirectory_Chunks(self):
+        """
+        Checks that every chunk is commited on its own and survives a failing scan
+        """
+        def Slot(msg):
+            raise InterruptedError(msg)
+
+        with self.assertRaises(InterruptedError):
+            self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"], Slot, ChunkSize = 5)
+        self.assertEqual(5, len(self.LibraryRows()))
+
+        with self.subTest("resumed scan with workers adds the remaining files"):
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"],
+                                                      Workers = 2, PoolType = "thread", ChunkSize = 5)
+            self.assertEqual({"new": 7, "changed": 0, "deleted": 0, "unchanged": 5}, Stats)
+            self.assertEqual(sorted(self.Paths), [Row[3] for Row in self.LibraryRows()])
+
+    def test_ScanDirectory_Journal(self):
+        """
+        Checks that an interrupted journaled scan resumes from its last committed directory
+        """
+        def Slot(msg):
+            raise InterruptedError(msg)
+
+        with self.assertRaises(InterruptedError):
+            self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"], Slot,
+                                              Incremental = True, ChunkSize = 5, Journal = True)
+        # first chunk holds the 4 files of folderX0 and the first file of folderX1
+        LastDir = os.path.join(os.path.normpath(self.TempDir.name), "folderX1")
+        self.assertEqual(["scanning", LastDir], self.Librarymanager.Journal_Get(self.TempDir.name))
+        self.assertEqual([[os.path.normpath(self.TempDir.name), [".mp3", ".flac"], LastDir]],
+                         self.Librarymanager.Journal_Pending())
+
+        with self.subTest("resumes from the checkpoint"):
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"],
+                                                      Incremental = True, ChunkSize = 5, Journal = True)
+            self.assertEqual({"new": 7, "changed": 0, "deleted": 0, "unchanged": 1}, Stats)
+            self.assertEqual(sorted(self.Paths), [Row[3] for Row in self.LibraryRows()])
+            self.assertEqual("done", self.Librarymanager.Journal_Get(self.TempDir.name)[0])
+            self.assertEqual([], self.Librarymanager.Journal_Pending())
+
+        with self.subTest("finished roots are scanned from the start"):
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"],
+                                                      Incremental = True, Journal = True)
+            self.assertEqual({"new": 0, "changed": 0, "deleted": 0, "unchanged": 12}, Stats)
+
+    def test_ExtractRows_Workers(self):
+        """
+        Checks that the rows extracted are the same irrespective of the worker count
+        """
+        Items = [(str(index), path) for index, path in enumerate(self.Paths)]
+        Expected = self.Librarymanager.ExtractRows(Items, Workers = 1)
+        self.assertEqual(len(self.Paths), len(Expected))
+        for PoolType in ["thread", "process", "async"]:
+            with self.subTest(PoolType = PoolType):
+                Rows = self.Librarymanager.ExtractRows(Items, Workers = 4, PoolType = PoolType)
+                self.assertEqual(Expected, Rows)
+
+    def test_AsyncScan(self):
+        """
+        Checks the async scan mode and the in flight limit per mount
+        """
+        Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"], Workers = 3,
+                                                  PoolType = "async", Incremental = True)
+        self.assertEqual({"new": 12, "changed": 0, "deleted": 0, "unchanged": 0}, Stats)
+        self.assertEqual(sorted(self.Paths), [Row[3] for Row in self.LibraryRows()])
+
+        with self.subTest("in flight limit"):
+            Lock = threading.Lock()
+            InFlight = {"now": 0, "max": 0}
+            def Read(Path):
+                with Lock:
+                    InFlight["now"] += 1
+                    InFlight["max"] = max(InFlight["max"], InFlight["now"])
+                time.sleep(0.01)
+                with Lock:
+                    InFlight["now"] -= 1
+                return Path
+
+            Pool = AsyncScanPool(3)
+            Results = list(Pool.Map(Read, self.Paths, lambda Path: Path, lambda Path: (Path,)))
+            Pool.close()
+            self.assertEqual([(Path, Path) for Path in self.Paths], Results)
+            self.assertEqual(3, InFlight["max"])
+
+    def test_IncrementalScan(self):
+        """
+        Checks that rescans only read the new and changed files and purge the deleted ones
+        """
+        include = [".mp3", ".flac"]
+        Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+        self.assertEqual({"new": 12, "changed": 0, "deleted": 0, "unchanged": 0}, Stats)
+
+        with self.subTest("rescan without changes"):
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+            self.assertEqual({"new": 0, "changed": 0, "deleted": 0, "unchanged": 12}, Stats)
+
+        with self.subTest("rescan with a new, changed and deleted file"):
+            os.remove(self.Paths[0])
+            TesterObjects.Gen_MP3(self.Paths[2], 100)
+            os.utime(self.Paths[2], ns = (0, 10 ** 18))
+            NewFile = os.path.join(self.TempDir.name, "fileX200.mp3")
+            TesterObjects.Gen_MP3(NewFile, 200)
+
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+            self.assertEqual({"new": 1, "changed": 1, "deleted": 1, "unchanged": 10}, Stats)
+
+            Rows = self.LibraryRows()
+            Paths = [Row[3] for Row in Rows]
+            self.assertEqual(12, len(Rows))
+            self.assertNotIn(self.Paths[0], Paths)
+            self.assertIn(os.path.normpath(NewFile), Paths)
+            Titles = {Row[3]: Row[self.Librarymanager.db_fields.index("title")] for Row in Rows}
+            self.assertEqual("titleX100", Titles[self.Paths[2]])
+
+    def test_IncrementalScan_Unreadable(self):
+        """
+        Checks that the files under a directory that fails to walk are not purged
+        """
+        include = [".mp3", ".flac"]
+        SubDir = os.path.join(self.TempDir.name, "folderX1")
+        self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+
+        Scandir = os.scandir
+        def Unreadable(Dir):
+            def Failing(Path):
+                if os.path.normpath(Path) == os.path.normpath(Dir):
+                    raise PermissionError(13, "Permission denied", Path)
+                return Scandir(Path)
+            return Failing
+
+        with self.subTest("unreadable subdirectory"):
+            with patch("os.scandir", Unreadable(SubDir)):
+                Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+            self.assertEqual({"new": 0, "changed": 0, "deleted": 0, "unchanged": 8}, Stats)
+            self.assertEqual(12, len(self.LibraryRows()))
+
+        with self.subTest("unreadable root"):
+            Messages = []
+            with patch("os.scandir", Unreadable(self.TempDir.name)):
+                Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Messages.append, Incremental = True)
+            self.assertEqual({"new": 0, "changed": 0, "deleted": 0, "unchanged": 0}, Stats)
+            self.assertEqual(12, len(self.LibraryRows()))
+            self.assertIn(f"Failed to read {os.path.normpath(self.TempDir.name)}, its files were kept", Messages)
+
+        with self.subTest("removed directory"):
+            shutil.rmtree(SubDir)
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+            self.assertEqual(4, Stats["deleted"])
+            self.assertEqual(8, len(self.LibraryRows()))
+
+    def test_ScanFile_Formats(self):
+        """
+        Checks the format readers and the magic bytes fallback for mislabelled files
+        """
+        Formats = (".mp3", ".flac", ".wav", ".ogg", ".opus")
+        Paths = TesterObjects.Gen_AudioFiles(os.path.join(self.TempDir.name, "formats"), 5, Formats)
+        for index, Path in enumerate(Paths):
+            with self.subTest(Format = Formats[index]):
+                Metadata = self.Librarymanager.ScanFile(Path)
+                self.assertEqual(f"titleX{index}", Metadata["title"])
+                self.assertEqual(f"artistX{index % 5}", Metadata["artist"])
+
+                Mislabelled = os.path.splitext(Path)[0] + (".mp3" if index else ".flac")
+                os.rename(Path, Mislabelled)
+                self.assertEqual(f"titleX{index}", self.Librarymanager.ScanFile(Mislabelled)["title"])
+
+        with self.subTest("unreadable file"):
+            Junk = os.path.join(self.TempDir.name, "junk.mp3")
+            with open(Junk, "wb") as FP:
+                FP.write(bytes(512))
+            self.assertEqual(None, self.Librarymanager.ScanFile(Junk))
+
+    def test_ApeTags(self):
+        """
+        Checks that the mixed case APEv2 keys are mapped and a missing sample rate is stored as 0
+        """
+        Path = TesterObjects.Gen_AudioFiles(os.path.join(self.TempDir.name, "ape"), 4, (".wv",))[3]
+        Metadata = self.Librarymanager.ScanFile(Path)
+        self.assertEqual(("titleX3", "2003", "4/20", "1/1", "albumartistX0"),
+                         tuple(Metadata[Field] for Field in ("title", "date", "tracknumber", "discnumber", "albumartist")))
+        self.assertEqual(44100, Metadata["sample_rate_hz"])
+
+        with self.subTest("no sample rate"):
+            Parsed = MagicMock(filename = Path, tags = {}, info = Mock(spec = ["length"], length = 1.0))
+            self.assertEqual(0, self.Librarymanager.ReadTags(Parsed)["sample_rate_hz"])
+
+    def test_FastTags(self):
+        """
+        Checks that the fast tag parsers match the mutagen readers and fall back for unhandled tags
+        """
+        for Path in self.Paths[:2]:
+            FastMetadata = self.Librarymanager.FastMP3(Path) if Path.endswith(".mp3") else self.Librarymanager.FastFLAC(Path)
+            self.Librarymanager.FAST_TAGS = False
+            with self.subTest(Path = Path):
+                self.assertEqual(self.Librarymanager.ScanFile(Path), FastMetadata)
+            self.Librarymanager.FAST_TAGS = True
+
+        with self.subTest("ID3v2.3 tag"):
+            Tags = EasyID3(self.Paths[0])
+            Tags.save(v2_version = 3)
+            self.assertEqual("titleX0", self.Librarymanager.FastMP3(self.Paths[0])["title"])
+
+        Path = os.path.join(self.TempDir.name, "easyX1.mp3")
+        TesterObjects.Gen_MP3(Path, 1)
+        Tags = EasyID3(Path)
+        Tags.update({"author": "authorX1", "website": "http://apollo.test/X1", "performer:guitar": "performerX1",
+                     "releasecountry": "GB"})
+        Tags.save()
+        for Version in (4, 3):
+            with self.subTest("EasyID3 frames", Version = Version):
+                Tags.save(v2_version = Version)
+                FastMetadata = self.Librarymanager.FastMP3(Path)
+                self.Librarymanager.FAST_TAGS = False
+                self.assertEqual(self.Librarymanager.ScanFile(Path), FastMetadata)
+                self.Librarymanager.FAST_TAGS = True
+                # v2.3 has no musician credits frame
+                self.assertEqual(("authorX1", "http://apollo.test/X1", "GB", "performerX1" if Version == 4 else ""),
+                                 tuple(FastMetadata[Field] for Field in ("author", "website", "releasecountry", "performer")))
+
+        with self.subTest("unsynchronised tag falls back to mutagen"):
+            with open(self.Paths[0], "r+b") as FP:
+                FP.seek(5)
+                FP.write(bytes([0x80]))
+            self.assertEqual(None, self.Librarymanager.FastMP3(self.Paths[0]))
+            self.assertEqual("titleX0", self.Librarymanager.ScanFile(self.Paths[0])["title"])
+
+    def test_Duplicates(self):
+        """
+        Checks that copies are recorded, reported and promoted when the library copy is removed
+        """
+        include = [".mp3", ".flac"]
+        Copy = os.path.join(self.TempDir.name, "copies", "copyX0.mp3")
+        os.makedirs(os.path.dirname(Copy))
+        shutil.copyfile(self.Paths[0], Copy)
+        Reencode = os.path.join(self.TempDir.name, "copies", "reencodeX0.mp3")
+        TesterObjects.Gen_MP3(Reencode, 0, frames = 21)
+
+        Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+        self.assertEqual(14, Stats["new"])
+        self.assertEqual(13, len(self.LibraryRows()))
+
+        with self.subTest("hash report"):
+            Report = self.Librarymanager.DuplicateReport("hash")
+            self.assertEqual(1, len(Report))
+            self.assertEqual(sorted([os.path.normpath(Copy), self.Paths[0]]), [File[0] for File in Report[0]["files"]])
+            self.assertEqual(os.path.getsize(Copy), Report[0]["reclaimable"])
+
+        with self.subTest("tags report"):
+            Report = self.Librarymanager.DuplicateReport("tags")
+            self.assertEqual(1, len(Report))
+            self.assertEqual("artistx0 - titlex0", Report[0]["key"])
+            self.assertEqual(2, len(Report[0]["files"]))
+
+        with self.subTest("removed library copy"):
+            # the copies folder is walked first, so the copy holds the library row
+            self.assertIn(os.path.normpath(Copy), [Row[3] for Row in self.LibraryRows()])
+            os.remove(Copy)
+            self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+            Stats = self.Librarymanager.ScanDirectory(self.TempDir.name, include, Incremental = True)
+            self.assertEqual(1, Stats["new"])
+            self.assertIn(self.Paths[0], [Row[3] for Row in self.LibraryRows()])
+            self.assertEqual([], self.Librarymanager.DuplicateReport("hash"))
+
+    def test_FileHasher_Retag(self):
+        """
+        Checks that the fast and full file ids survive tag edits
+        """
+        for Path in self.Paths[:2]:
+            Ids = {Strategy: self.Librarymanager.FileHasher(Path, Strategy = Strategy)
+                   for Strategy in ["header", "fast", "full"]}
+            Tags = EasyID3(Path) if Path.endswith(".mp3") else FLAC(Path)
+            Tags["title"] = "retagged title with a longer value"
+            Tags.save()
+            with self.subTest(Path = Path):
+                self.assertEqual(Ids["fast"], self.Librarymanager.FileHasher(Path, Strategy = "fast"))
+                self.assertEqual(Ids["full"], self.Librarymanager.FileHasher(Path, Strategy = "full"))
+                self.assertNotEqual(Ids["header"], self.Librarymanager.FileHasher(Path, Strategy = "header"))
+
+    def test_Migrate_FileIds(self):
+        """
+        Checks that the header file ids are migrated to the new strategy
+        """
+        self.Librarymanager.FileIdStrategy = "header"
+        self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"], Incremental = True)
+        Expected = sorted(self.Librarymanager.FileHasher(Path, Strategy = "fast") for Path in self.Paths)
+        Queued = [self.Librarymanager.FileHasher(Path, Strategy = "header") for Path in self.Paths[:3]]
+        self.Librarymanager.Queue_Set(Queued)
+
+        self.assertEqual(12, self.Librarymanager.Migrate_FileIds("fast", ChunkSize = 5))
+        self.assertEqual(Expected, sorted(Row[0] for Row in self.LibraryRows()))
+        with self.subTest("the queue follows the migrated ids"):
+            Migrated = [self.Librarymanager.FileHasher(Path, Strategy = "fast") for Path in self.Paths[:3]]
+            self.assertEqual(Migrated, self.Librarymanager.Queue_FileIds())
+            self.assertEqual(Migrated, [Row[0] for Row in self.Librarymanager.Fetch("SELECT file_id FROM nowplaying")])
+        self.assertEqual("fast", self.Librarymanager.GetMeta("file_id_strategy"))
+        self.assertEqual(0, self.Librarymanager.Migrate_FileIds("fast"))
+
+    def test_Migrate_FileIds_Collision(self):
+        """
+        Checks that a row whose new file id is already in the library is moved to the duplicates
+        """
+        Copy = os.path.join(self.TempDir.name, "copy.mp3")
+        shutil.copy(self.Paths[0], Copy)
+        Tags = EasyID3(Copy)
+        Tags["title"] = "retagged copy"
+        Tags.save()
+        self.Librarymanager.FileIdStrategy = "header"
+        self.Librarymanager.ScanDirectory(self.TempDir.name, [".mp3", ".flac"], Incremental = True)
+        self.assertEqual(13, len(self.LibraryRows()))
+        self.Librarymanager.Queue_Set([self.Librarymanager.FileHasher(Copy)])
+
+        self.assertEqual(13, self.Librarymanager.Migrate_FileIds("fast"))
+        FileId = self.Librarymanager.FileHasher(Copy, Strategy = "fast")
+        Library = [Row[0] for Row in self.LibraryRows()]
+        self.assertEqual(12, len(Library))
+        self.assertEqual(1, Library.count(FileId))
+        # every manifest entry points at a library row
+        Manifest = self.Librarymanager.Fetch("SELECT file_id, id_strategy FROM file_manifest")
+        self.assertEqual(13, len(Manifest))
+        self.assertEqual(set(Library), {Row[0] for Row in Manifest})
+        self.assertEqual({"fast"}, {Row[1] for Row in Manifest})
+        self.assertEqual(2, len(self.Librarymanager.Fetch("SELECT path_id FROM duplicates WHERE file_id = ?", FileId)))
+        self.assertEqual([FileId], self.Librarymanager.Queue_FileIds())
+
+
+class Test_LibraryWatcher(TestCase):
+    """
+    Tests the folder watcher used to keep the library in sync
+    """
+    def setUp(self):
+        self.TempDir = tempfile.TemporaryDirectory()
+        self.Paths = TesterObjects.Gen_AudioFiles(self.TempDir.name, 6)
+        self.Librarymanager = LibraryManager(':memory:')
+        self.Librarymanager.IncrementalScan(self.TempDir.name, [".mp3", ".flac"])
+
+        self.View = QTableView()
+        self.View.setProperty("Order", [])
+        self.Librarymanager.SetTableModle("library", self.View)
+        self.Watcher = LibraryWatcher(self.Librarymanager, Polling = True)
+        self.Watcher.Changed.connect(lambda Dirs: self.Librarymanager.Refresh_DirectoryRows(self.View, Dirs))
+        self.Watcher.Watch(self.TempDir.name, [".mp3", ".flac"])
+
+    def tearDown(self):
+        self.TempDir.cleanup()
+
+    def ModelPaths(self):
+        Model = self.View.model()
+        return sorted(Model.index(Row, 3).data() for Row in range(Model.rowCount()))
+
+    def test_Coalesce(self):
+        """
+        Checks that nested and removed folders are coalesced to their parents
+        """
+        Root = os.path.normpath(self.TempDir.name)
+        Folder = os.path.join(Root, "folderX1")
+        Paths = [Folder, os.path.join(Folder, "removed"), os.path.join(Root, "folderX2"), "/outside/of/root"]
+        self.assertEqual([Folder, os.path.join(Root, "folderX2")], self.Watcher.Coalesce(Paths))
+
+    def test_PolledChanges(self):
+        """
+        Checks that the polled changes are rescanned and only the rows under
+        the changed folder are refreshed
+        """
+        Folder = os.path.dirname(self.Paths[1])
+        NewFile = os.path.join(Folder, "fileX50.mp3")
+        TesterObjects.Gen_MP3(NewFile, 50)
+        os.remove(self.Paths[1])
+        self.Watcher.Poll()
+
+        self.assertEqual([Folder], self.Watcher.Flush())
+        Expected = sorted(self.Paths[:1] + self.Paths[2:] + [os.path.normpath(NewFile)])
+        self.assertEqual(Expected, self.ModelPaths())
+        Query = QSqlQuery("SELECT file_path FROM library", self.Librarymanager.db_driver)
+        self.assertEqual(Expected, sorted(Row[0] for Row in self.Librarymanager.fetchAll(Query, 1)))
+
+        with self.subTest("no events no rescans"):
+            self.Watcher.Poll()
+            self.assertEqual([], self.Watcher.Flush())
+
+    def test_FailedWatches(self):
+        """
+        Checks that only the folders the filesystem watcher refuses are polled
+        """
+        Watcher = LibraryWatcher(self.Librarymanager)
+        Watcher.Watcher = MagicMock()
+        Watcher.Watcher.directories.return_value = []
+        Watcher.Watcher.addPaths.side_effect = lambda Dirs: Dirs[-1:]
+        Watcher.Watch(self.TempDir.name, [".mp3", ".flac"])
+        Dirs = Watcher.Watcher.addPaths.call_args[0][0]
+        self.assertGreater(len(Dirs), 1)
+        self.assertEqual({Dirs[-1]}, Watcher.Polled)
+        self.assertEqual([Dirs[-1]], list(Watcher.Worker.Mtimes))
+        self.assertTrue(Watcher.PollTimer.isActive())
+        Watcher.Stop()
+
+    def test_WorkerThread(self):
+        """
+        Checks that the rescans of a database file run on the worker thread
+        and Changed is emitted back on the GUI thread
+        """
+        Manager = LibraryManager(os.path.join(self.TempDir.name, "watched.db"))
+        Manager.IncrementalScan(self.TempDir.name, [".mp3", ".flac"])
+        Watcher = LibraryWatcher(Manager, Polling = True)
+        self.addCleanup(Watcher.Stop)
+        Emitted = []
+        Watcher.Changed.connect(lambda Dirs: Emitted.append((Dirs, threading.get_ident())))
+
+        def Wait(Signal, Trigger):
+            Loop = QEventLoop()
+            Signal.connect(Loop.quit)
+            QTimer.singleShot(5000, Loop.quit)
+            Result = Trigger()
+            Loop.exec_()
+            Signal.disconnect(Loop.quit)
+            return Result
+
+        Wait(Watcher.Worker.Walked, lambda: Watcher.Watch(self.TempDir.name, [".mp3", ".flac"]))
+        # the worker records the polled mtimes before the poll
+        Wait(Watcher.Worker.Polled, Watcher.Poll)
+        Folder = os.path.dirname(self.Paths[1])
+        os.remove(self.Paths[1])
+        Wait(Watcher.Worker.Polled, Watcher.Poll)
+        self.assertEqual([Folder], Wait(Watcher.Changed, Watcher.Flush))
+        Watcher.Stop()
+        self.assertEqual([([Folder], threading.get_ident())], Emitted)
+        self.assertEqual([], Manager.Fetch("SELECT 1 FROM library WHERE file_path = ?", self.Paths[1]))
+        Manager.Release_Connection()
+
+class Test_SearchController(TestCase):
+    """
+    Tests the debounced searches run by the worker thread
+    """
+    def setUp(self):
+        self.TempDir = tempfile.TemporaryDirectory()
+        self.Librarymanager = LibraryManager(os.path.join(self.TempDir.name, "search.db"))
+        self.Librarymanager.BatchInsert_Metadata(TesterObjects.Gen_DbTable_Data(50))
+        self.View = QTableView()
+        self.View.setProperty("Order", [])
+        self.Librarymanager.SetTableModle("library", self.View)
+        self.Controller = SearchController(self.Librarymanager, self.View, Debounce = 50)
+        self.Applied = []
+        self.Controller.Applied.connect(self.Applied.append)
+
+    def tearDown(self):
+        self.Controller.Stop()
+        self.Librarymanager.Release_Connection()
+        self.TempDir.cleanup()
+
+    def Wait(self, Msec = 5000):
+        """
+        Runs the event loop until a result is applied or the time runs out
+        """
+        Loop = QEventLoop()
+        self.Controller.Applied.connect(Loop.quit)
+        QTimer.singleShot(Msec, Loop.quit)
+        Loop.exec_()
+        self.Controller.Applied.disconnect(Loop.quit)
+        # results still in flight would be applied by now
+        QTimer.singleShot(100, Loop.quit)
+        Loop.exec_()
+
+    def Shown(self):
+        Model = self.View.model()
+        return sorted(Model.index(Row, 0).data() for Row in range(Model.rowCount()))
+
+    def test_Debounce(self):
+        """
+        Checks that only the settled text is searched and applied
+        """
+        for Text in ["title", "titlex", "titlex3"]:
+            self.Controller.Search(Text)
+        self.Wait()
+        self.assertEqual(["titlex3"], self.Applied)
+        self.assertEqual(1, self.Controller.Generation)
+        self.assertEqual(sorted(self.Librarymanager.SearchIds("titlex3")), self.Shown())
+
+    def test_StaleSearches(self):
+        """
+        Checks that the results of the older texts are dropped and an empty text clears the view
+        """
+        self.Controller.SearchNow("titlex4")
+        self.Controller.SearchNow("titlex41")
+        self.Wait()
+        self.assertEqual(["titlex41"], self.Applied)
+        self.assertEqual(["file_idX41"], self.Shown())
+
+        self.Controller.SearchNow("")
+        self.assertEqual(50, self.View.model().rowCount())
+
+    def test_Error(self):
+        """
+        Checks that a failed search is reported with the Error signal and nothing is applied
+        """
+        # the worker connection is opened by the first search
+        self.Controller.SearchNow("titlex3")
+        self.Wait()
+        Errors, Loop = [], QEventLoop()
+        self.Controller.Error.connect(Errors.append)
+        self.Controller.Error.connect(Loop.quit)
+        self.Librarymanager.ExeQuery("DROP TABLE library_fts")
+        QTimer.singleShot(5000, Loop.quit)
+        self.Controller.SearchNow("titlex4")
+        Loop.exec_()
+        self.assertEqual(1, len(Errors))
+        self.assertIn("titlex4", Errors[0])
+        self.assertEqual(["titlex3"], self.Applied)
+
+    def test_MemoryDatabase(self):
+        """
+        Checks that the searches of an in memory database run once the text settles
+        """
+        Manager = LibraryManager(":memory:")
+        Manager.BatchInsert_Metadata(TesterObjects.Gen_DbTable_Data(10))
+        View = QTableView()
+        View.setProperty("Order", [])
+        Manager.SetTableModle("library", View)
+        Controller = SearchController(Manager, View)
+        self.assertIsNone(Controller.Thread)
+        Controller.Search("titlex5")
+        self.assertEqual(10, View.model().rowCount())
+        Controller.SearchNow()
+        self.assertEqual(["file_idX5"], [View.model().index(Row, 0).data() for Row in range(View.model().rowCount())])
+        Manager.close_connection()
+
 
 if __name__ == '__main__':
     from apollo.test.testUtilities import TestSuit_main
@@ -1,9 +1,17 @@
 
 
-import unittest, datetime, os, sys
+import unittest, datetime, os, sys, struct
 sys.path.append(os.path.split(os.path.abspath(__file__))[0].rsplit("\\", 2)[0])
 
 from PyQt5 import QtWidgets, QtCore, QtGui
+from mutagen.apev2 import APEv2
+from mutagen.easyid3 import EasyID3
+from mutagen.flac import FLAC
+from mutagen.id3 import TIT2, TPE1, TALB, TCON
+from mutagen.ogg import OggPage
+from mutagen.oggopus import OggOpus
+from mutagen.oggvorbis import OggVorbis
+from mutagen.wave import WAVE
 
 from apollo.db.library_manager import LibraryManager
 
@@ -97,15 +105,144 @@ class TesterObjects:
         # data insertion into library table
         DataTable = {}
         for fields in LibraryManager().db_fields:
-            if fields in ["discnumber", "channels"]:
+            if fields in ["discnumber", "channels", "bitrate_bps", "sample_rate_hz"]:
                 data = [Row for Row in range(rows)]
             else:
-                if fields == "filesize":
-                    data = [f"1024" for Row in range(rows)]
-                elif fields == "length":
-                    data = datetime.timedelta(seconds = 60)
-                    data = [f"{data}" for Row in range(rows)]
+                if fields == "filesize_bytes":
+                    data = [1073741824 for Row in range(rows)]
+                elif fields == "duration_ms":
+                    data = [60000 for Row in range(rows)]
+                elif fields in ["artist_id", "album_id", "genre_id"]:
+                    # ids the dimension triggers assign, every row has its own artist, album and genre
+                    data = [Row + 1 for Row in range(rows)]
+                elif fields == "folder_id":
+                    data = [1 for Row in range(rows)]
                 else:
                     data = [f"{fields}X{Row}" for Row in range(rows)]
             DataTable[fields] = data
         return DataTable
+
+    @classmethod
+    def Gen_AudioFiles(cls, Dir, count = 20, formats = (".mp3", ".flac")):
+        """
+        Generates a synthetic corpus of small tagged audio files that mutagen
+        can parse, the files are spread across the formats and sub folders.
+        Returns the list of generated paths.
+        """
+        Paths = []
+        for index in range(count):
+            ext = formats[index % len(formats)]
+            folder = os.path.join(Dir, f"folderX{index % 3}")
+            os.makedirs(folder, exist_ok = True)
+            path = os.path.join(folder, f"fileX{index}{ext}")
+            if ext == ".mp3":
+                cls.Gen_MP3(path, index)
+            elif ext == ".flac":
+                cls.Gen_FLAC(path, index)
+            elif ext == ".wav":
+                cls.Gen_WAV(path, index)
+            elif ext == ".ogg":
+                cls.Gen_OGG(path, index)
+            elif ext == ".opus":
+                cls.Gen_OGG(path, index, codec = "opus")
+            elif ext == ".wv":
+                cls.Gen_WV(path, index)
+            Paths.append(os.path.normpath(path))
+        return Paths
+
+    @classmethod
+    def Gen_MP3(cls, path, index = 0, frames = 20):
+        # MPEG1 Layer3 128Kbps 44100Hz frames, 417 bytes each
+        header = bytes([0xFF, 0xFB, 0x90, 0x44])
+        with open(path, "wb") as FP:
+            for frame in range(frames):
+                FP.write(header + bytes([index % 256, frame % 256, index // 256 % 256]) + bytes(410))
+        Tags = EasyID3()
+        Tags["title"] = f"titleX{index}"
+        Tags["artist"] = f"artistX{index % 5}"
+        Tags["album"] = f"albumX{index % 4}"
+        Tags["genre"] = f"genreX{index % 2}"
+        Tags.save(path)
+
+    @classmethod
+    def Gen_FLAC(cls, path, index = 0, seconds = 3):
+        # STREAMINFO: 44100Hz, 2 channels, 16 bits per sample
+        Info = (44100 << 44) | (1 << 41) | (15 << 36) | (44100 * seconds)
+        StreamInfo = struct.pack(">HH", 4096, 4096) + bytes(6) + Info.to_bytes(8, "big") + bytes(16)
+        with open(path, "wb") as FP:
+            FP.write(b"fLaC" + bytes([0x80]) + len(StreamInfo).to_bytes(3, "big") + StreamInfo)
+            FP.write(bytes([0xFF, 0xF8]) + index.to_bytes(4, "big") + bytes(1000))
+        Tags = FLAC(path)
+        Tags["title"] = f"titleX{index}"
+        Tags["artist"] = f"artistX{index % 5}"
+        Tags["album"] = f"albumX{index % 4}"
+        Tags["genre"] = f"genreX{index % 2}"
+        Tags.save()
+
+    @classmethod
+    def Gen_WAV(cls, path, index = 0, seconds = 1):
+        # PCM 44100Hz, 2 channels, 16 bits per sample with an ID3 chunk
+        Data = index.to_bytes(4, "big") + bytes(44100 * 4 * seconds - 4)
+        Format = struct.pack("<HHIIHH", 1, 2, 44100, 44100 * 4, 4, 16)
+        with open(path, "wb") as FP:
+            FP.write(b"RIFF" + struct.pack("<I", 4 + 8 + len(Format) + 8 + len(Data)) + b"WAVE")
+            FP.write(b"fmt " + struct.pack("<I", len(Format)) + Format)
+            FP.write(b"data" + struct.pack("<I", len(Data)) + Data)
+        Tags = WAVE(path)
+        Tags.add_tags()
+        Tags.tags.add(TIT2(encoding = 3, text = f"titleX{index}"))
+        Tags.tags.add(TPE1(encoding = 3, text = f"artistX{index % 5}"))
+        Tags.tags.add(TALB(encoding = 3, text = f"albumX{index % 4}"))
+        Tags.tags.add(TCON(encoding = 3, text = f"genreX{index % 2}"))
+        Tags.save()
+
+    @classmethod
+    def Gen_WV(cls, path, index = 0, seconds = 1):
+        # WavPack block header: 44100Hz (rate index 9), 16 bits per sample, with an APEv2 tag
+        Samples = 44100 * seconds
+        Body = index.to_bytes(4, "big") + bytes(996)
+        Header = struct.pack("<IHBBIIIII", 24 + len(Body), 0x410, 0, 0, Samples, 0, Samples, (9 << 23) | 1, 0)
+        with open(path, "wb") as FP:
+            FP.write(b"wvpk" + Header + Body)
+        # APEv2 keys keep their case
+        Tags = APEv2()
+        Tags["Title"] = f"titleX{index}"
+        Tags["Artist"] = f"artistX{index % 5}"
+        Tags["Album"] = f"albumX{index % 4}"
+        Tags["Album Artist"] = f"albumartistX{index % 3}"
+        Tags["Year"] = f"{2000 + index}"
+        Tags["Track"] = f"{index + 1}/20"
+        Tags["Disc"] = "1/1"
+        Tags["Genre"] = f"genreX{index % 2}"
+        Tags.save(path)
+
+    @classmethod
+    def Gen_OGG(cls, path, index = 0, seconds = 2, codec = "vorbis"):
+        # Ogg Vorbis or Opus stream, headers and a single fake audio packet
+        if codec == "opus":
+            Headers = [b"OpusHead" + struct.pack("<BBHIhB", 1, 2, 312, 48000, 0, 0),
+                       b"OpusTags" + struct.pack("<I", 6) + b"apollo" + struct.pack("<I", 0)]
+            Samples, Type = 48000 * seconds, OggOpus
+        else:
+            Headers = [b"\x01vorbis" + struct.pack("<IBIiiiBB", 0, 2, 44100, 0, 128000, 0, 0xB8, 1),
+                       b"\x03vorbis" + struct.pack("<I", 6) + b"apollo" + struct.pack("<I", 0) + b"\x01",
+                       b"\x05vorbis" + bytes(32)]
+            Samples, Type = 44100 * seconds, OggVorbis
+
+        Pages = [[Headers[0]], Headers[1:], [index.to_bytes(4, "big") + bytes(400)]]
+        with open(path, "wb") as FP:
+            for Sequence, Packets in enumerate(Pages):
+                Page = OggPage()
+                Page.serial = 1
+                Page.sequence = Sequence
+                Page.packets = Packets
+                Page.first = Sequence == 0
+                Page.last = Sequence == len(Pages) - 1
+                Page.position = Samples if Page.last else 0
+                FP.write(Page.write())
+        Tags = Type(path)
+        Tags["title"] = f"titleX{index}"
+        Tags["artist"] = f"artistX{index % 5}"
+        Tags["album"] = f"albumX{index % 4}"
+        Tags["genre"] = f"genreX{index % 2}"
+        Tags.save()
@@ -59,6 +59,25 @@ class Test_ApolloUtility_Functions(TestCase):
             self.assertFalse(Header.isSectionHidden(8))
 
 
+    def test_StatsMenuBinding(self):
+        """Test For the stats menu of a table"""
+        _, View = TesterObjects.Gen_TableView()
+        View.setProperty("DB_Table", "library")
+        self.INSTANCE.LibraryManager.BatchInsert_Metadata(TesterObjects.Gen_DbTable_Data(20))
+        Menu = QtWidgets.QMenu()
+        StatsMenu = self.INSTANCE.StatsMenuBinding(Menu, View)
+
+        with self.subTest("Checks if the stats are read when the menu is bound"):
+            returned = [Action.text() for Action in StatsMenu.actions()]
+            self.assertEqual("Table Stats", StatsMenu.title())
+            self.assertEqual(5, len(returned))
+            self.assertEqual("Track Count: 20", returned[-1])
+
+        with self.subTest("Checks if the stats are read again when the menu opens"):
+            self.INSTANCE.LibraryManager.DeleteFileIds("library", ["file_idX0"])
+            StatsMenu.aboutToShow.emit()
+            self.assertEqual("Track Count: 19", StatsMenu.actions()[-1].text())
+
     def test_ColumnSelection(self):
         """Test For"""
         (Raw, TableView) = TesterObjects.Gen_TableView()
@@ -324,7 +343,8 @@ class Test_Queue_Utils(TestCase):
             self.INSTANCE.PlayArtist(self.LibraryTable) # call
             Expected = ['file_idX103', 'file_idX3', 'file_idX53']
             returned = self.INSTANCE.PlayQueue.GetQueue()
-            [self.assertIn(Item, returned) for Item in Expected]
+            self.assertCountEqual(Expected, returned)
+            self.assertCountEqual(Expected, self.INSTANCE.LibraryManager.Queue_FileIds())
 
 
     def test_PlayAlbumNow(self):
@@ -416,6 +436,21 @@ class Test_Queue_Utils(TestCase):
             self.INSTANCE.QueueAlbumLast(self.LibraryTable) # call
             self.assertListEqual(Expected, self.INSTANCE.PlayQueue.GetQueue())
 
+    def test_DeleteItem(self):
+        """Test For removing the selected rows of a filtered table"""
+        Proxy = self.INSTANCE.LibraryManager.FilterModel(self.LibraryTable)
+        Proxy.SetFileIds([f"file_idX{row}" for row in range(0, self.MAXROWS, 5)])
+        [self.LibraryTable.selectRow(row) for row in [4, 1, 7]]
+        self.INSTANCE.DeleteItem("Remove", self.LibraryTable) # call
+
+        Removed = ['file_idX5', 'file_idX20', 'file_idX35']
+        Source = Proxy.sourceModel()
+        returned = [Source.index(row, 0).data() for row in range(Source.rowCount())]
+        self.assertEqual(self.MAXROWS - 3, len(returned))
+        [self.assertNotIn(Item, returned) for Item in Removed]
+        Query = self.INSTANCE.LibraryManager.ExeQuery("SELECT file_id FROM library")
+        [self.assertNotIn([Item], self.INSTANCE.LibraryManager.fetchAll(Query)) for Item in Removed]
+
 
 if __name__ == "__main__":
     App = QtWidgets.QApplication([])
@@ -68,6 +68,12 @@ class ConfigManager:
             "LIBRARY_GROUPORDER": "file_path",
             "ACTIVETHEME": "",
             "CURRENT_DB": "Default",
+            "SCAN_WORKERS": None,
+            "SCAN_POOLTYPE": "thread",
+            "FILE_ID_STRATEGY": "fast",
+            "WATCHER_ENABLED": True,
+            "WATCHER_POLLING": False,
+            "FEDERATE_LIBRARIES": False,
             "MONITERED_DB": {
                 "Default": {
                     "name": "Default",